@@ -10,7 +10,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from app.database import Base
-from app.models import UserLogin, UserDetails, QRDetails, QRUsage
+from app.models import UserLogin, UserDetails, QRDetails, QRUsage, EmailOutbox
 from app.config import settings
 
 config = context.config
@@ -0,0 +1,50 @@
+"""Add email_outbox table for queued scan alert emails
+
+Revision ID: 3f9c1a7d52e4
+Revises: eb6ec02c1b95
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1a7d52e4'
+down_revision = 'eb6ec02c1b95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('email_outbox',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('to_email', sa.String(length=100), nullable=False),
+        sa.Column('qr_id', sa.UUID(), nullable=False),
+        sa.Column('latitude', sa.String(length=50), nullable=True),
+        sa.Column('longitude', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_dt', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(length=1000), nullable=True),
+        sa.Column('sent_dt', sa.DateTime(), nullable=True),
+        sa.Column('active_flag', sa.Boolean(), nullable=False),
+        sa.Column('crt_dt', sa.DateTime(), nullable=False),
+        sa.Column('crt_by', sa.UUID(), nullable=True),
+        sa.Column('lst_updt_dt', sa.DateTime(), nullable=True),
+        sa.Column('lst_updt_by', sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(['qr_id'], ['qr_dtls.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Workers only ever look at due, pending rows
+    op.create_index(
+        'ix_email_outbox_pending',
+        'email_outbox',
+        ['next_attempt_dt'],
+        postgresql_where=sa.text("status = 'pending'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_outbox_pending', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,43 @@
+"""Add qr_scan_daily rollup and job_watermark tables
+
+Revision ID: 5a1e9b3d7c26
+Revises: c4d7e2a9f318
+Create Date: 2026-10-18 12:04:11.630472
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1e9b3d7c26'
+down_revision = 'c4d7e2a9f318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('job_watermark',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('position_dt', sa.DateTime(), nullable=True),
+        sa.Column('position_id', sa.UUID(), nullable=True),
+        sa.Column('crt_dt', sa.DateTime(), nullable=False),
+        sa.Column('lst_updt_dt', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # The primary key (qr_id, day) serves the per-QR day ranges the summary reads
+    op.create_table('qr_scan_daily',
+        sa.Column('qr_id', sa.UUID(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('scan_count', sa.Integer(), nullable=False),
+        sa.Column('first_scan_dt', sa.DateTime(), nullable=False),
+        sa.Column('last_scan_dt', sa.DateTime(), nullable=False),
+        sa.Column('lst_updt_dt', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['qr_id'], ['qr_dtls.id'], ),
+        sa.PrimaryKeyConstraint('qr_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('qr_scan_daily')
+    op.drop_table('job_watermark')
@@ -0,0 +1,50 @@
+"""Widen user_dtls profile columns to hold encrypted values
+
+Revision ID: 7c3a9e5d1b82
+Revises: e2b8c5a1f764
+Create Date: 2026-10-18 13:25:17.604218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3a9e5d1b82'
+down_revision = 'e2b8c5a1f764'
+branch_labels = None
+depends_on = None
+
+# column -> (plaintext length, longest Fernet token for it; see encryption.ciphertext_length)
+COLUMNS = {
+    'first_name': (100, 632),
+    'last_name': (100, 632),
+    'mobile_no': (20, 204),
+    'address': (500, 2764),
+    'email_id': (100, 632),
+    'blood_grp': (10, 140),
+    'company_name': (200, 1164),
+    'description': (1000, 5432),
+}
+
+
+def upgrade() -> None:
+    # Raising a varchar limit only changes the catalog on PostgreSQL; no table rewrite
+    for column, (length, encrypted_length) in COLUMNS.items():
+        op.alter_column(
+            'user_dtls', column,
+            existing_type=sa.String(length=length),
+            type_=sa.String(length=encrypted_length),
+            existing_nullable=True
+        )
+
+
+def downgrade() -> None:
+    # Fails while encrypted values are stored; decrypt them first
+    for column, (length, encrypted_length) in COLUMNS.items():
+        op.alter_column(
+            'user_dtls', column,
+            existing_type=sa.String(length=encrypted_length),
+            type_=sa.String(length=length),
+            existing_nullable=True
+        )
@@ -0,0 +1,36 @@
+"""Add indexes on foreign keys and hot filter columns
+
+Revision ID: 8b2e4f6a1c03
+Revises: 3f9c1a7d52e4
+Create Date: 2026-10-18 10:02:15.540117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4f6a1c03'
+down_revision = '3f9c1a7d52e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # user_dtls lookups by owner (every authenticated QR/user route)
+    op.create_index(op.f('ix_user_dtls_user_id'), 'user_dtls', ['user_id'], unique=False)
+
+    # qr_dtls by bound user details (bind, permission checks, cache invalidation)
+    # A user has a few QRs, so my-qr-codes checks active_flag on the fetched rows
+    op.create_index(op.f('ix_qr_dtls_user_dtls_id'), 'qr_dtls', ['user_dtls_id'], unique=False)
+
+    # qr_usage by QR and by scan time
+    op.create_index(op.f('ix_qr_usage_qr_id'), 'qr_usage', ['qr_id'], unique=False)
+    op.create_index(op.f('ix_qr_usage_crt_dt'), 'qr_usage', ['crt_dt'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_qr_usage_crt_dt'), table_name='qr_usage')
+    op.drop_index(op.f('ix_qr_usage_qr_id'), table_name='qr_usage')
+    op.drop_index(op.f('ix_qr_dtls_user_dtls_id'), table_name='qr_dtls')
+    op.drop_index(op.f('ix_user_dtls_user_id'), table_name='user_dtls')
@@ -0,0 +1,116 @@
+"""Add numeric lat/lng to qr_usage, backfilled from the location strings
+
+Revision ID: 9d3f6b2e8a47
+Revises: 5a1e9b3d7c26
+Create Date: 2026-10-18 12:21:37.904518
+
+"""
+import math
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3f6b2e8a47'
+down_revision = '5a1e9b3d7c26'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def _parse(latitude, longitude):
+    # Same rules as app.geo.parse_location at the time of this migration
+    try:
+        lat, lng = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0) or math.isnan(lat) or math.isnan(lng):
+        return None
+    return lat, lng
+
+
+def upgrade() -> None:
+    op.add_column('qr_usage', sa.Column('lat', sa.Float(), nullable=True))
+    op.add_column('qr_usage', sa.Column('lng', sa.Float(), nullable=True))
+    # Marks rows whose strings do not parse, so the backfill can tell them
+    # from rows it has not seen yet; dropped again at the end
+    op.add_column('qr_usage', sa.Column('lat_unparsed', sa.Boolean(), nullable=True))
+
+    # Backfill in id order, one committed batch at a time, so the table is
+    # never locked for long and an interrupted run can simply be repeated.
+    # Servers still on the previous release keep inserting rows with only the
+    # strings, and random ids put some of them behind the cursor, so passes
+    # repeat from the start until one finds nothing left. Rows whose strings
+    # do not parse keep NULL.
+    qr_usage = sa.table(
+        'qr_usage',
+        sa.column('id', sa.UUID()),
+        sa.column('latitude', sa.String()),
+        sa.column('longitude', sa.String()),
+        sa.column('lat', sa.Float()),
+        sa.column('lng', sa.Float()),
+        sa.column('lat_unparsed', sa.Boolean()),
+    )
+    pending = sa.and_(
+        qr_usage.c.latitude.isnot(None),
+        qr_usage.c.longitude.isnot(None),
+        qr_usage.c.lat.is_(None),
+        qr_usage.c.lat_unparsed.is_(None)
+    )
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        last_id = None
+        while True:
+            query = sa.select(qr_usage.c.id, qr_usage.c.latitude, qr_usage.c.longitude).where(pending)
+            if last_id is not None:
+                query = query.where(qr_usage.c.id > last_id)
+            rows = connection.execute(query.order_by(qr_usage.c.id).limit(BACKFILL_BATCH_SIZE)).all()
+            if not rows:
+                if last_id is None:
+                    break
+                last_id = None  # start the next pass
+                continue
+            last_id = rows[-1].id
+
+            parsed = []
+            unparsed = []
+            for row in rows:
+                location = _parse(row.latitude, row.longitude)
+                if location:
+                    parsed.append((row.id,) + location)
+                else:
+                    unparsed.append(row.id)
+            if parsed:
+                # One UPDATE ... FROM (VALUES ...) per batch: a single statement,
+                # so it commits atomically even in autocommit mode. VALUES
+                # would type the ids as text, hence the cast.
+                batch = sa.values(
+                    sa.column('id', sa.UUID()),
+                    sa.column('lat', sa.Float()),
+                    sa.column('lng', sa.Float()),
+                    name='batch'
+                ).data(parsed)
+                connection.execute(
+                    qr_usage.update().where(qr_usage.c.id == sa.cast(batch.c.id, sa.UUID())).values(lat=batch.c.lat, lng=batch.c.lng)
+                )
+            if unparsed:
+                connection.execute(qr_usage.update().where(qr_usage.c.id.in_(unparsed)).values(lat_unparsed=True))
+
+        # Area queries filter by QR, then by latitude/longitude ranges
+        op.create_index(
+            'ix_qr_usage_qr_id_lat_lng',
+            'qr_usage',
+            ['qr_id', 'lat', 'lng'],
+            unique=False,
+            postgresql_where=sa.text('lat IS NOT NULL'),
+            postgresql_concurrently=True
+        )
+
+    op.drop_column('qr_usage', 'lat_unparsed')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_qr_usage_qr_id_lat_lng', table_name='qr_usage')
+    op.drop_column('qr_usage', 'lng')
+    op.drop_column('qr_usage', 'lat')
@@ -0,0 +1,61 @@
+"""Add qr_usage.ins_dt for the scan rollup watermark, backfilled from crt_dt
+
+Revision ID: b6f1d3e8c209
+Revises: 7c3a9e5d1b82
+Create Date: 2026-10-18 16:42:08.315927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f1d3e8c209'
+down_revision = '7c3a9e5d1b82'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    op.add_column('qr_usage', sa.Column('ins_dt', sa.DateTime(), nullable=True))
+
+    # Existing rows count as inserted when they were scanned, which keeps the
+    # rollup watermark (until now a crt_dt position) where it is. Backfilled
+    # one committed batch at a time, like the lat/lng backfill; the loop runs
+    # until no NULL is left, so rows that older app servers insert meanwhile
+    # are picked up too.
+    qr_usage = sa.table(
+        'qr_usage',
+        sa.column('id', sa.UUID()),
+        sa.column('crt_dt', sa.DateTime()),
+        sa.column('ins_dt', sa.DateTime()),
+    )
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        while True:
+            ids = connection.execute(
+                sa.select(qr_usage.c.id).where(qr_usage.c.ins_dt.is_(None)).limit(BACKFILL_BATCH_SIZE)
+            ).scalars().all()
+            if not ids:
+                break
+            connection.execute(
+                qr_usage.update().where(qr_usage.c.id.in_(ids)).values(ins_dt=qr_usage.c.crt_dt)
+            )
+
+        # The rollup walks (ins_dt, id) past its watermark
+        op.create_index(
+            'ix_qr_usage_ins_dt_id',
+            'qr_usage',
+            ['ins_dt', 'id'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+
+    op.alter_column('qr_usage', 'ins_dt', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_qr_usage_ins_dt_id', table_name='qr_usage')
+    op.drop_column('qr_usage', 'ins_dt')
@@ -0,0 +1,39 @@
+"""Add composite qr_usage index for scan history pagination
+
+Revision ID: c4d7e2a9f318
+Revises: 8b2e4f6a1c03
+Create Date: 2026-10-18 11:52:40.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7e2a9f318'
+down_revision = '8b2e4f6a1c03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Scan history pages walk (qr_id, crt_dt, id) newest first. The index
+    # also serves every lookup by qr_id alone, so it replaces ix_qr_usage_qr_id.
+    # qr_usage is the largest, most written table: build without blocking scans.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_qr_usage_qr_id_crt_dt_id',
+            'qr_usage',
+            ['qr_id', 'crt_dt', 'id'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+        op.drop_index(op.f('ix_qr_usage_qr_id'), table_name='qr_usage', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_qr_usage_qr_id'), 'qr_usage', ['qr_id'], unique=False, postgresql_concurrently=True
+        )
+        op.drop_index('ix_qr_usage_qr_id_crt_dt_id', table_name='qr_usage', postgresql_concurrently=True)
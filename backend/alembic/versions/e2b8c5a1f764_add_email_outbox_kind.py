@@ -0,0 +1,36 @@
+"""Add kind to email_outbox for per-owner alert digests
+
+Revision ID: e2b8c5a1f764
+Revises: 9d3f6b2e8a47
+Create Date: 2026-10-18 12:40:52.371905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8c5a1f764'
+down_revision = '9d3f6b2e8a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows are individual alerts
+    op.add_column(
+        'email_outbox',
+        sa.Column('kind', sa.String(length=20), server_default='alert', nullable=False)
+    )
+    # Workers look up each owner's latest immediate alert to find their digest window
+    op.create_index(
+        'ix_email_outbox_to_email_alert_sent',
+        'email_outbox',
+        ['to_email', 'sent_dt'],
+        postgresql_where=sa.text("kind = 'alert' AND status = 'sent'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_outbox_to_email_alert_sent', table_name='email_outbox')
+    op.drop_column('email_outbox', 'kind')
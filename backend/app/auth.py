@@ -4,7 +4,10 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.cache import MISSING, auth_user_cache
 from app.config import settings
 from app.database import get_db
 from app.models import UserLogin
@@ -30,9 +33,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(
+async def get_current_user(
     token: Optional[str] = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Optional[UserLogin]:
     """
     Get current user from token. Returns None if no token provided (for public QR scanning)
@@ -55,12 +58,25 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(UserLogin).filter(UserLogin.email_id == token_data.email).first()
-    if user is None:
+    if token_data.user_id is None:
+        # Tokens issued before user_id was added to the claims
+        result = await db.execute(select(UserLogin).where(UserLogin.email_id == token_data.email))
+        user = result.scalars().first()
+    else:
+        user = auth_user_cache.get(token_data.user_id)
+        if user is MISSING:
+            generation = auth_user_cache.generation()
+            result = await db.execute(select(UserLogin).where(UserLogin.id == token_data.user_id))
+            user = result.scalars().first()
+            if user is not None:
+                # Cached users are shared between requests, so they must not stay attached to this session
+                db.expunge(user)
+            auth_user_cache.set(token_data.user_id, user, generation=generation)
+    if user is None or user.email_id != token_data.email:
         raise credentials_exception
     return user
 
-def require_auth(current_user: Optional[UserLogin] = Depends(get_current_user)) -> UserLogin:
+async def require_auth(current_user: Optional[UserLogin] = Depends(get_current_user)) -> UserLogin:
     """
     Dependency that requires authentication
     """
@@ -72,7 +88,7 @@ def require_auth(current_user: Optional[UserLogin] = Depends(get_current_user))
         )
     return current_user
 
-def require_admin(current_user: UserLogin = Depends(require_auth)) -> UserLogin:
+async def require_admin(current_user: UserLogin = Depends(require_auth)) -> UserLogin:
     """
     Dependency that requires admin or aspadmin role (2 or 3)
     """
@@ -83,3 +99,26 @@ def require_admin(current_user: UserLogin = Depends(require_auth)) -> UserLogin:
         )
     return current_user
 
+@event.listens_for(UserLogin, "after_update")
+def _invalidate_updated_user(mapper, connection, target):
+    """Drop a user from auth_user_cache when their role, active flag or email changes"""
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ("role", "active_flag", "email_id")):
+        _invalidate_cached_user(state, target.id)
+
+@event.listens_for(UserLogin, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    _invalidate_cached_user(inspect(target), target.id)
+
+def _invalidate_cached_user(state, user_id: UUID):
+    # Invalidate at flush and again at commit: a request that reads the user
+    # in between still sees the old row and may cache it
+    auth_user_cache.invalidate(user_id)
+    if state.session is not None:
+        state.session.info.setdefault("invalidated_user_ids", set()).add(user_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    user_ids = session.info.pop("invalidated_user_ids", None)
+    if user_ids:
+        auth_user_cache.invalidate(*user_ids)
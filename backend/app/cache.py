@@ -0,0 +1,150 @@
+"""
+In-process caches for hot read paths.
+
+Each process keeps its own copy, so entries expire after a short TTL to bound
+how long another worker can serve data that this process has invalidated.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from app.config import settings
+from app.metrics import CACHE_EVICTIONS, CACHE_REQUESTS
+
+# Returned by TTLCache.get on a miss, so that None can be cached as a negative result
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe LRU cache whose entries also expire after a TTL.
+
+    Loaders should read generation() before going to the database and pass it
+    to set(). If the key was invalidated in the meantime the value may already
+    be stale, so set() drops it instead of caching it.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl: float, negative_ttl: Optional[float] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._hit_metric = CACHE_REQUESTS.labels(cache=name, result="hit")
+        self._miss_metric = CACHE_REQUESTS.labels(cache=name, result="miss")
+        self._eviction_metric = CACHE_EVICTIONS.labels(cache=name)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value (possibly None), or MISSING"""
+        if not self.enabled:
+            return MISSING
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                self._miss_metric.inc()
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                self._miss_metric.inc()
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._hit_metric.inc()
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Cache value under key; None is cached with the negative TTL"""
+        if not self.enabled:
+            return
+        ttl = self.negative_ttl if value is None else self.ttl
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                self._eviction_metric.inc()
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# Public, permission-filtered view of a QR as served by /qr/scan/{qr_id}.
+# Keyed by qr_id; None marks a QR that does not exist or is inactive.
+scan_view_cache = TTLCache(
+    "scan_view",
+    max_entries=settings.SCAN_CACHE_MAX_ENTRIES,
+    ttl=settings.SCAN_CACHE_TTL_SECONDS,
+    negative_ttl=settings.SCAN_CACHE_NEGATIVE_TTL_SECONDS
+)
+
+# UserLogin resolved by get_current_user, detached from its session.
+# Keyed by user_id; None marks a token whose user does not exist.
+auth_user_cache = TTLCache(
+    "auth_user",
+    max_entries=settings.AUTH_USER_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_USER_CACHE_TTL_SECONDS,
+    negative_ttl=settings.AUTH_USER_CACHE_NEGATIVE_TTL_SECONDS
+)
+
+# Rendered QR images, keyed by their content digest (see qr_render.image_digest).
+# Values are the encoded image bytes; they never go stale.
+qr_image_cache = TTLCache(
+    "qr_image",
+    max_entries=settings.QR_IMAGE_CACHE_MAX_ENTRIES,
+    ttl=settings.QR_IMAGE_CACHE_TTL_SECONDS
+)
+
+# Plaintext of encrypted column values (see encryption.EncryptedString), keyed
+# by the stored token. A token always decrypts to the same value; tokens no
+# configured key decrypts are not cached.
+decrypt_cache = TTLCache(
+    "decrypt",
+    max_entries=settings.DECRYPT_CACHE_MAX_ENTRIES,
+    ttl=settings.DECRYPT_CACHE_TTL_SECONDS
+)
@@ -3,24 +3,128 @@ from typing import Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL (asyncpg) when unset
+
+    # Connection pool - applied to both the API (async) and background (sync) engines
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds; replace older connections, -1 disables
+    DB_POOL_PRE_PING: bool = True  # test connections on checkout
+
+    # Per-request SQL statement counting
+    DEBUG: bool = False  # adds X-DB-Queries / X-DB-Time response headers
+    DB_REPEATED_QUERY_THRESHOLD: int = 10  # warn when one request runs a statement shape more often; 0 disables
+
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
+
+    # Google ID token signing keys - cached in memory and refreshed in the background
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v3/certs"
+    GOOGLE_CERTS_DEFAULT_TTL_SECONDS: float = 3600.0  # when the response has no Cache-Control max-age
+    GOOGLE_CERTS_REFRESH_MARGIN_SECONDS: float = 300.0  # refresh this long before the keys expire
+    GOOGLE_CERTS_MIN_REFRESH_INTERVAL_SECONDS: float = 60.0  # limits refetches for unknown key ids
     
+    # Field encryption - ENCRYPTION_KEY encrypts; legacy keys (comma-separated) only decrypt
     ENCRYPTION_ENABLED: bool = False
     ENCRYPTION_KEY: Optional[str] = None
+    ENCRYPTION_LEGACY_KEYS: str = ""
+    REENCRYPT_BATCH_SIZE: int = 200  # rows re-encrypted per transaction; 0 disables the job
+    REENCRYPT_PAUSE_SECONDS: float = 0.5  # sleep between batches, keeps the job's load low
+    REENCRYPT_INTERVAL_SECONDS: float = 300.0  # how often a finished job looks for new rows
+    DECRYPT_CACHE_MAX_ENTRIES: int = 10000  # decrypted field values per process; 0 disables the cache
+    DECRYPT_CACHE_TTL_SECONDS: float = 300.0  # values never go stale, this bounds how long plaintext stays in memory
     
     FRONTEND_URL: str = "http://localhost:3000"
+
+    # Logging - handlers run on a background listener thread; set False to write inline
+    LOG_ASYNC: bool = True
+    ACCESS_LOG_ENABLED: bool = True
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0  # fraction of successful requests logged; errors are always logged
+
+    # Prometheus metrics at /metrics. With several workers also set the
+    # PROMETHEUS_MULTIPROC_DIR environment variable (see app/metrics.py).
+    METRICS_ENABLED: bool = True
+    METRICS_BEARER_TOKEN: Optional[str] = None  # when set, scrapes must send it as a Bearer token
+    METRICS_QR_SCAN_MAX_SERIES: int = 1000  # distinct qr_id label values per process
     
     SMTP_HOST: str
     SMTP_PORT: int
     SMTP_USERNAME: str
     SMTP_PASSWORD: str
     EMAIL_FROM: str
-    
+    SMTP_USE_TLS: bool = True
+    SMTP_TIMEOUT: float = 30.0  # seconds
+
+    # SMTP session pool - authenticated sessions are reused across sends
+    SMTP_POOL_SIZE: int = 2
+    SMTP_POOL_IDLE_TIMEOUT: float = 60.0  # close sessions idle longer than this
+    SMTP_POOL_HEALTH_CHECK_AFTER: float = 5.0  # NOOP sessions idle longer than this before reuse
+
+    # Email outbox - scan alerts are queued in the database and sent by background workers
+    EMAIL_OUTBOX_WORKERS: int = 2  # 0 disables the workers in this process
+    EMAIL_OUTBOX_POLL_INTERVAL: float = 5.0  # seconds
+    EMAIL_OUTBOX_BATCH_SIZE: int = 20  # alerts sent per SMTP session
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    EMAIL_OUTBOX_BACKOFF_SECONDS: float = 30.0
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS: float = 3600.0
+    EMAIL_OUTBOX_LEASE_SECONDS: float = 600.0  # claimed alerts go back to the queue if not marked within this
+    # After an owner's first alert, further scans within this window are sent as one digest at its end
+    ALERT_DIGEST_WINDOW_SECONDS: float = 300.0  # 0 sends every alert on its own
+
+    # Bulk unbound QR minting
+    QR_BULK_MAX_COUNT: int = 100000  # QRs per request
+    QR_BULK_BATCH_SIZE: int = 1000  # rows per INSERT/commit; ids are streamed after each commit
+
+    # Daily scan rollups - qr_scan_daily maintained from qr_usage by a background job
+    SCAN_ROLLUP_INTERVAL_SECONDS: float = 60.0  # 0 disables the job in this process
+    SCAN_ROLLUP_BATCH_SIZE: int = 5000  # qr_usage rows per transaction
+    SCAN_ROLLUP_SETTLE_SECONDS: float = 120.0  # must exceed the gap between INSERT and COMMIT of a scan row
+
+    # Admin table exports
+    EXPORT_BATCH_SIZE: int = 1000  # rows fetched from the server-side cursor and sent per chunk
+
+    # Scan history pages and area queries
+    SCAN_HISTORY_DEFAULT_LIMIT: int = 50
+    SCAN_HISTORY_MAX_LIMIT: int = 500
+    SCAN_AREA_MAX_RADIUS_M: float = 50000.0  # radius queries use a flat-earth approximation, fine at this scale
+
+    # QR images - server-rendered PNG/SVG codes and printable PDF sheets
+    QR_IMAGE_MIN_SIZE: int = 64  # pixels
+    QR_IMAGE_MAX_SIZE: int = 2048
+    QR_IMAGE_CACHE_MAX_ENTRIES: int = 1000  # rendered images per process; 0 disables the cache
+    QR_IMAGE_CACHE_TTL_SECONDS: float = 86400.0  # images never go stale, this only frees memory
+    QR_SHEET_MAX_CODES: int = 5000  # codes per sheet request
+    QR_SHEET_WORKERS: int = 0  # sheet rendering processes; 0 uses every core
+
+    # Scan view cache - permission-filtered public QR views, per process
+    SCAN_CACHE_MAX_ENTRIES: int = 10000  # 0 disables the cache
+    SCAN_CACHE_TTL_SECONDS: float = 60.0
+    SCAN_CACHE_NEGATIVE_TTL_SECONDS: float = 10.0  # unknown/inactive QR ids
+
+    # Authenticated user cache - UserLogin rows resolved from access tokens, per process
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10000  # 0 disables the cache
+    AUTH_USER_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_USER_CACHE_NEGATIVE_TTL_SECONDS: float = 10.0  # user ids with no account
+
+    # Scan debounce - repeat scans of a QR by the same client within the window are not recorded or alerted
+    SCAN_DEBOUNCE_SECONDS: float = 10.0  # 0 disables the debounce
+    SCAN_DEBOUNCE_BACKEND: str = "memory"  # memory (per process) or redis (shared; needs the redis package)
+    SCAN_DEBOUNCE_REDIS_URL: str = "redis://localhost:6379/0"
+    SCAN_DEBOUNCE_MAX_ENTRIES: int = 100000  # memory backend only
+    SCAN_DEBOUNCE_TRUSTED_PROXY_HOPS: int = 1  # proxies in front of the API that append to X-Forwarded-For; 0 ignores the header
+
+    # Scan write-behind - buffer QRUsage rows in memory and insert them in batches.
+    # Up to SCAN_WRITE_BEHIND_FLUSH_INTERVAL seconds of scans can be lost on a crash.
+    SCAN_WRITE_BEHIND_ENABLED: bool = False
+    SCAN_WRITE_BEHIND_BATCH_SIZE: int = 500
+    SCAN_WRITE_BEHIND_FLUSH_INTERVAL: float = 1.0  # seconds
+    SCAN_WRITE_BEHIND_MAX_PENDING: int = 50000  # scans beyond this are dropped
+
     class Config:
         env_file = ".env"
 
@@ -1,17 +1,68 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
+from app.db_metrics import api_pool_metrics, attach_query_counter, background_pool_metrics, timed_pool_class
 
-engine = create_engine(settings.DATABASE_URL)
+# Async drivers used by the API for each sync driver in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Derive the async (asyncpg) URL from the sync DATABASE_URL"""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    query = dict(parsed.query)
+    if drivername == "postgresql+asyncpg" and "sslmode" in query:
+        # asyncpg spells libpq's sslmode as ssl
+        query["ssl"] = query.pop("sslmode")
+    return parsed.set(drivername=drivername, query=query).render_as_string(hide_password=False)
+
+def get_pool_options(url: str, pool_class, metrics) -> dict:
+    """Pool settings from Settings; SQLite manages its own connections"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": timed_pool_class(pool_class, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Sync engine - Alembic migrations, background worker threads and scripts
+engine = create_engine(
+    settings.DATABASE_URL,
+    **get_pool_options(settings.DATABASE_URL, QueuePool, background_pool_metrics)
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+background_pool_metrics.attach(engine)
+attach_query_counter(engine, background_pool_metrics.name)
+
+# Async engine - API request handling
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **get_pool_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, api_pool_metrics)
+)
+api_pool_metrics.attach(async_engine.sync_engine)
+attach_query_counter(async_engine.sync_engine, api_pool_metrics.name)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
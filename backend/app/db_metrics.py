@@ -0,0 +1,275 @@
+"""
+Database metrics collected from SQLAlchemy engine and pool events.
+
+Each engine gets a PoolMetrics instance that counts connects, closes and
+invalidations (connection churn) and records how long callers waited to
+check a connection out of the pool. Statements executed while handling a
+request are counted and timed in a QueryStats object held in a context
+variable, so the access log can report them per request (and flag the same
+statement shape repeating, the N+1 pattern), and exported to Prometheus for
+all engines.
+"""
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects_total = 0
+        self.closes_total = 0
+        self.invalidations_total = 0
+        self.checkouts_total = 0
+        self.checkout_timeouts_total = 0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+
+    def observe_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts_total += 1
+            self.wait_count += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for index, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[index] += 1
+                    break
+
+    def observe_timeout(self):
+        with self._lock:
+            self.checkout_timeouts_total += 1
+
+    def _count(self, attribute: str):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def attach(self, engine):
+        """Listen to connection lifecycle events of engine's pool"""
+        pool = engine.pool
+        event.listen(pool, "connect", lambda *args: self._count("connects_total"))
+        event.listen(pool, "close", lambda *args: self._count("closes_total"))
+        event.listen(pool, "close_detached", lambda *args: self._count("closes_total"))
+        event.listen(pool, "invalidate", lambda *args: self._count("invalidations_total"))
+        event.listen(pool, "soft_invalidate", lambda *args: self._count("invalidations_total"))
+
+    def snapshot(self, pool) -> dict:
+        """Current pool occupancy plus the counters collected so far"""
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bound, count in zip(WAIT_BUCKETS, self.wait_buckets):
+                running += count
+                cumulative.append({"le": bound, "count": running})
+            cumulative.append({"le": "+Inf", "count": self.wait_count})
+            data = {
+                "connects_total": self.connects_total,
+                "closes_total": self.closes_total,
+                "invalidations_total": self.invalidations_total,
+                "checkouts_total": self.checkouts_total,
+                "checkout_timeouts_total": self.checkout_timeouts_total,
+                "checkout_wait_seconds": {
+                    "count": self.wait_count,
+                    "sum": round(self.wait_sum, 6),
+                    "max": round(self.wait_max, 6),
+                    "buckets": cumulative,
+                },
+            }
+        occupancy = {"status": pool.status()}
+        if hasattr(pool, "checkedout"):
+            occupancy.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+        return {**occupancy, **data}
+
+
+class _TimedPoolMixin:
+    """Times Pool.connect(), i.e. how long a caller waits for a connection"""
+
+    metrics = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+
+def timed_pool_class(base, metrics: PoolMetrics):
+    """
+    Subclass of pool class base that reports checkout waits to metrics.
+
+    The metrics are bound to the class rather than the instance so they
+    survive Pool.recreate(), e.g. after engine.dispose().
+    """
+    return type(f"Timed{base.__name__}", (_TimedPoolMixin, base), {"metrics": metrics})
+
+
+class QueryStats:
+    """Statements executed on behalf of one request"""
+
+    __slots__ = ("count", "seconds", "shapes")
+
+    def __init__(self, track_shapes: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        # statement shape -> executions; None when shapes are not tracked
+        self.shapes = {} if track_shapes else None
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        if self.shapes is not None and statement:
+            shape = statement_shape(statement)
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes executed more than threshold times, most frequent first"""
+        if not self.shapes:
+            return []
+        return sorted(
+            ((shape, count) for shape, count in self.shapes.items() if count > threshold),
+            key=lambda item: item[1],
+            reverse=True
+        )
+
+
+# One bind placeholder, with the type cast asyncpg adds to expanded IN
+# parameters, e.g. $1::UUID
+_PLACEHOLDER = r"(?:\$\d+|\?|%s|%\(\w+\)s)(?:::\w+(?:\[\])?)?"
+# A parenthesised list of bind placeholders, e.g. IN ($1::UUID, $2::UUID) or IN (?, ?)
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL with IN lists of any length collapsed, so N+1 variants compare equal"""
+    if " IN (" in statement:
+        return _PLACEHOLDER_LIST.sub("(...)", statement)
+    return statement
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_budgets: List["query_budget"] = []
+_budgets_lock = threading.Lock()
+
+
+def track_queries(track_shapes: bool = False):
+    """Start counting statements in the current context. Returns (stats, token for reset)."""
+    stats = QueryStats(track_shapes or bool(_budgets))
+    return stats, _query_stats.set(stats)
+
+
+def stop_tracking_queries(token):
+    _query_stats.reset(token)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+
+def report_request_queries(label: str, stats: QueryStats):
+    """Hand a finished request's statements to any active query_budget"""
+    if _budgets:
+        with _budgets_lock:
+            budgets = list(_budgets)
+        for budget in budgets:
+            budget.requests.append((label, stats))
+
+
+class query_budget:
+    """
+    Assert that every request handled inside the block ran at most
+    max_queries statements, e.g. in a test:
+
+        with query_budget(2):
+            client.get(f"/api/qr/scan/{qr_id}")
+
+    Raises QueryBudgetExceeded on exit, listing each offending request with
+    its statement shapes. Requests from any thread or event loop count, so
+    it works with TestClient as well as in-process ASGI clients.
+    """
+
+    def __init__(self, max_queries: int):
+        self.max_queries = max_queries
+        self.requests: List[Tuple[str, QueryStats]] = []
+
+    def __enter__(self) -> "query_budget":
+        with _budgets_lock:
+            _budgets.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with _budgets_lock:
+            _budgets.remove(self)
+        if exc_type is not None:
+            return False
+        over = [(label, stats) for label, stats in self.requests if stats.count > self.max_queries]
+        if over:
+            lines = [f"{len(over)} request(s) ran more than {self.max_queries} SQL statement(s):"]
+            for label, stats in over:
+                lines.append(f"  {label}: {stats.count} statements")
+                for shape, count in sorted((stats.shapes or {}).items(), key=lambda item: -item[1]):
+                    lines.append(f"    {count} x {' '.join(shape.split())}")
+            raise QueryBudgetExceeded("\n".join(lines))
+        return False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def attach_query_counter(engine, name: str):
+    """
+    Time every statement run on engine into the foundee_db_query_duration_seconds
+    histogram, and count it into the current request's QueryStats if any.
+    """
+    duration = DB_QUERY_DURATION.labels(engine=name)
+    errors = DB_QUERY_ERRORS.labels(engine=name)
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        duration.observe(elapsed)
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+    def handle_error(exception_context):
+        # Failed statements never reach after_cursor_execute
+        # (ExceptionContext.cursor is never filled in, so check for an execution)
+        conn = exception_context.connection
+        if conn is not None and exception_context.execution_context is not None:
+            errors.inc()
+            after_cursor_execute(conn, None, exception_context.statement, None, None, False)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+api_pool_metrics = PoolMetrics("api")
+background_pool_metrics = PoolMetrics("background")
@@ -0,0 +1,385 @@
+"""
+Durable outbox for scan alert emails.
+
+The scan path only records an EmailOutbox row in the same transaction as its
+QRUsage insert. A small pool of background workers drains the table, sending
+each alert through EmailService and retrying failures with exponential backoff.
+Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several workers and
+several API processes can drain the same table without sending an alert twice.
+A claim is a lease: next_attempt_dt moves EMAIL_OUTBOX_LEASE_SECONDS ahead and
+is committed before any SMTP work, so no row lock or database connection is
+held while a slow mail server answers. Rows whose worker dies before marking
+them come due again when the lease runs out, which makes delivery at least
+once; the lease has to exceed the time a batch can take to send.
+
+Alerts are coalesced per owner (to_email). An owner's first alert is sent
+straight away and opens an ALERT_DIGEST_WINDOW_SECONDS window. Alerts that
+come due while the window is open become kind "digest" and wait until it
+closes, then all go out as one message listing every scan. A burst of scans
+therefore costs at most two emails per window instead of one per scan.
+Workers in different processes claiming a burst at the same moment can each
+send one immediate alert.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from email.message import Message
+from typing import List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.email_service import email_service
+from app.logger import email_logger
+from app.models import EmailOutbox
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+KIND_ALERT = "alert"
+KIND_DIGEST = "digest"
+
+# Number of recent send latencies kept for percentile reporting
+LATENCY_SAMPLE_SIZE = 1000
+
+
+def enqueue_location_alert(
+    db: AsyncSession,
+    to_email: str,
+    qr_id: UUID,
+    latitude: Optional[str],
+    longitude: Optional[str],
+    crt_by: Optional[UUID] = None
+) -> EmailOutbox:
+    """Add a location alert to the outbox. The caller owns the commit."""
+    alert = EmailOutbox(
+        to_email=to_email,
+        kind=KIND_ALERT,
+        qr_id=qr_id,
+        latitude=latitude,
+        longitude=longitude,
+        status=STATUS_PENDING,
+        attempts=0,
+        next_attempt_dt=datetime.utcnow(),
+        crt_by=crt_by
+    )
+    db.add(alert)
+    return alert
+
+
+def _percentile(samples: list, pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+    return samples[index]
+
+
+class OutboxDispatcher:
+    """Pool of worker threads that deliver queued EmailOutbox rows"""
+
+    def __init__(self):
+        self.workers = settings.EMAIL_OUTBOX_WORKERS
+        self.poll_interval = settings.EMAIL_OUTBOX_POLL_INTERVAL
+        self.batch_size = settings.EMAIL_OUTBOX_BATCH_SIZE
+        self.max_attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        self.backoff_seconds = settings.EMAIL_OUTBOX_BACKOFF_SECONDS
+        self.backoff_max_seconds = settings.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS
+        self.lease = timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        self.digest_window = timedelta(seconds=settings.ALERT_DIGEST_WINDOW_SECONDS)
+
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+        self._sent_total = 0
+        self._failed_total = 0
+        self._retried_total = 0
+        self._messages_total = 0
+        self._digests_total = 0
+
+    def start(self):
+        """Start the worker threads (no-op when EMAIL_OUTBOX_WORKERS is 0)"""
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                name=f"email-outbox-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        email_logger.info("Email outbox started with %d worker(s)", self.workers)
+
+    def stop(self, timeout: float = 10.0):
+        """Signal the workers to finish their current batch and exit"""
+        if not self._threads:
+            return
+        self._stop.set()
+        self.notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        email_service.close()
+        email_logger.info("Email outbox stopped")
+
+    def notify(self):
+        """Wake idle workers, e.g. right after a scan committed a new alert"""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.process_next()
+            except Exception as e:
+                email_logger.error("Email outbox worker error: %s", e, exc_info=True)
+                processed = False
+            if not processed:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+
+    def process_next(self) -> bool:
+        """
+        Claim a batch of due alerts and deliver them over one SMTP session.
+
+        The claim (see _claim) is committed before sending, and the results
+        are recorded in a second transaction afterwards. Rows deferred into a
+        digest count as processed.
+
+        Returns:
+            True if any rows were processed, False if nothing was due
+        """
+        claimed = self._claim()
+        if claimed is None:
+            return False
+        if not claimed:
+            return True
+
+        started = time.perf_counter()
+        results = email_service.send_many([message for _, _, message in claimed])
+        elapsed = (time.perf_counter() - started) / len(claimed)
+
+        db = SessionLocal()
+        try:
+            ids = [alert_id for alert_ids, _, _ in claimed for alert_id in alert_ids]
+            alerts = {
+                alert.id: alert
+                for alert in db.query(EmailOutbox).filter(EmailOutbox.id.in_(ids)).with_for_update()
+            }
+            outcomes = []
+            for (alert_ids, _, _), error in zip(claimed, results):
+                for alert_id in alert_ids:
+                    alert = alerts[alert_id]
+                    self._mark(alert, error)
+                    outcomes.append((error is None, alert.status))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for sent, status in outcomes:
+            self._record(sent, status, elapsed)
+        with self._lock:
+            for (_, kind, _), error in zip(claimed, results):
+                if error is None:
+                    self._messages_total += 1
+                    if kind == KIND_DIGEST:
+                        self._digests_total += 1
+        return True
+
+    def _claim(self) -> Optional[List[Tuple[List[UUID], str, Message]]]:
+        """
+        Lock a batch of due alerts, plan their messages and lease the rows
+        that will be sent by pushing next_attempt_dt past the send, in one
+        committed transaction.
+
+        Returns:
+            (row ids, kind, message) per email to send, or None if nothing was due
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            alerts = db.query(EmailOutbox).filter(
+                EmailOutbox.status == STATUS_PENDING,
+                EmailOutbox.next_attempt_dt <= now
+            ).order_by(
+                EmailOutbox.next_attempt_dt
+            ).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            if not alerts:
+                db.rollback()
+                return None
+
+            claimed = []
+            for rows, message in self._plan(db, alerts, now):
+                for alert in rows:
+                    alert.next_attempt_dt = now + self.lease
+                claimed.append(([alert.id for alert in rows], rows[0].kind, message))
+            db.commit()
+            return claimed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _plan(self, db: Session, alerts: List[EmailOutbox], now: datetime) -> List[Tuple[List[EmailOutbox], Message]]:
+        """
+        Decide what to send for a claimed batch: (rows, message) per email.
+
+        Per owner, due digest rows go out together as one digest. New alerts
+        are sent on their own when the owner has no open digest window (only
+        the first one, which opens it); otherwise they are deferred to the
+        window's end as digest rows. Retries of an alert stay alerts.
+        """
+        by_owner = {}
+        for alert in alerts:
+            by_owner.setdefault(alert.to_email, []).append(alert)
+
+        if not self.digest_window:
+            return [([alert], self._build_alert(alert)) for alert in alerts]
+
+        # The rest of each owner's due digest, if the batch limit cut it off
+        digest_owners = [email for email, rows in by_owner.items() if any(row.kind == KIND_DIGEST for row in rows)]
+        if digest_owners:
+            claimed_ids = [alert.id for alert in alerts]
+            for alert in db.query(EmailOutbox).filter(
+                EmailOutbox.status == STATUS_PENDING,
+                EmailOutbox.kind == KIND_DIGEST,
+                EmailOutbox.to_email.in_(digest_owners),
+                EmailOutbox.next_attempt_dt <= now,
+                EmailOutbox.id.notin_(claimed_ids)
+            ).with_for_update(skip_locked=True):
+                by_owner[alert.to_email].append(alert)
+
+        # Owners whose window is open: an immediate alert went out within it
+        window_starts = dict(
+            db.query(EmailOutbox.to_email, func.max(EmailOutbox.sent_dt)).filter(
+                EmailOutbox.to_email.in_(list(by_owner)),
+                EmailOutbox.kind == KIND_ALERT,
+                EmailOutbox.status == STATUS_SENT,
+                EmailOutbox.sent_dt > now - self.digest_window
+            ).group_by(EmailOutbox.to_email).all()
+        )
+
+        deliveries = []
+        for email, rows in by_owner.items():
+            digest = sorted((row for row in rows if row.kind == KIND_DIGEST), key=lambda row: row.crt_dt)
+            if digest:
+                deliveries.append((digest, self._build_digest(email, digest)))
+
+            window_start = window_starts.get(email)
+            for alert in sorted((row for row in rows if row.kind == KIND_ALERT), key=lambda row: row.crt_dt):
+                if alert.attempts > 0 or window_start is None:
+                    deliveries.append(([alert], self._build_alert(alert)))
+                    if window_start is None:
+                        window_start = now
+                else:
+                    alert.kind = KIND_DIGEST
+                    alert.next_attempt_dt = window_start + self.digest_window
+        return deliveries
+
+    def _build_alert(self, alert: EmailOutbox) -> Message:
+        return email_service.build_location_alert(
+            to_email=alert.to_email,
+            qr_id=str(alert.qr_id),
+            latitude=alert.latitude,
+            longitude=alert.longitude,
+            scanned_at=alert.crt_dt
+        )
+
+    def _build_digest(self, email: str, rows: List[EmailOutbox]) -> Message:
+        if len(rows) == 1:
+            return self._build_alert(rows[0])
+        return email_service.build_location_digest(
+            to_email=email,
+            scans=[(str(row.qr_id), row.latitude, row.longitude, row.crt_dt) for row in rows]
+        )
+
+    def _mark(self, alert: EmailOutbox, error: Optional[str]):
+        """Record one send attempt; error is None if the message went out"""
+        alert.attempts += 1
+        if error is None:
+            alert.status = STATUS_SENT
+            alert.sent_dt = datetime.utcnow()
+            alert.last_error = None
+        elif alert.attempts >= self.max_attempts:
+            alert.status = STATUS_FAILED
+            alert.last_error = error[:1000]
+            email_logger.error("Giving up on outbox alert %s after %d attempts", alert.id, alert.attempts)
+        else:
+            delay = min(
+                self.backoff_seconds * (2 ** (alert.attempts - 1)),
+                self.backoff_max_seconds
+            )
+            alert.next_attempt_dt = datetime.utcnow() + timedelta(seconds=delay)
+            alert.last_error = error[:1000]
+            email_logger.warning("Outbox alert %s failed, retrying in %.0fs", alert.id, delay)
+
+    def _record(self, sent: bool, status: str, elapsed: float):
+        with self._lock:
+            self._latencies.append(elapsed)
+            if sent:
+                self._sent_total += 1
+            elif status == STATUS_FAILED:
+                self._failed_total += 1
+            else:
+                self._retried_total += 1
+
+    async def stats(self, db: AsyncSession) -> dict:
+        """Queue depth from the database plus in-process send counters"""
+        result = await db.execute(
+            select(EmailOutbox.status, func.count(EmailOutbox.id))
+            .where(EmailOutbox.status.in_([STATUS_PENDING, STATUS_FAILED]))
+            .group_by(EmailOutbox.status)
+        )
+        counts = dict(result.all())
+        oldest_pending = await db.scalar(
+            select(func.min(EmailOutbox.crt_dt)).where(EmailOutbox.status == STATUS_PENDING)
+        )
+
+        with self._lock:
+            samples = sorted(self._latencies)
+            sent_total = self._sent_total
+            failed_total = self._failed_total
+            retried_total = self._retried_total
+            messages_total = self._messages_total
+            digests_total = self._digests_total
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "workers": len(self._threads),
+            "queue_depth": counts.get(STATUS_PENDING, 0),
+            "failed": counts.get(STATUS_FAILED, 0),
+            "oldest_pending_age_seconds": (
+                (datetime.utcnow() - oldest_pending).total_seconds() if oldest_pending else None
+            ),
+            "sent_total": sent_total,
+            "failed_total": failed_total,
+            "retried_total": retried_total,
+            "messages_total": messages_total,
+            "digests_total": digests_total,
+            "digest_window_seconds": self.digest_window.total_seconds(),
+            "smtp_pool": email_service.pool.stats(),
+            "send_latency_ms": {
+                "count": len(samples),
+                "avg": ms(sum(samples) / len(samples)) if samples else None,
+                "p50": ms(_percentile(samples, 50)),
+                "p95": ms(_percentile(samples, 95)),
+                "p99": ms(_percentile(samples, 99)),
+            },
+        }
+
+
+outbox_dispatcher = OutboxDispatcher()
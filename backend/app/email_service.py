@@ -1,9 +1,150 @@
 import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.message import Message
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from app.config import settings
 from app.logger import email_logger
-from typing import Optional
+from app.metrics import SMTP_SEND_DURATION, SMTP_SEND_FAILURES
+from typing import List, Optional
+from datetime import datetime
+
+# Errors after which a fresh session is worth one more try
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of authenticated SMTP sessions.
+
+    A session is connected, upgraded with STARTTLS and logged in once, then
+    reused for later sends. Sessions idle for longer than idle_timeout are
+    closed; sessions idle for longer than health_check_after are probed with
+    NOOP before reuse and replaced if the server has dropped them.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        max_size: int = 2,
+        idle_timeout: float = 60.0,
+        health_check_after: float = 5.0,
+        timeout: float = 30.0,
+        use_tls: bool = True
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self.use_tls = use_tls
+
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = deque()  # (server, last_used) pairs, most recently used last
+        self._lock = threading.Lock()
+        self.connects_total = 0
+        self.reuses_total = 0
+        self.discards_total = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        email_logger.info(f"Connecting to SMTP server: {self.host}:{self.port}")
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                email_logger.info("SMTP connection established, starting TLS")
+                server.starttls()
+            if self.username:
+                email_logger.info(f"Logging in with user: {self.username}")
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        with self._lock:
+            self.connects_total += 1
+        return server
+
+    def _close(self, server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _is_healthy(self, server: smtplib.SMTP, last_used: float) -> bool:
+        idle_for = time.monotonic() - last_used
+        if idle_for > self.idle_timeout:
+            return False
+        if idle_for <= self.health_check_after:
+            return True
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            if self._is_healthy(server, last_used):
+                with self._lock:
+                    self.reuses_total += 1
+                return server
+            email_logger.info("Discarding stale SMTP session")
+            self._discard(server)
+        return self._connect()
+
+    def _discard(self, server: smtplib.SMTP):
+        with self._lock:
+            self.discards_total += 1
+        self._close(server)
+
+    @contextmanager
+    def session(self):
+        """
+        Borrow an authenticated session.
+
+        The session goes back to the pool when the block exits normally. If
+        the block raises, the session is in an unknown state and is dropped.
+        """
+        self._slots.acquire()
+        try:
+            server = self._checkout()
+            try:
+                yield server
+            except Exception:
+                self._discard(server)
+                raise
+            with self._lock:
+                self._idle.append((server, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """Close every idle session, e.g. on shutdown"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for server, _ in idle:
+            self._close(server)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "idle": len(self._idle),
+                "connects_total": self.connects_total,
+                "reuses_total": self.reuses_total,
+                "discards_total": self.discards_total,
+            }
 
 class EmailService:
     def __init__(self):
@@ -12,22 +153,30 @@ class EmailService:
         self.smtp_user = settings.SMTP_USERNAME
         self.smtp_password = settings.SMTP_PASSWORD
         self.email_from = settings.EMAIL_FROM
+        self.pool = SMTPConnectionPool(
+            host=self.smtp_host,
+            port=self.smtp_port,
+            username=self.smtp_user,
+            password=self.smtp_password,
+            max_size=settings.SMTP_POOL_SIZE,
+            idle_timeout=settings.SMTP_POOL_IDLE_TIMEOUT,
+            health_check_after=settings.SMTP_POOL_HEALTH_CHECK_AFTER,
+            timeout=settings.SMTP_TIMEOUT,
+            use_tls=settings.SMTP_USE_TLS
+        )
         email_logger.info("Email service initialized")
-    
-    def send_location_alert(
+
+    def build_location_alert(
         self,
         to_email: str,
         qr_id: str,
         latitude: Optional[str],
-        longitude: Optional[str]
-    ):
-        """Send location alert email to QR owner"""
-        email_logger.info("=== Send Location Alert Email Flow Started ===")
-        email_logger.info(f"Sending email to: {to_email}")
-        email_logger.info(f"QR ID: {qr_id}, Lat: {latitude}, Long: {longitude}")
-        
+        longitude: Optional[str],
+        scanned_at: Optional[datetime] = None
+    ) -> MIMEMultipart:
+        """Build the location alert message sent to a QR owner"""
         subject = "Foundee Alert: Your QR Code was Scanned"
-        
+
         location_text = "Location not available"
         if latitude and longitude:
             location_text = f"Latitude: {latitude}, Longitude: {longitude}"
@@ -35,59 +184,158 @@ class EmailService:
             email_logger.info("Location data included in email")
         else:
             email_logger.info("No location data available")
-        
+
         body = f"""
         Hello,
-        
+
         Your Foundee QR Code (ID: {qr_id}) was just scanned!
-        
+
         {location_text}
-        
-        Time: {self._get_current_time()}
-        
+
+        Time: {self._format_time(scanned_at)}
+
         If this was you, you can safely ignore this email.
-        
+
         Best regards,
         Foundee Team
         """
-        
-        try:
-            email_logger.info(f"Connecting to SMTP server: {self.smtp_host}:{self.smtp_port}")
-            
-            msg = MIMEMultipart()
-            msg['From'] = self.email_from
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                email_logger.info("SMTP connection established, starting TLS")
-                server.starttls()
-                
-                email_logger.info(f"Logging in with user: {self.smtp_user}")
-                server.login(self.smtp_user, self.smtp_password)
-                
-                email_logger.info("Sending email message")
-                server.send_message(msg)
-            
+
+        msg = MIMEMultipart()
+        msg['From'] = self.email_from
+        msg['To'] = to_email
+        msg['Subject'] = subject
+
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
+    def build_location_digest(
+        self,
+        to_email: str,
+        scans: List[tuple]
+    ) -> MIMEMultipart:
+        """
+        Build one message covering several scans, each a
+        (qr_id, latitude, longitude, scanned_at) tuple, oldest first
+        """
+        subject = f"Foundee Alert: Your QR Codes were Scanned {len(scans)} Times"
+
+        entries = []
+        for qr_id, latitude, longitude, scanned_at in scans:
+            entry = f"- {self._format_time(scanned_at)} - QR Code {qr_id}"
+            if latitude and longitude:
+                entry += f"\n          Latitude: {latitude}, Longitude: {longitude}"
+                entry += f"\n          Google Maps: https://www.google.com/maps?q={latitude},{longitude}"
+            else:
+                entry += "\n          Location not available"
+            entries.append(entry)
+        scan_list = "\n\n        ".join(entries)
+
+        body = f"""
+        Hello,
+
+        Your Foundee QR Codes were scanned {len(scans)} more times:
+
+        {scan_list}
+
+        If this was you, you can safely ignore this email.
+
+        Best regards,
+        Foundee Team
+        """
+
+        msg = MIMEMultipart()
+        msg['From'] = self.email_from
+        msg['To'] = to_email
+        msg['Subject'] = subject
+
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
+    def send_location_alert(
+        self,
+        to_email: str,
+        qr_id: str,
+        latitude: Optional[str],
+        longitude: Optional[str],
+        scanned_at: Optional[datetime] = None
+    ):
+        """Send location alert email to QR owner"""
+        email_logger.info("=== Send Location Alert Email Flow Started ===")
+        email_logger.info(f"Sending email to: {to_email}")
+        email_logger.info(f"QR ID: {qr_id}, Lat: {latitude}, Long: {longitude}")
+
+        msg = self.build_location_alert(to_email, qr_id, latitude, longitude, scanned_at)
+        sent = self.send_many([msg])[0] is None
+        if sent:
             email_logger.info(f"Email sent successfully to: {to_email}")
             email_logger.info("=== Send Location Alert Email Flow Completed ===")
-            return True
-            
-        except smtplib.SMTPAuthenticationError as e:
-            email_logger.error(f"SMTP authentication failed: {str(e)}", exc_info=True)
-            return False
-        except smtplib.SMTPException as e:
-            email_logger.error(f"SMTP error occurred: {str(e)}", exc_info=True)
-            return False
-        except Exception as e:
-            email_logger.error(f"Failed to send email: {str(e)}", exc_info=True)
-            return False
-    
-    def _get_current_time(self):
-        from datetime import datetime
-        return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+        return sent
 
-email_service = EmailService()
+    def send_many(self, messages: List[Message]) -> List[Optional[str]]:
+        """
+        Send several messages over a single pooled SMTP session.
+
+        If the session drops part-way through, the remaining messages are
+        retried once on a fresh session.
+
+        Returns:
+            Per message, in the same order: None if it was sent, otherwise
+            the error that stopped it
+        """
+        results = [None] * len(messages)
+        remaining = list(range(len(messages)))
+        reason = "error"
+        error = "Not sent"
 
+        for attempt in range(2):
+            if not remaining:
+                break
+            try:
+                with self.pool.session() as server:
+                    while remaining:
+                        index = remaining[0]
+                        try:
+                            email_logger.info("Sending email message")
+                            started = time.perf_counter()
+                            server.send_message(messages[index])
+                            SMTP_SEND_DURATION.observe(time.perf_counter() - started)
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                            # Rejected by the server; the session itself is still usable
+                            email_logger.error(f"SMTP server rejected message: {str(e)}")
+                            SMTP_SEND_FAILURES.labels(reason="rejected").inc()
+                            results[index] = f"SMTP server rejected message: {str(e)}"
+                        remaining.pop(0)
+            except smtplib.SMTPAuthenticationError as e:
+                email_logger.error(f"SMTP authentication failed: {str(e)}", exc_info=True)
+                reason = "auth"
+                error = f"SMTP authentication failed: {str(e)}"
+            except CONNECTION_ERRORS as e:
+                if attempt == 0:
+                    email_logger.warning(f"SMTP session lost, reconnecting: {str(e)}")
+                    continue
+                email_logger.error(f"Failed to send email: {str(e)}", exc_info=True)
+                reason = "connection"
+                error = f"SMTP connection failed: {str(e)}"
+            except smtplib.SMTPException as e:
+                email_logger.error(f"SMTP error occurred: {str(e)}", exc_info=True)
+                reason = "smtp"
+                error = f"SMTP error occurred: {str(e)}"
+            except Exception as e:
+                email_logger.error(f"Failed to send email: {str(e)}", exc_info=True)
+                reason = "error"
+                error = f"Failed to send email: {str(e)}"
+            break
+
+        if remaining:
+            SMTP_SEND_FAILURES.labels(reason=reason).inc(len(remaining))
+            for index in remaining:
+                results[index] = error
+        return results
+
+    def close(self):
+        self.pool.close_all()
+
+    def _format_time(self, moment: Optional[datetime] = None):
+        return (moment or datetime.utcnow()).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+email_service = EmailService()
@@ -1,29 +1,178 @@
-from cryptography.fernet import Fernet
+import hashlib
+import math
+import threading
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from sqlalchemy import String
+from sqlalchemy.orm import synonym
+from sqlalchemy.types import TypeDecorator
+from app.cache import MISSING, decrypt_cache
 from app.config import settings
-from typing import Optional
+from app.logger import db_logger
+from typing import List, Optional
+
+# Every Fernet token starts with the version byte 0x80
+TOKEN_PREFIX = "gAAAAA"
+
+def parse_keys(primary: Optional[str], legacy: Optional[str]) -> List[str]:
+    """Primary key first, then the comma-separated legacy keys, without blanks or duplicates"""
+    keys = []
+    for key in [primary or ""] + (legacy or "").split(","):
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
 
 class EncryptionService:
-    def __init__(self):
-        self.enabled = settings.ENCRYPTION_ENABLED
-        if self.enabled and settings.ENCRYPTION_KEY:
-            self.cipher = Fernet(settings.ENCRYPTION_KEY.encode())
+    """
+    Fernet encryption with key rotation.
+
+    ENCRYPTION_KEY is the primary key: everything is encrypted with it.
+    ENCRYPTION_LEGACY_KEYS lists older keys, which are only used to decrypt
+    values written before the last rotation. The reencryption job moves those
+    values to the primary key, after which the legacy keys can be dropped.
+    """
+
+    def __init__(self, primary_key: Optional[str] = None, legacy_keys: Optional[str] = None, enabled: Optional[bool] = None):
+        self.enabled = settings.ENCRYPTION_ENABLED if enabled is None else enabled
+        keys = parse_keys(
+            settings.ENCRYPTION_KEY if primary_key is None else primary_key,
+            settings.ENCRYPTION_LEGACY_KEYS if legacy_keys is None else legacy_keys
+        )
+        if self.enabled and keys:
+            self.primary = Fernet(keys[0].encode())
+            self.cipher = MultiFernet([self.primary] + [Fernet(key.encode()) for key in keys[1:]])
+            self.key_id = hashlib.sha256(keys[0].encode()).hexdigest()[:12]
+            self.legacy_key_count = len(keys) - 1
         else:
+            self.primary = None
             self.cipher = None
-    
+            self.key_id = None
+            self.legacy_key_count = 0
+        self._lock = threading.Lock()
+        self.decrypt_failures_total = 0
+
     def encrypt(self, data: str) -> str:
         """Encrypt data if encryption is enabled, otherwise return as-is"""
         if not self.enabled or not self.cipher or not data:
             return data
         return self.cipher.encrypt(data.encode()).decode()
-    
-    def decrypt(self, data: str) -> str:
-        """Decrypt data if encryption is enabled, otherwise return as-is"""
+
+    def decrypt(self, data: str) -> Optional[str]:
+        """
+        Decrypt data if encryption is enabled, otherwise return as-is.
+
+        Plaintext written before encryption was enabled is returned as-is
+        until the reencryption job encrypts it. A token that no configured
+        key can decrypt, e.g. after a key was dropped too early, gives None:
+        the ciphertext is never handed out as if it were the value.
+        """
         if not self.enabled or not self.cipher or not data:
             return data
+        if not data.startswith(TOKEN_PREFIX):
+            return data
         try:
             return self.cipher.decrypt(data.encode()).decode()
-        except Exception:
-            return data  # Return as-is if decryption fails
+        except InvalidToken:
+            # Never log the value itself
+            with self._lock:
+                self.decrypt_failures_total += 1
+            db_logger.warning("Decryption failed with all %d configured key(s); returning None", self.legacy_key_count + 1)
+            return None
+
+    def is_current(self, data: str) -> bool:
+        """True if data is a token encrypted with the primary key"""
+        if not self.primary or not data:
+            return False
+        try:
+            self.primary.decrypt(data.encode())
+            return True
+        except InvalidToken:
+            return False
+
+    def rotate(self, data: str) -> str:
+        """
+        Re-encrypt a token with the primary key.
+
+        Raises:
+            InvalidToken: if no configured key can decrypt data
+        """
+        if not self.enabled or not self.cipher or not data:
+            return data
+        return self.cipher.rotate(data.encode()).decode()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.cipher is not None,
+                "key_id": self.key_id,
+                "legacy_key_count": self.legacy_key_count,
+                "decrypt_failures_total": self.decrypt_failures_total,
+            }
 
 encryption_service = EncryptionService()
 
+def ciphertext_length(length: int) -> int:
+    """Longest token for a value of up to length characters (4 UTF-8 bytes each)"""
+    padded = (4 * length // 16 + 1) * 16
+    return 4 * math.ceil((57 + padded) / 3)  # version, timestamp, IV and HMAC add 57 bytes
+
+class Ciphertext(str):
+    """A value as stored by an EncryptedString column, not yet decrypted"""
+    __slots__ = ()
+
+class EncryptedString(TypeDecorator):
+    """
+    String column that is stored encrypted with encryption_service.
+
+    Values are encrypted when written. Loaded values stay encrypted, marked
+    as Ciphertext, until encrypted_field decrypts them on attribute access,
+    so fields a request never reads are never decrypted. length is the
+    plaintext length; the column is sized for the token.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def __init__(self, length: int):
+        super().__init__(ciphertext_length(length))
+        self.plaintext_length = length
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, Ciphertext):
+            return None if value is None else str(value)
+        return encryption_service.encrypt(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else Ciphertext(value)
+
+def decrypt_value(value: Optional[str]) -> Optional[str]:
+    """
+    Plaintext of a loaded Ciphertext, via decrypt_cache; other values are
+    returned as-is. None if no configured key can decrypt it; that is not
+    cached, so the value reads again once its key is configured.
+    """
+    if not isinstance(value, Ciphertext):
+        return value
+    if not value or encryption_service.cipher is None:
+        return str(value)
+    plaintext = decrypt_cache.get(value)
+    if plaintext is MISSING:
+        plaintext = encryption_service.decrypt(str(value))
+        if plaintext is not None:
+            decrypt_cache.set(value, plaintext)
+    return plaintext
+
+def encrypted_field(column_key: str):
+    """
+    Public attribute for the EncryptedString column mapped as column_key:
+    reads decrypt lazily, writes are encrypted at flush. In queries it stands
+    for the column, but encryption is randomized, so never filter on it.
+    """
+    def get(instance):
+        return decrypt_value(getattr(instance, column_key))
+
+    def put(instance, value):
+        setattr(instance, column_key, value)
+
+    return synonym(column_key, descriptor=property(get, put))
+
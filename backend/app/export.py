@@ -0,0 +1,97 @@
+"""
+Streaming table exports for offline analysis.
+
+Rows are read as plain Core tuples, not ORM objects, through a server-side
+cursor (AsyncSession.stream with yield_per), and each partition of
+EXPORT_BATCH_SIZE rows is formatted and sent before the next one is
+fetched. Memory use depends on the batch size only, never on the table size.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from uuid import UUID
+from sqlalchemy import select
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.logger import db_logger
+from app.models import QRDetails, QRUsage
+
+EXPORT_TABLES = {
+    "qr_usage": QRUsage.__table__,
+    "qr_dtls": QRDetails.__table__,
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_value(value):
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _format_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        ["" if value is None else _json_value(value) for value in row] for row in rows
+    )
+    return buffer.getvalue()
+
+
+def _format_ndjson(columns, rows) -> str:
+    return "".join(
+        json.dumps({column: _json_value(value) for column, value in zip(columns, row)}) + "\n"
+        for row in rows
+    )
+
+
+async def stream_export(
+    table_name: str,
+    fmt: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    compress: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    All rows of table_name created in [since, until) as CSV (with a header
+    row) or NDJSON. Rows come in no particular order: sorting would make the
+    database read the whole range before sending the first row. With
+    compress the output is one gzip stream, flushed per batch.
+    """
+    table = EXPORT_TABLES[table_name]
+    columns = [column.name for column in table.columns]
+    query = select(table)
+    if since is not None:
+        query = query.where(table.c.crt_dt >= since)
+    if until is not None:
+        query = query.where(table.c.crt_dt < until)
+    query = query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode()
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else data
+
+    if fmt == "csv":
+        yield encode(_format_csv([columns]))
+
+    exported = 0
+    # Own session: the body is streamed after the route handler has returned
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(query)
+        async for rows in result.partitions():
+            exported += len(rows)
+            yield encode(_format_csv(rows) if fmt == "csv" else _format_ndjson(columns, rows))
+
+    if compressor:
+        yield compressor.flush()
+    db_logger.info("Exported %d %s rows as %s%s", exported, table_name, fmt, ".gz" if compress else "")
@@ -0,0 +1,75 @@
+"""
+Scan location helpers.
+
+Scans keep the latitude/longitude strings they were submitted with (they go
+into alert emails as-is) plus numeric lat/lng columns, which are indexed
+with the QR id for area queries. Area queries are answered with plain range
+predicates on lat/lng, so they work on any database without PostGIS.
+"""
+import math
+from typing import Optional, Tuple
+from sqlalchemy import case
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def parse_location(latitude: Optional[str], longitude: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """Numeric (lat, lng) of a submitted location, or (None, None) if either part is missing or invalid"""
+    try:
+        lat, lng = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None, None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        # Also rejects NaN, which compares false with everything
+        return None, None
+    return lat, lng
+
+
+def wrap_lng(lng: float) -> float:
+    """Longitude moved into [-180, 180)"""
+    return (lng + 180.0) % 360.0 - 180.0
+
+
+def radius_box(lat: float, lng: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """
+    (min_lat, max_lat, min_lng, max_lng) enclosing the circle. Longitudes are
+    wrapped, so min_lng > max_lng means the box crosses the antimeridian, as
+    for the bounding boxes area queries accept. A circle that reaches a pole
+    spans all longitudes.
+    """
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    # Scaled for the latitude farthest from the equator, like within_radius
+    cos_lat = math.cos(math.radians(min(90.0, abs(lat) + dlat)))
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if cos_lat < 1e-9 or dlat / cos_lat >= 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    dlng = dlat / cos_lat
+    return min_lat, max_lat, wrap_lng(lng - dlng), wrap_lng(lng + dlng)
+
+
+def within_radius(lat_column, lng_column, lat: float, lng: float, radius_m: float):
+    """
+    SQL condition for points within about radius_m of (lat, lng), using a
+    flat-earth approximation that is plain arithmetic and runs on any database.
+    Longitude differences are taken the short way round the antimeridian and
+    scaled for the latitude farthest from the equator within the radius, so
+    the condition never excludes a point that is within it; check exact
+    distances with distance_m.
+    """
+    radius_deg = math.degrees(radius_m / EARTH_RADIUS_M)
+    lng_scale = math.cos(math.radians(min(90.0, abs(lat) + radius_deg)))
+    dlat = lat_column - lat
+    dlng = lng_column - lng
+    # Both longitudes are within [-180, 180], so one turn is enough
+    dlng = case((dlng > 180.0, dlng - 360.0), (dlng < -180.0, dlng + 360.0), else_=dlng) * lng_scale
+    return dlat * dlat + dlng * dlng <= radius_deg * radius_deg * 1.01
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle (haversine) distance in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
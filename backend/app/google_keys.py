@@ -0,0 +1,252 @@
+"""
+Google ID token verification against cached signing keys.
+
+Google publishes the keys that sign its ID tokens as a JWKS document whose
+Cache-Control max-age says how long it may be reused. GoogleKeyCache keeps
+that document in memory, refreshes it from a background thread shortly before
+it expires, and verifies tokens locally, so a login makes no HTTP call.
+
+Keys come from a KeySource. HTTPKeySource fetches Google's JWKS endpoint;
+StaticKeySource serves a fixed JWKS for tests and benchmarks:
+
+    google_key_cache.set_source(StaticKeySource({"keys": [public_jwk]}))
+"""
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+import requests
+from jose import JWTError, jwt
+from app.config import settings
+from app.logger import auth_logger
+
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class GoogleTokenError(ValueError):
+    """ID token is malformed, signed by an unknown key or has invalid claims"""
+
+
+def parse_max_age(cache_control: Optional[str], age: Optional[str] = None) -> Optional[float]:
+    """Seconds a response may still be reused according to Cache-Control and Age"""
+    if not cache_control:
+        return None
+    lowered = cache_control.lower()
+    if "no-store" in lowered or "no-cache" in lowered:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if not match:
+        return None
+    max_age = float(match.group(1))
+    if age and age.strip().isdigit():
+        max_age -= float(age)
+    return max(0.0, max_age)
+
+
+class KeySource(ABC):
+    """Where signing keys come from. fetch() returns (jwks, max_age or None)."""
+
+    @abstractmethod
+    def fetch(self) -> Tuple[dict, Optional[float]]:
+        ...
+
+
+class HTTPKeySource(KeySource):
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def fetch(self) -> Tuple[dict, Optional[float]]:
+        response = self._session.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        max_age = parse_max_age(response.headers.get("Cache-Control"), response.headers.get("Age"))
+        return response.json(), max_age
+
+
+class StaticKeySource(KeySource):
+    """Fixed JWKS, e.g. the public half of a key generated by a test"""
+
+    def __init__(self, jwks: dict, max_age: Optional[float] = None):
+        self.jwks = jwks
+        self.max_age = max_age
+        self.fetches_total = 0
+
+    def fetch(self) -> Tuple[dict, Optional[float]]:
+        self.fetches_total += 1
+        return self.jwks, self.max_age
+
+
+class GoogleKeyCache:
+    def __init__(
+        self,
+        source: KeySource,
+        audience: str,
+        default_ttl: float,
+        refresh_margin: float,
+        min_refresh_interval: float
+    ):
+        self.source = source
+        self.audience = audience
+        self.default_ttl = default_ttl
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+
+        self._keys = {}  # kid -> JWK
+        self._expires_at = 0.0
+        self._last_fetch = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.fetches_total = 0
+        self.fetch_errors_total = 0
+        self.unknown_kid_total = 0
+
+    def set_source(self, source: KeySource):
+        """Swap the key source and drop keys loaded from the previous one"""
+        with self._lock:
+            self.source = source
+            self._keys = {}
+            self._expires_at = 0.0
+            self._last_fetch = None
+            self._last_attempt = None
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="google-keys", daemon=True)
+        self._thread.start()
+        auth_logger.info("Google signing key refresher started")
+
+    def stop(self, timeout: float = 5.0):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+        auth_logger.info("Google signing key refresher stopped")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                delay = max(self.min_refresh_interval, self._expires_at - time.monotonic() - self.refresh_margin)
+            except Exception as e:
+                auth_logger.warning(f"Google signing key refresh failed: {str(e)}")
+                delay = self.min_refresh_interval
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Fetch keys if the cached set is due for refresh (or force is set).
+        Concurrent callers share a single fetch. Returns True if keys were fetched.
+        """
+        with self._fetch_lock:
+            now = time.monotonic()
+            if not force and self._keys and now < self._expires_at - self.refresh_margin:
+                return False
+            with self._lock:
+                self._last_attempt = now
+            try:
+                jwks, max_age = self.source.fetch()
+            except Exception:
+                with self._lock:
+                    self.fetch_errors_total += 1
+                raise
+            keys = {key["kid"]: key for key in jwks.get("keys", []) if "kid" in key}
+            ttl = self.default_ttl if max_age is None else max_age
+            with self._lock:
+                self._keys = keys
+                self._expires_at = now + ttl
+                self._last_fetch = now
+                self.fetches_total += 1
+            auth_logger.info(f"Loaded {len(keys)} Google signing key(s), valid for {ttl:.0f}s")
+            return True
+
+    def get_key(self, kid: str) -> dict:
+        with self._lock:
+            key = self._keys.get(kid)
+            expired = time.monotonic() >= self._expires_at
+        if key is not None and not expired:
+            return key
+
+        if key is None:
+            with self._lock:
+                if self._keys:
+                    self.unknown_kid_total += 1
+                recently = (
+                    self._last_attempt is not None
+                    and time.monotonic() - self._last_attempt < self.min_refresh_interval
+                )
+            # Google may have rotated keys before our copy expired; refetch, but
+            # not more than once per min_refresh_interval for bogus kids
+            if recently:
+                raise GoogleTokenError(f"Unknown Google signing key: {kid}")
+        try:
+            self.refresh(force=key is None)
+        except Exception as e:
+            if key is None:
+                raise GoogleTokenError(f"Could not load Google signing keys: {str(e)}")
+            # Keys are past max-age but Google overlaps rotations, so keep using them
+            auth_logger.warning(f"Google signing key refresh failed, using cached keys: {str(e)}")
+            return key
+
+        with self._lock:
+            key = self._keys.get(kid)
+        if key is None:
+            raise GoogleTokenError(f"Unknown Google signing key: {kid}")
+        return key
+
+    def verify(self, token: str) -> dict:
+        """Verify signature, audience, issuer and expiry of a Google ID token and return its claims"""
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise GoogleTokenError(f"Malformed ID token: {str(e)}")
+        kid = header.get("kid")
+        if not kid:
+            raise GoogleTokenError("ID token has no key id")
+        key = self.get_key(kid)
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=[key.get("alg", "RS256")],
+                audience=self.audience,
+                issuer=GOOGLE_ISSUERS,
+                options={"verify_at_hash": False}
+            )
+        except JWTError as e:
+            raise GoogleTokenError(str(e))
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "keys": len(self._keys),
+                "expires_in_seconds": round(self._expires_at - now, 1) if self._keys else None,
+                "last_fetch_age_seconds": round(now - self._last_fetch, 1) if self._last_fetch is not None else None,
+                "fetches_total": self.fetches_total,
+                "fetch_errors_total": self.fetch_errors_total,
+                "unknown_kid_total": self.unknown_kid_total,
+            }
+
+
+google_key_cache = GoogleKeyCache(
+    source=HTTPKeySource(settings.GOOGLE_CERTS_URL),
+    audience=settings.GOOGLE_CLIENT_ID,
+    default_ttl=settings.GOOGLE_CERTS_DEFAULT_TTL_SECONDS,
+    refresh_margin=settings.GOOGLE_CERTS_REFRESH_MARGIN_SECONDS,
+    min_refresh_interval=settings.GOOGLE_CERTS_MIN_REFRESH_INTERVAL_SECONDS
+)
@@ -1,11 +1,21 @@
 """
 Centralized logging configuration for Foundee application
+
+All foundee loggers share one set of handlers: console, a rotating log file
+and a rotating error file (access log lines go to their own console and file
+handlers instead). With LOG_ASYNC enabled (the default) loggers only
+put records on an in-memory queue, and a single QueueListener thread formats
+them and writes them out, so request handlers never wait on disk or stdout.
 """
+import atexit
 import logging
+import queue
 import sys
 from pathlib import Path
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional
+from app.config import settings
 
 # Create logs directory if it doesn't exist
 LOGS_DIR = Path(__file__).parent.parent / "logs"
@@ -15,33 +25,55 @@ LOGS_DIR.mkdir(exist_ok=True)
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-def setup_logger(name: str, level: int = logging.INFO) -> logging.Logger:
+# Access log records are already JSON lines and get their own handlers
+ACCESS_LOGGER_NAME = "foundee.access"
+
+_handlers: Optional[List[logging.Handler]] = None
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+class _DeferredQueueHandler(QueueHandler):
     """
-    Set up logger with file and console handlers
-    
-    Args:
-        name: Logger name (typically __name__)
-        level: Logging level
-        
-    Returns:
-        Configured logger instance
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() runs the full Formatter (timestamp, traceback) on the
+    calling thread. Only the message arguments are merged here, because they
+    may be mutated once the logging call returns.
     """
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    
-    # Avoid duplicate handlers
-    if logger.handlers:
-        return logger
-    
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _ExcludeFilter(logging.Filter):
+    """Rejects records from the named logger and its children"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not super().filter(record)
+
+
+def _build_handlers() -> List[logging.Handler]:
+    """
+    Handlers shared by every logger: console, log file and error file, plus
+    console and file handlers for the access log. Filters route access
+    records to the access handlers only.
+    """
+    global _handlers
+    if _handlers is not None:
+        return _handlers
+
     # Create formatter
     formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
-    
+    app_only = _ExcludeFilter(ACCESS_LOGGER_NAME)
+    access_only = logging.Filter(ACCESS_LOGGER_NAME)
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+
     # File handler - rotating log file
     today = datetime.now().strftime("%Y-%m-%d")
     file_handler = RotatingFileHandler(
@@ -49,10 +81,8 @@ def setup_logger(name: str, level: int = logging.INFO) -> logging.Logger:
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5
     )
-    file_handler.setLevel(level)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+
     # Error file handler - separate file for errors only
     error_handler = RotatingFileHandler(
         LOGS_DIR / f"foundee_errors_{today}.log",
@@ -61,8 +91,70 @@ def setup_logger(name: str, level: int = logging.INFO) -> logging.Logger:
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
-    logger.addHandler(error_handler)
-    
+
+    for handler in (console_handler, file_handler, error_handler):
+        handler.addFilter(app_only)
+
+    # Access log - one JSON object per line
+    access_formatter = logging.Formatter("%(message)s")
+    access_console_handler = logging.StreamHandler(sys.stdout)
+    access_file_handler = RotatingFileHandler(
+        LOGS_DIR / f"foundee_access_{today}.log",
+        maxBytes=10*1024*1024,  # 10MB
+        backupCount=5
+    )
+    for handler in (access_console_handler, access_file_handler):
+        handler.setFormatter(access_formatter)
+        handler.addFilter(access_only)
+
+    _handlers = [console_handler, file_handler, error_handler, access_console_handler, access_file_handler]
+    return _handlers
+
+
+def _get_queue_handler() -> QueueHandler:
+    """The queue handler feeding the background listener, started on first use"""
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        log_queue = queue.SimpleQueue()
+        _queue_handler = _DeferredQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+    return _queue_handler
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(name: str, level: int = logging.INFO) -> logging.Logger:
+    """
+    Set up logger with file and console handlers
+
+    Args:
+        name: Logger name (typically __name__)
+        level: Logging level
+
+    Returns:
+        Configured logger instance
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+
+    # Avoid duplicate handlers
+    if logger.handlers:
+        return logger
+
+    if settings.LOG_ASYNC:
+        logger.addHandler(_get_queue_handler())
+    else:
+        for handler in _build_handlers():
+            logger.addHandler(handler)
+
     return logger
 
 # Create default loggers for different modules
@@ -71,4 +163,4 @@ qr_logger = setup_logger("foundee.qr")
 user_logger = setup_logger("foundee.user")
 db_logger = setup_logger("foundee.database")
 email_logger = setup_logger("foundee.email")
-
+access_logger = setup_logger(ACCESS_LOGGER_NAME)
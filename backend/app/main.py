@@ -1,9 +1,17 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.routes import auth, qr, user
+from app.middleware import AccessLogMiddleware, MetricsMiddleware, QueryCountMiddleware
+from app.metrics import CONTENT_TYPE_LATEST, render_metrics
+from app.routes import auth, qr, user, admin
+from app.email_outbox import outbox_dispatcher
+from app.scan_buffer import scan_buffer
+from app.scan_rollup import scan_rollup
+from app.reencryption import reencryptor
+from app.google_keys import google_key_cache
+from app.qr_render import sheet_renderer
+import hmac
 import logging
-import time
 
 # Set up main application logger
 app_logger = logging.getLogger("foundee.main")
@@ -24,30 +32,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Request logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    
-    # Log incoming request
-    app_logger.info(f">>> Incoming Request: {request.method} {request.url.path}")
-    app_logger.info(f">>> Client: {request.client.host if request.client else 'Unknown'}")
-    
-    # Process request
-    response = await call_next(request)
-    
-    # Calculate request duration
-    duration = time.time() - start_time
-    
-    # Log response
-    app_logger.info(f"<<< Response: {response.status_code} | Duration: {duration:.3f}s")
-    
-    return response
+# Prometheus request metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Access log - one JSON line per request
+if settings.ACCESS_LOG_ENABLED:
+    app.add_middleware(AccessLogMiddleware, sample_rate=settings.ACCESS_LOG_SAMPLE_RATE)
+
+# SQL statements per request - outermost, so the middlewares above can read the counts
+app.add_middleware(
+    QueryCountMiddleware,
+    debug=settings.DEBUG,
+    repeat_threshold=settings.DB_REPEATED_QUERY_THRESHOLD
+)
 
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(qr.router, prefix="/api")
 app.include_router(user.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 @app.on_event("startup")
 async def startup_event():
@@ -57,12 +61,23 @@ async def startup_event():
     app_logger.info(f"📌 Environment: {settings.FRONTEND_URL}")
     app_logger.info(f"📌 Owner: Gaurang Kothari (X Googler)")
     app_logger.info("=" * 80)
+    outbox_dispatcher.start()
+    scan_buffer.start()
+    scan_rollup.start()
+    reencryptor.start()
+    google_key_cache.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     app_logger.info("=" * 80)
     app_logger.info("🛑 Foundee API Shutting Down")
     app_logger.info("=" * 80)
+    google_key_cache.stop()
+    sheet_renderer.stop()
+    reencryptor.stop()
+    scan_rollup.stop()
+    scan_buffer.stop()
+    outbox_dispatcher.stop()
 
 @app.get("/")
 def root():
@@ -78,3 +93,13 @@ def health_check():
     app_logger.debug("Health check endpoint accessed")
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Prometheus scrape endpoint"""
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    if settings.METRICS_BEARER_TOKEN and not hmac.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {settings.METRICS_BEARER_TOKEN}"
+    ):
+        return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return Response(render_metrics(), headers={"Content-Type": CONTENT_TYPE_LATEST})
@@ -0,0 +1,115 @@
+"""
+Prometheus metrics, served in the text exposition format at /metrics.
+
+With several API worker processes, set the PROMETHEUS_MULTIPROC_DIR
+environment variable to an empty, writable directory before the app starts
+(start.sh clears it). Every process then writes its samples to files there
+and a scrape of any worker aggregates all of them. Without it, each process
+reports only its own samples.
+
+Label values are kept bounded: routes are labelled by their template, and
+per-QR scan counters stop adding new qr_id series after
+METRICS_QR_SCAN_MAX_SERIES distinct QRs per process (later ones count under
+qr_id="other").
+"""
+import os
+import threading
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from app.config import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HTTP_REQUESTS = Counter(
+    "foundee_http_requests_total",
+    "HTTP requests by route template and response status",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "foundee_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+
+DB_QUERY_DURATION = Histogram(
+    "foundee_db_query_duration_seconds",
+    "SQL statement execution time; the count is the number of statements",
+    ["engine"],
+    buckets=DB_BUCKETS
+)
+DB_QUERY_ERRORS = Counter(
+    "foundee_db_query_errors_total",
+    "SQL statements that raised an error",
+    ["engine"]
+)
+
+SMTP_SEND_DURATION = Histogram(
+    "foundee_smtp_send_duration_seconds",
+    "Time to hand one message to the SMTP server; the count is messages sent",
+    buckets=LATENCY_BUCKETS
+)
+SMTP_SEND_FAILURES = Counter(
+    "foundee_smtp_send_failures_total",
+    "Messages that could not be sent, by reason",
+    ["reason"]
+)
+
+CACHE_REQUESTS = Counter(
+    "foundee_cache_requests_total",
+    "In-memory cache lookups by result",
+    ["cache", "result"]
+)
+CACHE_EVICTIONS = Counter(
+    "foundee_cache_evictions_total",
+    "Entries removed from an in-memory cache to stay within max_entries",
+    ["cache"]
+)
+
+QR_SCANS = Counter(
+    "foundee_qr_scans_total",
+    "Successful QR scans per QR code",
+    ["qr_id"]
+)
+QR_SCAN_REPEATS = Counter(
+    "foundee_qr_scan_repeats_total",
+    "Scans answered without recording them, as repeats within the debounce window"
+)
+
+_scan_series = {}
+_scan_series_lock = threading.Lock()
+_other_scans = QR_SCANS.labels(qr_id="other")
+
+
+def record_scan(qr_id, repeat: bool = False) -> None:
+    """Count a scan of qr_id, within the per-process series limit"""
+    if repeat:
+        QR_SCAN_REPEATS.inc()
+        return
+    key = str(qr_id)
+    child = _scan_series.get(key)
+    if child is None:
+        if len(_scan_series) >= settings.METRICS_QR_SCAN_MAX_SERIES:
+            child = _other_scans
+        else:
+            with _scan_series_lock:
+                child = _scan_series.setdefault(key, QR_SCANS.labels(qr_id=key))
+    child.inc()
+
+
+def render_metrics() -> bytes:
+    """All metrics in the Prometheus text format, across workers in multiprocess mode"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
@@ -0,0 +1,146 @@
+"""
+ASGI middleware.
+
+All middlewares are plain ASGI rather than @app.middleware("http")
+(BaseHTTPMiddleware), so they add no extra task or response streaming layer
+to each request.
+"""
+import json
+import random
+import time
+from datetime import datetime
+from app.db_metrics import current_query_stats, report_request_queries, stop_tracking_queries, track_queries
+from app.logger import access_logger, db_logger
+from app.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+
+class QueryCountMiddleware:
+    """
+    Counts the SQL statements each HTTP request runs (see db_metrics.QueryStats).
+
+    Install it outside the other middlewares so they can read the counts with
+    current_query_stats(). With debug set, responses carry X-DB-Queries and
+    X-DB-Time (milliseconds) headers; statements run after the response has
+    started, e.g. when the session closes, are not included in them. A request
+    that runs the same statement shape more than repeat_threshold times is
+    logged as a likely N+1 (0 disables the check).
+    """
+
+    def __init__(self, app, debug: bool = False, repeat_threshold: int = 0):
+        self.app = app
+        self.debug = debug
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = track_queries(track_shapes=self.repeat_threshold > 0)
+
+        async def send_wrapper(message):
+            if self.debug and message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-queries", str(stats.count).encode()),
+                    (b"x-db-time", f"{stats.seconds * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stop_tracking_queries(token)
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            label = f"{scope['method']} {route}"
+            if self.repeat_threshold > 0:
+                for shape, count in stats.repeated(self.repeat_threshold):
+                    db_logger.warning(
+                        "Possible N+1: %s ran the same statement %d times: %s", label, count, " ".join(shape.split())
+                    )
+            report_request_queries(label, stats)
+
+
+class AccessLogMiddleware:
+    """
+    Writes one JSON line per HTTP request: method, route template, status,
+    duration, database statements and client address.
+
+    Successful responses (status below 400) are logged with probability
+    sample_rate. Errors and unhandled exceptions are always logged.
+    """
+
+    def __init__(self, app, sample_rate: float = 1.0):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if status_code >= 400 or self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+                # FastAPI puts the matched route in the scope; its path is the
+                # template (/api/qr/scan/{qr_id}), which keeps ids out of the log
+                route = scope.get("route")
+                client = scope.get("client")
+                stats = current_query_stats()
+                entry = {
+                    "time": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+                    "method": scope["method"],
+                    "route": getattr(route, "path", None),
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "db_queries": stats.count if stats else None,
+                    "db_ms": round(stats.seconds * 1000, 2) if stats else None,
+                    "client": client[0] if client else None,
+                }
+                if route is None:
+                    # No route matched (404s, CORS preflights)
+                    entry["path"] = scope["path"]
+                access_logger.info(json.dumps(entry))
+
+
+class MetricsMiddleware:
+    """
+    Records request count by status and latency per route template for
+    Prometheus. Requests that match no route are labelled "unmatched", so
+    probes of random paths cannot create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route_path, str(status_code)).inc()
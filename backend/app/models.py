@@ -1,9 +1,17 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Boolean, Date, DateTime, Float, ForeignKey, Integer, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
 import uuid
 from app.database import Base
+from app.encryption import EncryptedString, encrypted_field
+
+def as_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; convert aware values (e.g. query parameters) to match"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
 
 class UserLogin(Base):
     __tablename__ = "user_login"
@@ -26,15 +34,26 @@ class UserDetails(Base):
     __tablename__ = "user_dtls"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("user_login.id"), nullable=False)  # Removed unique=True for one-to-many
-    first_name = Column(String(100), nullable=True)
-    last_name = Column(String(100), nullable=True)
-    mobile_no = Column(String(20), nullable=True)
-    address = Column(String(500), nullable=True)
-    email_id = Column(String(100), nullable=True)
-    blood_grp = Column(String(10), nullable=True)
-    company_name = Column(String(200), nullable=True)
-    description = Column(String(1000), nullable=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("user_login.id"), nullable=False, index=True)  # Removed unique=True for one-to-many
+
+    # Profile fields are stored encrypted; the public names decrypt on access
+    _first_name = Column("first_name", EncryptedString(100), nullable=True)
+    _last_name = Column("last_name", EncryptedString(100), nullable=True)
+    _mobile_no = Column("mobile_no", EncryptedString(20), nullable=True)
+    _address = Column("address", EncryptedString(500), nullable=True)
+    _email_id = Column("email_id", EncryptedString(100), nullable=True)
+    _blood_grp = Column("blood_grp", EncryptedString(10), nullable=True)
+    _company_name = Column("company_name", EncryptedString(200), nullable=True)
+    _description = Column("description", EncryptedString(1000), nullable=True)
+    first_name = encrypted_field("_first_name")
+    last_name = encrypted_field("_last_name")
+    mobile_no = encrypted_field("_mobile_no")
+    address = encrypted_field("_address")
+    email_id = encrypted_field("_email_id")
+    blood_grp = encrypted_field("_blood_grp")
+    company_name = encrypted_field("_company_name")
+    description = encrypted_field("_description")
+
     active_flag = Column(Boolean, default=True, nullable=False)
     crt_dt = Column(DateTime, default=datetime.utcnow, nullable=False)
     crt_by = Column(UUID(as_uuid=True), nullable=True)
@@ -49,7 +68,7 @@ class QRDetails(Base):
     __tablename__ = "qr_dtls"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_dtls_id = Column(UUID(as_uuid=True), ForeignKey("user_dtls.id"), nullable=True)  # Changed to reference user_dtls.id
+    user_dtls_id = Column(UUID(as_uuid=True), ForeignKey("user_dtls.id"), nullable=True, index=True)  # Changed to reference user_dtls.id
     first_name = Column(Boolean, default=True, nullable=False)
     last_name = Column(Boolean, default=True, nullable=False)
     mobile_no = Column(Boolean, default=True, nullable=False)
@@ -70,17 +89,85 @@ class QRDetails(Base):
 
 class QRUsage(Base):
     __tablename__ = "qr_usage"
+    __table_args__ = (
+        # Scan history, newest first per QR; also serves lookups by qr_id alone
+        Index("ix_qr_usage_qr_id_crt_dt_id", "qr_id", "crt_dt", "id"),
+        # Area queries per QR (see app.geo)
+        Index("ix_qr_usage_qr_id_lat_lng", "qr_id", "lat", "lng", postgresql_where=text("lat IS NOT NULL")),
+        # Scan rollup watermark (see app.scan_rollup)
+        Index("ix_qr_usage_ins_dt_id", "ins_dt", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     qr_id = Column(UUID(as_uuid=True), ForeignKey("qr_dtls.id"), nullable=False)
     latitude = Column(String(50), nullable=True)
     longitude = Column(String(50), nullable=True)
+    lat = Column(Float, nullable=True)  # parsed from latitude/longitude; NULL if they are missing or invalid
+    lng = Column(Float, nullable=True)
     active_flag = Column(Boolean, default=True, nullable=False)
-    crt_dt = Column(DateTime, default=datetime.utcnow, nullable=False)
+    crt_dt = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     crt_by = Column(UUID(as_uuid=True), nullable=True)
     lst_updt_dt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     lst_updt_by = Column(UUID(as_uuid=True), nullable=True)
+    ins_dt = Column(DateTime, default=datetime.utcnow, nullable=False)  # when the row was inserted; crt_dt is when the scan happened
     
     # Relationships
     qr = relationship("QRDetails", back_populates="qr_usage")
 
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_dt",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        # Start of an owner's digest window: their latest immediate alert
+        Index(
+            "ix_email_outbox_to_email_alert_sent",
+            "to_email",
+            "sent_dt",
+            postgresql_where=text("kind = 'alert' AND status = 'sent'"),
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    to_email = Column(String(100), nullable=False)
+    kind = Column(String(20), default="alert", server_default="alert", nullable=False)  # alert (sent on its own), digest
+    qr_id = Column(UUID(as_uuid=True), ForeignKey("qr_dtls.id"), nullable=False)
+    latitude = Column(String(50), nullable=True)
+    longitude = Column(String(50), nullable=True)
+    status = Column(String(20), default="pending", nullable=False)  # pending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_dt = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String(1000), nullable=True)
+    sent_dt = Column(DateTime, nullable=True)
+    active_flag = Column(Boolean, default=True, nullable=False)
+    crt_dt = Column(DateTime, default=datetime.utcnow, nullable=False)
+    crt_by = Column(UUID(as_uuid=True), nullable=True)
+    lst_updt_dt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    lst_updt_by = Column(UUID(as_uuid=True), nullable=True)
+
+class QRScanDaily(Base):
+    """Scans per QR per UTC day, maintained from qr_usage by the scan_rollup job"""
+    __tablename__ = "qr_scan_daily"
+
+    qr_id = Column(UUID(as_uuid=True), ForeignKey("qr_dtls.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    scan_count = Column(Integer, default=0, nullable=False)
+    first_scan_dt = Column(DateTime, nullable=False)
+    last_scan_dt = Column(DateTime, nullable=False)
+    lst_updt_dt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class JobWatermark(Base):
+    """
+    Progress of a resumable background job, one row per job: the keyset
+    position (position_dt, position_id) of the last row it has processed
+    """
+    __tablename__ = "job_watermark"
+
+    name = Column(String(50), primary_key=True)
+    position_dt = Column(DateTime, nullable=True)
+    position_id = Column(UUID(as_uuid=True), nullable=True)
+    crt_dt = Column(DateTime, default=datetime.utcnow, nullable=False)
+    lst_updt_dt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
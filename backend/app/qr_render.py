@@ -0,0 +1,200 @@
+"""
+Server-side QR code images: single codes as PNG/SVG and printable PDF sheets.
+
+Images are a pure function of the encoded URL, the format and the size, so
+they are addressed by a digest of those inputs (image_digest). The digest is
+the cache key and the ETag, and it changes by itself when FRONTEND_URL or the
+renderer (RENDER_VERSION) changes, so responses can be served as immutable.
+
+Sheets rasterize many codes per page, which is CPU-bound, so pages are
+rendered in a process pool (sheet_renderer). The page functions here only
+depend on qrcode and Pillow. Spawned workers import this module, and with it
+app.config for the settings, but nothing else from the app.
+"""
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+from app.config import settings
+
+# Bump when the rendering output changes, to give every image a new ETag
+RENDER_VERSION = 1
+
+QUIET_ZONE = 4  # modules of white border, as required by the QR spec
+ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_M
+
+FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+# A4 portrait at 300 dpi
+SHEET_DPI = 300
+SHEET_WIDTH = 2480
+SHEET_HEIGHT = 3508
+SHEET_MARGIN = 150  # half an inch
+SHEET_LABEL_HEIGHT = 22
+
+
+def image_digest(data: str, fmt: str, size: int) -> str:
+    """Content address of the image of data in fmt at size pixels"""
+    key = f"{RENDER_VERSION}\0{fmt}\0{size}\0{data}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def qr_matrix(data: str) -> List[List[bool]]:
+    """Module matrix of data (True is dark), quiet zone included"""
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECTION, border=QUIET_ZONE)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _qr_bitmap(data: str, size: int) -> Image.Image:
+    """
+    1-bit image of data, size x size pixels. Modules are a whole number of
+    pixels each, so the code is scaled by an integer factor and centred; the
+    leftover pixels widen the quiet zone.
+    """
+    matrix = qr_matrix(data)
+    modules = len(matrix)
+    scale = max(1, size // modules)
+
+    code = Image.new("1", (modules, modules), 1)
+    code.putdata([0 if dark else 1 for row in matrix for dark in row])
+    code = code.resize((modules * scale, modules * scale), Image.NEAREST)
+    if code.width == size:
+        return code
+
+    image = Image.new("1", (size, size), 1)
+    offset = (size - code.width) // 2
+    image.paste(code, (offset, offset))
+    return image
+
+
+def render_png(data: str, size: int) -> bytes:
+    buffer = io.BytesIO()
+    _qr_bitmap(data, size).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def render_svg(data: str, size: int) -> bytes:
+    """SVG with one path for all dark modules, in module units scaled to size"""
+    matrix = qr_matrix(data)
+    modules = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < modules:
+            if not row[x]:
+                x += 1
+                continue
+            # Runs of dark modules in a row become one rectangle
+            start = x
+            while x < modules and row[x]:
+                x += 1
+            path.append(f"M{start} {y}h{x - start}v1h{start - x}z")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(path)}"/></svg>\n'
+    ).encode()
+
+
+def render_image(data: str, fmt: str, size: int) -> bytes:
+    if fmt == "svg":
+        return render_svg(data, size)
+    return render_png(data, size)
+
+
+def render_sheet_page(items: Sequence[Tuple[str, str]], columns: int, rows: int) -> Tuple[int, int, bytes]:
+    """
+    Lay out (data, label) pairs on one A4 page in a columns x rows grid.
+
+    Returns (width, height, raw 1-bit pixels) rather than an encoded image:
+    it is cheap to pass back from a worker process, and the pages are
+    assembled into one PDF by the caller.
+    """
+    page = Image.new("1", (SHEET_WIDTH, SHEET_HEIGHT), 1)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default()
+
+    cell_width = (SHEET_WIDTH - 2 * SHEET_MARGIN) // columns
+    cell_height = (SHEET_HEIGHT - 2 * SHEET_MARGIN) // rows
+    code_size = min(cell_width, cell_height - SHEET_LABEL_HEIGHT)
+
+    for index, (data, label) in enumerate(items):
+        column, row = index % columns, index // columns
+        left = SHEET_MARGIN + column * cell_width
+        top = SHEET_MARGIN + row * cell_height
+        page.paste(_qr_bitmap(data, code_size), (left + (cell_width - code_size) // 2, top))
+        if label:
+            text_width = draw.textlength(label, font=font)
+            draw.text(
+                (left + (cell_width - text_width) / 2, top + code_size),
+                label,
+                fill=0,
+                font=font
+            )
+
+    return page.width, page.height, page.tobytes()
+
+
+def pages_to_pdf(pages: Sequence[Tuple[int, int, bytes]]) -> bytes:
+    images = [Image.frombytes("1", (width, height), pixels) for width, height, pixels in pages]
+    buffer = io.BytesIO()
+    images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:], resolution=SHEET_DPI)
+    return buffer.getvalue()
+
+
+class SheetRenderer:
+    """
+    Renders printable sheets, one page per task in a pool of worker
+    processes, so a large run uses every core while the event loop stays
+    free. Workers are spawned rather than forked (the API process has
+    threads running) and only on first use.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers or os.cpu_count() or 1,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    async def render_pdf(self, items: Sequence[Tuple[str, str]], columns: int, rows: int) -> Tuple[bytes, int]:
+        """PDF of the (data, label) pairs laid out columns x rows per page; returns (pdf, pages)"""
+        per_page = columns * rows
+        chunks = [items[start:start + per_page] for start in range(0, len(items), per_page)]
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        pages = await asyncio.gather(*(
+            loop.run_in_executor(pool, render_sheet_page, chunk, columns, rows) for chunk in chunks
+        ))
+        # Encoding the PDF is a single pass over the pages; keep it off the event loop too
+        pdf = await loop.run_in_executor(None, pages_to_pdf, pages)
+        return pdf, len(pages)
+
+    def stop(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+sheet_renderer = SheetRenderer(settings.QR_SHEET_WORKERS)
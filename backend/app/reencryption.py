@@ -0,0 +1,204 @@
+"""
+Background re-encryption after a key rotation.
+
+To rotate, make the new key ENCRYPTION_KEY and move the old one to
+ENCRYPTION_LEGACY_KEYS. Reads keep working with either key, and this job
+walks each table in ENCRYPTED_COLUMNS in id order, re-encrypting values that
+are not yet under the primary key, REENCRYPT_BATCH_SIZE rows per transaction
+with REENCRYPT_PAUSE_SECONDS between transactions. Each batch locks only its
+own rows, and only until it commits.
+
+Progress is kept in a watermark per table and primary key (see
+app.watermark), so a restart resumes where the job stopped and a later
+rotation starts a fresh pass. Once a pass has finished, the legacy key can be
+removed. The same pass encrypts plaintext written before encryption was
+enabled. Tokens that no configured key can decrypt are left as they are and
+counted as skipped.
+"""
+import threading
+from datetime import datetime
+from cryptography.fernet import InvalidToken
+from sqlalchemy import select, update
+from app.config import settings
+from app.database import Base, SessionLocal
+from app.encryption import TOKEN_PREFIX, Ciphertext, EncryptedString, EncryptionService, encryption_service
+from app import models  # noqa: F401 - registers the tables on Base.metadata
+from app.logger import db_logger
+from app.watermark import claim_watermark
+
+# Tables with EncryptedString columns: (table, column names)
+ENCRYPTED_COLUMNS = [
+    (table, tuple(column.name for column in table.columns if isinstance(column.type, EncryptedString)))
+    for table in Base.metadata.sorted_tables
+    if any(isinstance(column.type, EncryptedString) for column in table.columns)
+]
+
+
+class Reencryptor:
+    """Background thread that moves encrypted values onto the primary key"""
+
+    def __init__(self, service: EncryptionService):
+        self.service = service
+        self.batch_size = settings.REENCRYPT_BATCH_SIZE
+        self.pause = settings.REENCRYPT_PAUSE_SECONDS
+        self.interval = settings.REENCRYPT_INTERVAL_SECONDS
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.batches_total = 0
+        self.rows_total = 0
+        self.rotated_total = 0
+        self.skipped_total = 0
+        self.failed_runs_total = 0
+        self.completed = {}  # table name -> when its pass last reached the end
+        self.last_run_dt = None
+        self.last_error = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.service.cipher is not None and self.batch_size > 0
+
+    def start(self):
+        """Start the job thread (no-op unless encryption is on)"""
+        if self._thread or not self.enabled:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reencryption", daemon=True)
+        self._thread.start()
+        db_logger.info(
+            "Re-encryption started (key %s, batch size %d, pause %ss)",
+            self.service.key_id, self.batch_size, self.pause
+        )
+
+    def stop(self, timeout: float = 10.0):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        db_logger.info("Re-encryption stopped")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self.failed_runs_total += 1
+                    self.last_error = str(e)[:500]
+                db_logger.error("Re-encryption failed: %s", e, exc_info=True)
+            self._stop.wait(self.interval)
+
+    def watermark_name(self, table_name: str) -> str:
+        return f"reencrypt:{table_name}:{self.service.key_id}"
+
+    def run_once(self) -> int:
+        """
+        Continue every table's pass until it reaches the end, the job is
+        stopped, or another process holds the table's watermark.
+
+        Returns:
+            Number of values re-encrypted
+        """
+        rotated = 0
+        for table, columns in ENCRYPTED_COLUMNS:
+            while not self._stop.is_set():
+                result = self._process_batch(table, columns)
+                if result is None:
+                    break
+                rows, changed = result
+                rotated += changed
+                if rows < self.batch_size:
+                    with self._lock:
+                        self.completed[table.name] = datetime.utcnow()
+                    break
+                self._stop.wait(self.pause)
+        with self._lock:
+            self.last_run_dt = datetime.utcnow()
+        if rotated:
+            db_logger.info("Re-encryption moved %d value(s) to key %s", rotated, self.service.key_id)
+        return rotated
+
+    def _process_batch(self, table, columns):
+        """
+        Re-encrypt the next batch of rows of table.
+
+        Returns:
+            (rows read, values re-encrypted), or None if another process
+            holds the watermark
+        """
+        db = SessionLocal()
+        try:
+            watermark = claim_watermark(db, self.watermark_name(table.name))
+            if watermark is None:
+                db.rollback()
+                return None
+
+            query = select(table.c.id, *[table.c[name] for name in columns])
+            if watermark.position_id is not None:
+                query = query.where(table.c.id > watermark.position_id)
+            rows = db.execute(
+                query.order_by(table.c.id).limit(self.batch_size).with_for_update()
+            ).all()
+            if not rows:
+                db.rollback()
+                return 0, 0
+
+            changed = 0
+            skipped = 0
+            for row in rows:
+                values = {}
+                for name in columns:
+                    value = getattr(row, name)
+                    if not value or self.service.is_current(value):
+                        continue
+                    if not value.startswith(TOKEN_PREFIX):
+                        values[name] = Ciphertext(self.service.encrypt(value))
+                        continue
+                    try:
+                        values[name] = Ciphertext(self.service.rotate(value))
+                    except InvalidToken:
+                        skipped += 1
+                if values:
+                    db.execute(update(table).where(table.c.id == row.id).values(**values))
+                    changed += len(values)
+
+            watermark.position_id = rows[-1].id
+            db.commit()
+            with self._lock:
+                self.batches_total += 1
+                self.rows_total += len(rows)
+                self.rotated_total += changed
+                self.skipped_total += skipped
+            return len(rows), changed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "running": self._thread is not None,
+                "key_id": self.service.key_id,
+                "legacy_key_count": self.service.legacy_key_count,
+                "batch_size": self.batch_size,
+                "pause_seconds": self.pause,
+                "interval_seconds": self.interval,
+                "batches_total": self.batches_total,
+                "rows_total": self.rows_total,
+                "rotated_total": self.rotated_total,
+                "skipped_total": self.skipped_total,
+                "failed_runs_total": self.failed_runs_total,
+                "completed": dict(self.completed),
+                "last_run_dt": self.last_run_dt,
+                "last_error": self.last_error,
+                "decrypt_failures_total": self.service.stats()["decrypt_failures_total"],
+            }
+
+
+reencryptor = Reencryptor(encryption_service)
@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Literal, Optional
+from app.database import get_db, engine, async_engine
+from app.db_metrics import api_pool_metrics, background_pool_metrics
+from app.models import UserLogin, as_utc_naive
+from app.auth import require_admin
+from app.email_outbox import outbox_dispatcher
+from app.cache import auth_user_cache, decrypt_cache, qr_image_cache, scan_view_cache
+from app.scan_buffer import scan_buffer
+from app.scan_rollup import scan_rollup
+from app.scan_debounce import scan_debouncer
+from app.reencryption import reencryptor
+from app.google_keys import google_key_cache
+from app.export import MEDIA_TYPES, stream_export
+from app.logger import db_logger
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+@router.get("/email-outbox/stats")
+async def get_email_outbox_stats(
+    current_user: UserLogin = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Email outbox queue depth and send latency (Admin/ASP Admin only)"""
+    return await outbox_dispatcher.stats(db)
+
+@router.get("/scan-buffer/stats")
+async def get_scan_buffer_stats(current_user: UserLogin = Depends(require_admin)):
+    """Scan write-behind buffer depth, flushes and drops in this process (Admin/ASP Admin only)"""
+    return scan_buffer.stats()
+
+@router.get("/scan-debounce/stats")
+async def get_scan_debounce_stats(current_user: UserLogin = Depends(require_admin)):
+    """First and repeated scans seen by the scan debounce in this process (Admin/ASP Admin only)"""
+    return scan_debouncer.stats()
+
+@router.get("/scan-rollup/stats")
+async def get_scan_rollup_stats(current_user: UserLogin = Depends(require_admin)):
+    """Daily scan rollup runs, rows folded and failures in this process (Admin/ASP Admin only)"""
+    return scan_rollup.stats()
+
+@router.get("/reencryption/stats")
+async def get_reencryption_stats(current_user: UserLogin = Depends(require_admin)):
+    """Key rotation progress: batches, values re-encrypted and skipped in this process (Admin/ASP Admin only)"""
+    return reencryptor.stats()
+
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: UserLogin = Depends(require_admin)):
+    """Hit/miss/eviction counters of this process's in-memory caches (Admin/ASP Admin only)"""
+    return {
+        scan_view_cache.name: scan_view_cache.stats(),
+        auth_user_cache.name: auth_user_cache.stats(),
+        qr_image_cache.name: qr_image_cache.stats(),
+        decrypt_cache.name: decrypt_cache.stats(),
+    }
+
+@router.get("/db/pool")
+async def get_db_pool_stats(current_user: UserLogin = Depends(require_admin)):
+    """Connection pool occupancy, checkout waits and churn in this process (Admin/ASP Admin only)"""
+    return {
+        api_pool_metrics.name: api_pool_metrics.snapshot(async_engine.sync_engine.pool),
+        background_pool_metrics.name: background_pool_metrics.snapshot(engine.pool),
+    }
+
+@router.get("/google-keys/stats")
+async def get_google_keys_stats(current_user: UserLogin = Depends(require_admin)):
+    """Cached Google signing keys and refresh counters in this process (Admin/ASP Admin only)"""
+    return google_key_cache.stats()
+
+@router.get("/export/{table}")
+async def export_table(
+    table: Literal["qr_usage", "qr_dtls"],
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: UserLogin = Depends(require_admin)
+):
+    """
+    Stream every row of qr_usage or qr_dtls created in [since, until) as CSV or
+    NDJSON, optionally gzip-compressed (Admin/ASP Admin only)
+    """
+    db_logger.info("User %s exporting %s as %s", current_user.id, table, format)
+    filename = f"{table}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        stream_export(table, format, as_utc_naive(since), as_utc_naive(until), compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
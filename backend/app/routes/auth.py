@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from datetime import timedelta
 from app.database import get_db
 from app.models import UserLogin, UserDetails
 from app.schemas import Token, UserLoginResponse
 from app.auth import create_access_token, get_password_hash, verify_password
 from app.config import settings
+from app.google_keys import google_key_cache
 from app.logger import auth_logger
 from pydantic import BaseModel
 
@@ -22,18 +23,16 @@ class LoginRequest(BaseModel):
     password: str
 
 @router.post("/google-login", response_model=Token)
-def google_login(request: GoogleLoginRequest, db: Session = Depends(get_db)):
+async def google_login(request: GoogleLoginRequest, db: AsyncSession = Depends(get_db)):
     """Login or register user with Google OAuth"""
     auth_logger.info("=== Google Login Flow Started ===")
     
     try:
         # Verify Google token
         auth_logger.info("Verifying Google OAuth token")
-        idinfo = id_token.verify_oauth2_token(
-            request.token,
-            requests.Request(),
-            settings.GOOGLE_CLIENT_ID
-        )
+        # Verified locally against cached signing keys; runs in a thread because
+        # an expired or unknown key id means a blocking refetch
+        idinfo = await run_in_threadpool(google_key_cache.verify, request.token)
         
         email = idinfo.get('email')
         name = idinfo.get('name', email.split('@')[0] if email else 'Unknown')
@@ -48,7 +47,8 @@ def google_login(request: GoogleLoginRequest, db: Session = Depends(get_db)):
         
         # Check if user exists
         auth_logger.info(f"Checking if user exists in database: {email}")
-        user = db.query(UserLogin).filter(UserLogin.email_id == email).first()
+        result = await db.execute(select(UserLogin).where(UserLogin.email_id == email))
+        user = result.scalars().first()
         
         if not user:
             # Create new user
@@ -61,8 +61,8 @@ def google_login(request: GoogleLoginRequest, db: Session = Depends(get_db)):
                     active_flag=True
                 )
                 db.add(user)
-                db.commit()
-                db.refresh(user)
+                await db.commit()
+                await db.refresh(user)
                 auth_logger.info(f"User account created successfully with ID: {user.id}")
                 
                 # Create empty user details
@@ -73,12 +73,12 @@ def google_login(request: GoogleLoginRequest, db: Session = Depends(get_db)):
                     crt_by=user.id
                 )
                 db.add(user_details)
-                db.commit()
+                await db.commit()
                 auth_logger.info("User details created successfully")
                 
             except SQLAlchemyError as e:
                 auth_logger.error(f"Database error while creating user: {str(e)}", exc_info=True)
-                db.rollback()
+                await db.rollback()
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to create user account"
@@ -114,13 +114,14 @@ def google_login(request: GoogleLoginRequest, db: Session = Depends(get_db)):
         )
 
 @router.post("/login", response_model=Token)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     """Login with email and password (optional, for non-OAuth users)"""
     auth_logger.info("=== Email/Password Login Flow Started ===")
     auth_logger.info(f"Login attempt for email: {request.email}")
     
     try:
-        user = db.query(UserLogin).filter(UserLogin.email_id == request.email).first()
+        result = await db.execute(select(UserLogin).where(UserLogin.email_id == request.email))
+        user = result.scalars().first()
         
         if not user:
             auth_logger.warning(f"Login failed: User not found for email: {request.email}")
@@ -136,7 +137,8 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
                 detail="Incorrect email or password"
             )
         
-        if not verify_password(request.password, user.password):
+        # bcrypt is deliberately slow - keep it off the event loop
+        if not await run_in_threadpool(verify_password, request.password, user.password):
             auth_logger.warning(f"Login failed: Invalid password for user: {request.email}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
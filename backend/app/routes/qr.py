@@ -1,26 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+import base64
+import binascii
+import json
+import logging
+import uuid
+from datetime import date, datetime
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Optional
+from typing import Literal, Optional, Tuple
 from uuid import UUID
-from app.database import get_db
-from app.models import UserLogin, UserDetails, QRDetails, QRUsage
+from app.config import settings
+from app.database import AsyncSessionLocal, get_db
+from app.models import UserLogin, UserDetails, QRDetails, QRUsage, QRScanDaily, JobWatermark, as_utc_naive
 from app.schemas import (
-    QRDetailsCreate, QRDetailsResponse, QRDetailsUpdate,
-    QRUsageCreate, QRUsageResponse, QRScanResponse,
+    QRBulkCreateRequest, QRSheetRequest, QRDetailsCreate, QRDetailsResponse, QRDetailsUpdate,
+    QRUsageCreate, QRUsageResponse, QRScanHistoryResponse, QRScanResponse, QRScanSummaryResponse,
+    QRScanAreaResponse,
     UserDetailsUpdate, UserDetailsResponse
 )
 from app.auth import get_current_user, require_auth, require_admin
-from app.email_service import email_service
+from app.email_outbox import enqueue_location_alert, outbox_dispatcher
+from app.cache import MISSING, qr_image_cache, scan_view_cache
+from app.scan_buffer import scan_buffer
+from app.scan_debounce import client_address, client_fingerprint, scan_debouncer
+from app.scan_rollup import WATERMARK_NAME as SCAN_ROLLUP_WATERMARK
 from app.logger import qr_logger
+from app.metrics import record_scan
+from app.geo import distance_m, parse_location, radius_box, within_radius
+from app.qr_render import FORMATS, image_digest, render_image, sheet_renderer
 
 router = APIRouter(prefix="/qr", tags=["QR Code"])
 
+# Scan locations are stored as submitted, in qr_usage and email_outbox
+LOCATION_MAX_LENGTH = QRUsage.__table__.c.latitude.type.length
+
 @router.post("/create", response_model=QRDetailsResponse)
-def create_qr(
+async def create_qr(
     qr_data: QRDetailsCreate,
     current_user: UserLogin = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new QR code (requires authentication)"""
     qr_logger.info("=== Create QR Flow Started ===")
@@ -30,7 +51,8 @@ def create_qr(
         # If user_dtls_id not provided, get the user's details ID
         if not qr_data.user_dtls_id:
             # Get the user's details record
-            user_details = db.query(UserDetails).filter(UserDetails.user_id == current_user.id).first()
+            result = await db.execute(select(UserDetails).where(UserDetails.user_id == current_user.id))
+            user_details = result.scalars().first()
             if not user_details:
                 qr_logger.error(f"No user details found for user: {current_user.id}")
                 raise HTTPException(
@@ -41,7 +63,8 @@ def create_qr(
             qr_logger.info(f"No user_dtls_id provided, using current user's details: {user_details.id}")
         
         # Verify user owns this user_details record
-        user_details = db.query(UserDetails).filter(UserDetails.id == qr_data.user_dtls_id).first()
+        result = await db.execute(select(UserDetails).where(UserDetails.id == qr_data.user_dtls_id))
+        user_details = result.scalars().first()
         if not user_details or user_details.user_id != current_user.id:
             qr_logger.warning(f"User {current_user.id} attempted to create QR for another user's details: {qr_data.user_dtls_id}")
             raise HTTPException(
@@ -65,8 +88,9 @@ def create_qr(
         )
         
         db.add(qr)
-        db.commit()
-        db.refresh(qr)
+        await db.commit()
+        await db.refresh(qr)
+        scan_view_cache.invalidate(qr.id)
         
         qr_logger.info(f"QR created successfully with ID: {qr.id}")
         qr_logger.info("=== Create QR Flow Completed ===")
@@ -76,7 +100,7 @@ def create_qr(
         raise
     except SQLAlchemyError as e:
         qr_logger.error(f"Database error while creating QR: {str(e)}", exc_info=True)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create QR code"
@@ -89,9 +113,9 @@ def create_qr(
         )
 
 @router.post("/create-unbound", response_model=QRDetailsResponse)
-def create_unbound_qr(
+async def create_unbound_qr(
     current_user: UserLogin = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create an UNBOUND QR code (Admin/ASP Admin only)
@@ -113,152 +137,605 @@ def create_unbound_qr(
     )
     
     db.add(qr)
-    db.commit()
-    db.refresh(qr)
+    await db.commit()
+    await db.refresh(qr)
+    scan_view_cache.invalidate(qr.id)
     
     return qr
 
+def qr_url(qr_id: UUID) -> str:
+    """The URL a printed QR code encodes (the frontend's /qr/:qrId view)"""
+    return f"{settings.FRONTEND_URL}/qr/{qr_id}"
+
+@router.post("/create-unbound/bulk")
+async def create_unbound_qr_bulk(
+    request: QRBulkCreateRequest,
+    current_user: UserLogin = Depends(require_admin)
+):
+    """
+    Create many UNBOUND QR codes at once (Admin/ASP Admin only)
+    Ids are generated here and inserted in batches of QR_BULK_BATCH_SIZE rows,
+    one multi-row INSERT and commit per batch. Each batch's ids are streamed
+    back (CSV or NDJSON) as soon as it is committed, so every id received is
+    a QR that exists, even if the stream is cut short.
+    """
+    if request.count > settings.QR_BULK_MAX_COUNT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.QR_BULK_MAX_COUNT} QR codes per request"
+        )
+    qr_logger.info("User %s minting %d unbound QR codes", current_user.id, request.count)
+
+    created_by = current_user.id
+    batch_size = settings.QR_BULK_BATCH_SIZE
+
+    async def generate():
+        if request.format == "csv":
+            yield "qr_id,url\n"
+        created = 0
+        # Own session: the body is streamed after this handler returns, outside
+        # the request-scoped session's lifetime
+        async with AsyncSessionLocal() as session:
+            try:
+                while created < request.count:
+                    now = datetime.utcnow()
+                    rows = [
+                        {
+                            "id": uuid.uuid4(),
+                            "user_dtls_id": None,  # UNBOUND - no owner yet
+                            "first_name": True,
+                            "last_name": True,
+                            "mobile_no": True,
+                            "address": True,
+                            "email_id": True,
+                            "blood_grp": True,
+                            "company_name": True,
+                            "description": True,
+                            "active_flag": True,
+                            "crt_dt": now,
+                            "crt_by": created_by,
+                        }
+                        for _ in range(min(batch_size, request.count - created))
+                    ]
+                    await session.execute(insert(QRDetails.__table__), rows)
+                    await session.commit()
+                    created += len(rows)
+                    # New random ids were never scanned, so there is nothing to invalidate in the scan cache
+                    if request.format == "csv":
+                        yield "".join(f"{row['id']},{qr_url(row['id'])}\n" for row in rows)
+                    else:
+                        yield "".join(
+                            json.dumps({"qr_id": str(row["id"]), "url": qr_url(row["id"])}) + "\n"
+                            for row in rows
+                        )
+            except SQLAlchemyError as e:
+                await session.rollback()
+                qr_logger.error("Bulk QR minting failed after %d of %d: %s", created, request.count, e, exc_info=True)
+                raise
+        qr_logger.info("Minted %d unbound QR codes for user %s", created, created_by)
+
+    media_type = "text/csv" if request.format == "csv" else "application/x-ndjson"
+    filename = f"unbound-qr-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{request.format}"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+@router.get("/image/{qr_id}")
+async def get_qr_image(
+    qr_id: UUID,
+    request: Request,
+    format: Literal["png", "svg"] = "png",
+    size: int = Query(default=300),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Render a QR code as a PNG or SVG image of size x size pixels
+    The image only encodes the QR's public URL, so no authentication is needed.
+    Images are cached by content digest, which is also the ETag; they never
+    change for a given URL, so they are served as immutable.
+    """
+    if not settings.QR_IMAGE_MIN_SIZE <= size <= settings.QR_IMAGE_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"size must be between {settings.QR_IMAGE_MIN_SIZE} and {settings.QR_IMAGE_MAX_SIZE}"
+        )
+
+    data = qr_url(qr_id)
+    digest = image_digest(data, format, size)
+    etag = f'"{digest}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    image = qr_image_cache.get(digest)
+    if image is MISSING:
+        # Only answer for codes that exist, conditional requests included;
+        # a cached image implies the QR did
+        result = await db.execute(select(QRDetails.id).where(QRDetails.id == qr_id))
+        if result.first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="QR Code not found"
+            )
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if image is MISSING:
+        image = await run_in_threadpool(render_image, data, format, size)
+        qr_image_cache.set(digest, image)
+
+    return Response(content=image, media_type=FORMATS[format], headers=headers)
+
+@router.post("/sheets")
+async def create_qr_sheets(
+    request: QRSheetRequest,
+    current_user: UserLogin = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Render QR codes onto printable A4 sheets as one PDF (Admin/ASP Admin only)
+    Codes are laid out columns x rows per page in the order given, optionally
+    labelled with the start of their id. Pages are rendered in parallel in a
+    pool of worker processes.
+    """
+    if len(request.qr_ids) > settings.QR_SHEET_MAX_CODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.QR_SHEET_MAX_CODES} QR codes per request"
+        )
+
+    requested = set(request.qr_ids)
+    result = await db.execute(select(QRDetails.id).where(QRDetails.id.in_(requested)))
+    missing = requested - {qr_id for (qr_id,) in result}
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"QR Code not found: {', '.join(sorted(str(qr_id) for qr_id in missing))}"
+        )
+    # Release the connection before the long CPU-bound part
+    await db.close()
+
+    items = [(qr_url(qr_id), str(qr_id)[:8] if request.labels else "") for qr_id in request.qr_ids]
+    pdf, pages = await sheet_renderer.render_pdf(items, request.columns, request.rows)
+    qr_logger.info(
+        "User %s rendered %d QR codes on %d sheet page(s)", current_user.id, len(items), pages
+    )
+
+    filename = f"qr-sheets-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.pdf"
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+async def _load_scan_view(db: AsyncSession, qr_id: UUID) -> Optional[dict]:
+    """
+    Build the cacheable public view of a QR: the permission-filtered user
+    details plus the owner data the scan path needs. Returns None if the QR
+    does not exist or is inactive.
+    """
+    # One round trip: QR -> UserDetails -> owner's email
+    result = await db.execute(
+        select(QRDetails, UserDetails, UserLogin.email_id).outerjoin(
+            UserDetails, UserDetails.id == QRDetails.user_dtls_id
+        ).outerjoin(
+            UserLogin, UserLogin.id == UserDetails.user_id
+        ).where(
+            QRDetails.id == qr_id,
+            QRDetails.active_flag == True
+        )
+    )
+    row = result.first()
+    
+    if not row:
+        return None
+    
+    qr, user_details, owner_email = row
+    # Runs on every scan view cache miss: DEBUG only, like scan_qr's detail lines
+    debug = qr_logger.isEnabledFor(logging.DEBUG)
+    
+    if not qr.user_dtls_id:
+        # Not bound to user details yet
+        if debug:
+            qr_logger.debug("QR is unbound (no user details assigned)")
+        return {
+            "qr_id": qr.id,
+            "user_dtls_id": None,
+            "user_details": None,
+            "owner_user_id": None,
+            "owner_email": None,
+        }
+    
+    # Filter user details based on QR permissions
+    filtered_details = {}
+    if user_details:
+        if debug:
+            qr_logger.debug("Filtering user details based on QR permissions")
+        if qr.first_name:
+            filtered_details['first_name'] = user_details.first_name
+        if qr.last_name:
+            filtered_details['last_name'] = user_details.last_name
+        if qr.mobile_no:
+            filtered_details['mobile_no'] = user_details.mobile_no
+        if qr.address:
+            filtered_details['address'] = user_details.address
+        if qr.email_id:
+            filtered_details['email_id'] = user_details.email_id
+        if qr.blood_grp:
+            filtered_details['blood_grp'] = user_details.blood_grp
+        if qr.company_name:
+            filtered_details['company_name'] = user_details.company_name
+        if qr.description:
+            filtered_details['description'] = user_details.description
+        if debug:
+            qr_logger.debug("Filtered details count: %d fields", len(filtered_details))
+    else:
+        qr_logger.warning("No user details found for user_dtls_id: %s", qr.user_dtls_id)
+    
+    return {
+        "qr_id": qr.id,
+        "user_dtls_id": qr.user_dtls_id,
+        "user_details": filtered_details if filtered_details else None,
+        "owner_user_id": user_details.user_id if user_details else None,
+        "owner_email": owner_email,
+    }
+
+def _fit_location(latitude: Optional[str], longitude: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The submitted location, or (None, None) if either part is longer than the
+    String(50) columns it is stored in. The scan itself is still recorded.
+    """
+    if len(latitude or "") > LOCATION_MAX_LENGTH or len(longitude or "") > LOCATION_MAX_LENGTH:
+        qr_logger.warning("Dropping oversized scan location (%d/%d chars)", len(latitude or ""), len(longitude or ""))
+        return None, None
+    return latitude, longitude
+
+def _scan_fingerprint(request: Request, current_user: Optional[UserLogin]) -> str:
+    client_host = client_address(
+        request.headers.get("x-forwarded-for"),
+        request.client.host if request.client else None,
+        settings.SCAN_DEBOUNCE_TRUSTED_PROXY_HOPS
+    )
+    return client_fingerprint(
+        current_user.id if current_user else None,
+        client_host,
+        request.headers.get("user-agent")
+    )
+
 @router.get("/scan/{qr_id}", response_model=QRScanResponse)
-def scan_qr(
+async def scan_qr(
     qr_id: UUID,
+    request: Request,
     latitude: Optional[str] = None,
     longitude: Optional[str] = None,
     current_user: Optional[UserLogin] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Scan QR code - public endpoint (no auth required for viewing)
     If current_user is provided, checks if they're the owner
     """
-    qr_logger.info("=== QR Scan Flow Started ===")
-    qr_logger.info(f"Scanning QR ID: {qr_id}")
-    qr_logger.info(f"Scanner: {current_user.email_id if current_user else 'Anonymous'}")
-    qr_logger.info(f"Location: Lat={latitude}, Long={longitude}")
+    # Hot path: step-by-step detail is DEBUG, a single INFO line summarises the scan
+    debug = qr_logger.isEnabledFor(logging.DEBUG)
+    latitude, longitude = _fit_location(latitude, longitude)
+    if debug:
+        qr_logger.debug("=== QR Scan Flow Started ===")
+        qr_logger.debug("Scanning QR ID: %s", qr_id)
+        qr_logger.debug("Scanner: %s", current_user.email_id if current_user else "Anonymous")
+        qr_logger.debug("Location: Lat=%s, Long=%s", latitude, longitude)
     
     try:
-        qr = db.query(QRDetails).filter(QRDetails.id == qr_id, QRDetails.active_flag == True).first()
+        view = scan_view_cache.get(qr_id)
+        cached = view is not MISSING
+        if not cached:
+            generation = scan_view_cache.generation()
+            view = await _load_scan_view(db, qr_id)
+            scan_view_cache.set(qr_id, view, generation=generation)
         
-        if not qr:
-            qr_logger.warning(f"QR Code not found or inactive: {qr_id}")
+        if view is None:
+            qr_logger.warning("QR Code not found or inactive: %s", qr_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="QR Code not found"
             )
         
-        qr_logger.info(f"QR found - User Details ID: {qr.user_dtls_id if qr.user_dtls_id else 'Unbound'}")
-        
-        # Log QR usage
-        try:
-            qr_usage = QRUsage(
-                qr_id=qr_id,
-                latitude=latitude,
-                longitude=longitude,
-                crt_by=current_user.id if current_user else None
-            )
-            db.add(qr_usage)
-            db.commit()
-            qr_logger.info("QR usage logged successfully")
-        except SQLAlchemyError as e:
-            qr_logger.error(f"Failed to log QR usage: {str(e)}", exc_info=True)
-            db.rollback()
-            # Continue despite logging failure
-        
         # Check if scanner is the owner
-        is_owner = False
-        if current_user and qr.user_dtls_id:
-            # Check if current user owns the user_details record
-            user_details_check = db.query(UserDetails).filter(
-                UserDetails.id == qr.user_dtls_id,
-                UserDetails.user_id == current_user.id
-            ).first()
-            is_owner = user_details_check is not None
-        qr_logger.info(f"Is owner: {is_owner}")
-        
-        # If not bound to user details yet
-        if not qr.user_dtls_id:
-            qr_logger.info("QR is unbound (no user details assigned)")
-            qr_logger.info("=== QR Scan Flow Completed ===")
-            return QRScanResponse(
-                qr_id=qr.id,
-                user_dtls_id=None,
-                user_details=None,
-                is_owner=False
-            )
+        is_owner = bool(current_user and view["owner_user_id"] == current_user.id)
+        if debug:
+            qr_logger.debug("QR found - User Details ID: %s", view["user_dtls_id"] or "Unbound")
+            qr_logger.debug("Is owner: %s", is_owner)
+        owner_email = view["owner_email"]
         
-        # Get user details
-        user_details = db.query(UserDetails).filter(UserDetails.id == qr.user_dtls_id).first()
+        response = QRScanResponse(
+            qr_id=view["qr_id"],
+            user_dtls_id=view["user_dtls_id"],
+            user_details=view["user_details"],
+            is_owner=is_owner
+        )
         
-        # Get owner's login info for email
-        owner = None
-        if user_details:
-            owner = db.query(UserLogin).filter(UserLogin.id == user_details.user_id).first()
+        # A repeat by the same client within the debounce window is answered
+        # from the view alone: no usage row, no alert
+        if scan_debouncer.enabled and await scan_debouncer.check(qr_id, _scan_fingerprint(request, current_user)):
+            record_scan(qr_id, repeat=True)
+            qr_logger.info("QR scanned: %s (owner=%s, cached=%s, repeat=True)", qr_id, is_owner, cached)
+            return response
         
-        # Send email notification to owner (only if not scanning own QR)
-        if owner and not is_owner:
-            qr_logger.info(f"Sending location alert email to owner: {owner.email_id}")
-            try:
-                email_service.send_location_alert(
-                    to_email=owner.email_id,
-                    qr_id=str(qr_id),
+        # Log QR usage and queue the owner alert (only if not scanning own QR)
+        # in one transaction; the email outbox workers do the SMTP work.
+        # With write-behind enabled the usage row is buffered and batch-inserted.
+        alert_queued = False
+        lat, lng = parse_location(latitude, longitude)
+        try:
+            if scan_buffer.enabled:
+                if not scan_buffer.submit(
+                    qr_id=qr_id,
+                    latitude=latitude,
+                    longitude=longitude,
+                    crt_by=current_user.id if current_user else None,
+                    lat=lat,
+                    lng=lng
+                ):
+                    qr_logger.warning("Scan write-behind buffer full, QR usage dropped")
+            else:
+                qr_usage = QRUsage(
+                    qr_id=qr_id,
+                    latitude=latitude,
+                    longitude=longitude,
+                    lat=lat,
+                    lng=lng,
+                    crt_by=current_user.id if current_user else None
+                )
+                db.add(qr_usage)
+            if owner_email and not is_owner:
+                if debug:
+                    qr_logger.debug("Queueing location alert email to owner: %s", owner_email)
+                enqueue_location_alert(
+                    db,
+                    to_email=owner_email,
+                    qr_id=qr_id,
                     latitude=latitude,
-                    longitude=longitude
+                    longitude=longitude,
+                    crt_by=current_user.id if current_user else None
                 )
-                qr_logger.info("Location alert email sent successfully")
-            except Exception as e:
-                qr_logger.error(f"Failed to send location alert email: {str(e)}", exc_info=True)
-                # Continue despite email failure
-        else:
-            qr_logger.info("No email sent - owner scanning own QR or owner not found")
+                alert_queued = True
+            elif debug:
+                qr_logger.debug("No email queued - owner scanning own QR or owner not found")
+            await db.commit()
+        except SQLAlchemyError as e:
+            qr_logger.error("Failed to log QR usage: %s", e, exc_info=True)
+            await db.rollback()
+            alert_queued = False
+            # Continue despite logging failure
         
-        # Filter user details based on QR permissions
-        filtered_details = {}
-        if user_details:
-            qr_logger.info("Filtering user details based on QR permissions")
-            if qr.first_name:
-                filtered_details['first_name'] = user_details.first_name
-            if qr.last_name:
-                filtered_details['last_name'] = user_details.last_name
-            if qr.mobile_no:
-                filtered_details['mobile_no'] = user_details.mobile_no
-            if qr.address:
-                filtered_details['address'] = user_details.address
-            if qr.email_id:
-                filtered_details['email_id'] = user_details.email_id
-            if qr.blood_grp:
-                filtered_details['blood_grp'] = user_details.blood_grp
-            if qr.company_name:
-                filtered_details['company_name'] = user_details.company_name
-            if qr.description:
-                filtered_details['description'] = user_details.description
-            qr_logger.info(f"Filtered details count: {len(filtered_details)} fields")
-        else:
-            qr_logger.warning(f"No user details found for user_dtls_id: {qr.user_dtls_id}")
+        if alert_queued:
+            outbox_dispatcher.notify()
         
-        qr_logger.info("=== QR Scan Flow Completed ===")
-        return QRScanResponse(
-            qr_id=qr.id,
-            user_dtls_id=qr.user_dtls_id,
-            user_details=filtered_details if filtered_details else None,
-            is_owner=is_owner
+        record_scan(qr_id)
+        qr_logger.info(
+            "QR scanned: %s (owner=%s, cached=%s, alert=%s)", qr_id, is_owner, cached, alert_queued
         )
+        return response
         
     except HTTPException:
         raise
     except Exception as e:
-        qr_logger.error(f"Unexpected error during QR scan: {str(e)}", exc_info=True)
+        qr_logger.error("Unexpected error during QR scan: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred while scanning QR"
         )
 
+def _encode_scan_cursor(scan: QRUsage) -> str:
+    raw = f"{scan.crt_dt.isoformat()}|{scan.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_scan_cursor(cursor: str):
+    """(crt_dt, id) of the last scan on the previous page"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        crt_dt, scan_id = raw.split("|")
+        return datetime.fromisoformat(crt_dt), UUID(scan_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+async def _check_scan_access(db: AsyncSession, qr_id: UUID, current_user: UserLogin, allow_admin: bool = False):
+    """Raise 404 for an unknown QR and 403 unless current_user owns it (or is an admin, if allowed)"""
+    result = await db.execute(
+        select(UserDetails.user_id).select_from(QRDetails).outerjoin(
+            UserDetails, UserDetails.id == QRDetails.user_dtls_id
+        ).where(QRDetails.id == qr_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="QR Code not found"
+        )
+    if row.user_id != current_user.id and not (allow_admin and current_user.role in [2, 3]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view QR scans"
+        )
+
+@router.get("/{qr_id}/scans", response_model=QRScanHistoryResponse)
+async def get_qr_scans(
+    qr_id: UUID,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(default=settings.SCAN_HISTORY_DEFAULT_LIMIT, ge=1, le=settings.SCAN_HISTORY_MAX_LIMIT),
+    current_user: UserLogin = Depends(require_auth),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Scan history of a QR, newest first (requires authentication and ownership)
+    Pages are keyed on (crt_dt, id) rather than an offset, so every page is one
+    range read of ix_qr_usage_qr_id_crt_dt_id however deep it is. since is
+    inclusive and until exclusive (naive values are UTC). Scans still in the
+    write-behind buffer appear once it has been flushed.
+    """
+    await _check_scan_access(db, qr_id, current_user)
+
+    query = select(QRUsage).where(
+        QRUsage.qr_id == qr_id,
+        QRUsage.active_flag == True
+    )
+    since, until = as_utc_naive(since), as_utc_naive(until)
+    if since is not None:
+        query = query.where(QRUsage.crt_dt >= since)
+    if until is not None:
+        query = query.where(QRUsage.crt_dt < until)
+    if cursor:
+        query = query.where(tuple_(QRUsage.crt_dt, QRUsage.id) < tuple_(*_decode_scan_cursor(cursor)))
+
+    # One extra row tells whether there is a next page
+    result = await db.execute(
+        query.order_by(QRUsage.crt_dt.desc(), QRUsage.id.desc()).limit(limit + 1)
+    )
+    scans = result.scalars().all()
+    has_more = len(scans) > limit
+    scans = scans[:limit]
+
+    return {
+        "items": scans,
+        "next_cursor": _encode_scan_cursor(scans[-1]) if has_more else None,
+    }
+
+@router.get("/{qr_id}/scans/daily", response_model=QRScanSummaryResponse)
+async def get_qr_scan_summary(
+    qr_id: UUID,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    current_user: UserLogin = Depends(require_auth),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Scans per UTC day of a QR, with totals (owner, Admin/ASP Admin)
+    Read from the qr_scan_daily rollup, so the cost depends on the number of
+    days, not scans. since and until are inclusive days. Scans recorded
+    after rolled_up_to are not counted yet.
+    """
+    await _check_scan_access(db, qr_id, current_user, allow_admin=True)
+
+    query = select(QRScanDaily).where(QRScanDaily.qr_id == qr_id)
+    if since is not None:
+        query = query.where(QRScanDaily.day >= since)
+    if until is not None:
+        query = query.where(QRScanDaily.day <= until)
+    result = await db.execute(query.order_by(QRScanDaily.day))
+    days = result.scalars().all()
+
+    result = await db.execute(
+        select(JobWatermark.position_dt).where(JobWatermark.name == SCAN_ROLLUP_WATERMARK)
+    )
+    return {
+        "qr_id": qr_id,
+        "total_scans": sum(day.scan_count for day in days),
+        "first_scan_dt": days[0].first_scan_dt if days else None,
+        "last_scan_dt": days[-1].last_scan_dt if days else None,
+        "days": days,
+        "rolled_up_to": result.scalar(),
+    }
+
+@router.get("/{qr_id}/scans/area", response_model=QRScanAreaResponse)
+async def get_qr_scans_in_area(
+    qr_id: UUID,
+    min_lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    max_lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    min_lng: Optional[float] = Query(default=None, ge=-180, le=180),
+    max_lng: Optional[float] = Query(default=None, ge=-180, le=180),
+    lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    lng: Optional[float] = Query(default=None, ge=-180, le=180),
+    radius_m: Optional[float] = Query(default=None, gt=0),
+    limit: int = Query(default=settings.SCAN_HISTORY_DEFAULT_LIMIT, ge=1, le=settings.SCAN_HISTORY_MAX_LIMIT),
+    current_user: UserLogin = Depends(require_auth),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Scans of a QR inside a bounding box or a circle, newest first (requires authentication and ownership)
+    Pass either min_lat, max_lat, min_lng and max_lng (min_lng > max_lng
+    crosses the antimeridian), or lat, lng and radius_m. Both are range
+    predicates on the numeric lat/lng columns, served by ix_qr_usage_qr_id_lat_lng.
+    Scans without a valid location are never included.
+    """
+    box = (min_lat, max_lat, min_lng, max_lng)
+    circle = (lat, lng, radius_m)
+    if all(value is not None for value in circle) and all(value is None for value in box):
+        if radius_m > settings.SCAN_AREA_MAX_RADIUS_M:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"radius_m must be at most {settings.SCAN_AREA_MAX_RADIUS_M:g}"
+            )
+        min_lat, max_lat, min_lng, max_lng = radius_box(lat, lng, radius_m)
+    elif all(value is not None for value in box) and all(value is None for value in circle):
+        if min_lat > max_lat:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="min_lat must not be greater than max_lat"
+            )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass either min_lat, max_lat, min_lng and max_lng, or lat, lng and radius_m"
+        )
+
+    await _check_scan_access(db, qr_id, current_user)
+
+    query = select(QRUsage.id, QRUsage.lat, QRUsage.lng, QRUsage.crt_dt).where(
+        QRUsage.qr_id == qr_id,
+        QRUsage.active_flag == True,
+        QRUsage.lat.between(min_lat, max_lat)
+    )
+    if min_lng <= max_lng:
+        query = query.where(QRUsage.lng.between(min_lng, max_lng))
+    else:
+        query = query.where((QRUsage.lng >= min_lng) | (QRUsage.lng <= max_lng))
+    if radius_m is not None:
+        query = query.where(within_radius(QRUsage.lat, QRUsage.lng, lat, lng, radius_m))
+    query = query.order_by(QRUsage.crt_dt.desc(), QRUsage.id.desc()).limit(limit + 1)
+
+    # The SQL condition for a circle lets a few points just outside it
+    # through. They are dropped here before counting against limit, reading
+    # further pages (keyed like the scan history) until limit + 1 scans are
+    # in or none are left.
+    items = []
+    last = None
+    while len(items) <= limit:
+        page = query if last is None else query.where(tuple_(QRUsage.crt_dt, QRUsage.id) < last)
+        rows = (await db.execute(page)).all()
+        for scan_id, scan_lat, scan_lng, crt_dt in rows:
+            item = {"id": scan_id, "lat": scan_lat, "lng": scan_lng, "crt_dt": crt_dt}
+            if radius_m is not None:
+                item["distance_m"] = round(distance_m(lat, lng, scan_lat, scan_lng), 1)
+                if item["distance_m"] > radius_m:
+                    continue
+            items.append(item)
+        if len(rows) <= limit:
+            break
+        last = (rows[-1].crt_dt, rows[-1].id)
+    return {"items": items[:limit], "truncated": len(items) > limit}
+
 @router.get("/details/{qr_id}", response_model=QRDetailsResponse)
-def get_qr_details(
+async def get_qr_details(
     qr_id: UUID,
     current_user: UserLogin = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get QR details including permissions (requires authentication and ownership)"""
-    qr = db.query(QRDetails).filter(QRDetails.id == qr_id).first()
+    result = await db.execute(select(QRDetails).where(QRDetails.id == qr_id))
+    qr = result.scalars().first()
     
     if not qr:
         raise HTTPException(
@@ -268,7 +745,8 @@ def get_qr_details(
     
     # Only owner can view full QR details with permissions
     if qr.user_dtls_id:
-        user_details = db.query(UserDetails).filter(UserDetails.id == qr.user_dtls_id).first()
+        result = await db.execute(select(UserDetails).where(UserDetails.id == qr.user_dtls_id))
+        user_details = result.scalars().first()
         if not user_details or user_details.user_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -283,14 +761,15 @@ def get_qr_details(
     return qr
 
 @router.put("/update-permissions/{qr_id}", response_model=QRDetailsResponse)
-def update_qr_permissions(
+async def update_qr_permissions(
     qr_id: UUID,
     qr_update: QRDetailsUpdate,
     current_user: UserLogin = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update QR code visibility permissions (owner only)"""
-    qr = db.query(QRDetails).filter(QRDetails.id == qr_id).first()
+    result = await db.execute(select(QRDetails).where(QRDetails.id == qr_id))
+    qr = result.scalars().first()
     
     if not qr:
         raise HTTPException(
@@ -299,7 +778,8 @@ def update_qr_permissions(
         )
     
     if qr.user_dtls_id:
-        user_details = db.query(UserDetails).filter(UserDetails.id == qr.user_dtls_id).first()
+        result = await db.execute(select(UserDetails).where(UserDetails.id == qr.user_dtls_id))
+        user_details = result.scalars().first()
         if not user_details or user_details.user_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -322,22 +802,24 @@ def update_qr_permissions(
     qr.description = qr_update.description
     qr.lst_updt_by = current_user.id
     
-    db.commit()
-    db.refresh(qr)
+    await db.commit()
+    await db.refresh(qr)
+    scan_view_cache.invalidate(qr.id)
     
     return qr
 
 @router.put("/bind/{qr_id}", response_model=QRDetailsResponse)
-def bind_qr_to_user(
+async def bind_qr_to_user(
     qr_id: UUID,
     current_user: UserLogin = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Bind an unbound QR code to the current user (First scan claim)
     This is called when a user scans an unbound QR and logs in
     """
-    qr = db.query(QRDetails).filter(QRDetails.id == qr_id).first()
+    result = await db.execute(select(QRDetails).where(QRDetails.id == qr_id))
+    qr = result.scalars().first()
     
     if not qr:
         raise HTTPException(
@@ -352,7 +834,8 @@ def bind_qr_to_user(
         )
     
     # Get current user's details
-    user_details = db.query(UserDetails).filter(UserDetails.user_id == current_user.id).first()
+    result = await db.execute(select(UserDetails).where(UserDetails.user_id == current_user.id))
+    user_details = result.scalars().first()
     if not user_details:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -363,28 +846,33 @@ def bind_qr_to_user(
     qr.user_dtls_id = user_details.id
     qr.lst_updt_by = current_user.id
     
-    db.commit()
-    db.refresh(qr)
+    await db.commit()
+    await db.refresh(qr)
+    scan_view_cache.invalidate(qr.id)
     
     return qr
 
 @router.get("/my-qr-codes", response_model=list[QRDetailsResponse])
-def get_my_qr_codes(
+async def get_my_qr_codes(
     current_user: UserLogin = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all QR codes belonging to current user"""
     # Get all user_details records for current user
-    user_details_list = db.query(UserDetails).filter(UserDetails.user_id == current_user.id).all()
+    result = await db.execute(select(UserDetails).where(UserDetails.user_id == current_user.id))
+    user_details_list = result.scalars().all()
     user_details_ids = [ud.id for ud in user_details_list]
     
     if not user_details_ids:
         return []
     
-    qr_codes = db.query(QRDetails).filter(
-        QRDetails.user_dtls_id.in_(user_details_ids),
-        QRDetails.active_flag == True
-    ).all()
+    result = await db.execute(
+        select(QRDetails).where(
+            QRDetails.user_dtls_id.in_(user_details_ids),
+            QRDetails.active_flag == True
+        )
+    )
+    qr_codes = result.scalars().all()
     
     return qr_codes
 
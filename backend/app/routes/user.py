@@ -1,25 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from uuid import UUID
 from app.database import get_db
-from app.models import UserLogin, UserDetails
+from app.models import UserLogin, UserDetails, QRDetails
 from app.schemas import UserDetailsUpdate, UserDetailsResponse, UserLoginResponse
 from app.auth import require_auth
 from app.logger import user_logger
+from app.cache import scan_view_cache
 
 router = APIRouter(prefix="/user", tags=["User"])
 
 @router.get("/me", response_model=UserLoginResponse)
-def get_current_user_info(current_user: UserLogin = Depends(require_auth)):
+async def get_current_user_info(current_user: UserLogin = Depends(require_auth)):
     """Get current user information"""
-    user_logger.info(f"User info requested for: {current_user.email_id} (ID: {current_user.id})")
+    user_logger.info("User info requested for: %s (ID: %s)", current_user.email_id, current_user.id)
     return current_user
 
 @router.get("/details", response_model=UserDetailsResponse)
-def get_user_details(
+async def get_user_details(
     current_user: UserLogin = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get current user's details"""
     user_logger.info(f"=== Get User Details Flow Started ===")
@@ -27,7 +29,8 @@ def get_user_details(
     
     try:
         # Since it's now one-to-many, get the first (primary) user details record
-        user_details = db.query(UserDetails).filter(UserDetails.user_id == current_user.id).first()
+        result = await db.execute(select(UserDetails).where(UserDetails.user_id == current_user.id))
+        user_details = result.scalars().first()
         
         if not user_details:
             user_logger.warning(f"User details not found for user ID: {current_user.id}")
@@ -50,17 +53,18 @@ def get_user_details(
         )
 
 @router.put("/details", response_model=UserDetailsResponse)
-def update_user_details(
+async def update_user_details(
     details_update: UserDetailsUpdate,
     current_user: UserLogin = Depends(require_auth),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update current user's details"""
     user_logger.info("=== Update User Details Flow Started ===")
     user_logger.info(f"User {current_user.email_id} (ID: {current_user.id}) updating details")
     
     try:
-        user_details = db.query(UserDetails).filter(UserDetails.user_id == current_user.id).first()
+        result = await db.execute(select(UserDetails).where(UserDetails.user_id == current_user.id))
+        user_details = result.scalars().first()
         
         if not user_details:
             user_logger.warning(f"User details not found for user ID: {current_user.id}")
@@ -78,8 +82,13 @@ def update_user_details(
         
         user_details.lst_updt_by = current_user.id
         
-        db.commit()
-        db.refresh(user_details)
+        await db.commit()
+        await db.refresh(user_details)
+        
+        # Drop cached public scan views of every QR showing these details
+        result = await db.execute(select(QRDetails.id).where(QRDetails.user_dtls_id == user_details.id))
+        qr_ids = result.scalars().all()
+        scan_view_cache.invalidate(*qr_ids)
         
         user_logger.info("User details updated successfully")
         user_logger.info("=== Update User Details Flow Completed ===")
@@ -89,7 +98,7 @@ def update_user_details(
         raise
     except SQLAlchemyError as e:
         user_logger.error(f"Database error while updating user details: {str(e)}", exc_info=True)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update user details"
@@ -0,0 +1,239 @@
+"""
+Opt-in write-behind buffer for QRUsage scan records.
+
+With SCAN_WRITE_BEHIND_ENABLED the scan path hands its QRUsage row to this
+buffer instead of committing it in the request. A background thread writes
+the buffered rows with one multi-row INSERT whenever SCAN_WRITE_BEHIND_BATCH_SIZE
+rows are waiting or SCAN_WRITE_BEHIND_FLUSH_INTERVAL seconds have passed.
+
+Rows still in memory are lost if the process dies, so the flush interval is
+also the durability window. A clean shutdown flushes whatever is left.
+
+A batch the database rejects (IntegrityError, DataError) is retried row by
+row, and only the rows that fail again are dropped, so one bad row cannot
+hold up the buffer. Other errors, e.g. a lost connection, keep the batch for
+the next flush.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from app.config import settings
+from app.database import engine
+from app.logger import db_logger
+from app.models import QRUsage
+
+
+class ScanWriteBuffer:
+    """Collects QRUsage rows in memory and writes them in batches"""
+
+    def __init__(self):
+        self.enabled = settings.SCAN_WRITE_BEHIND_ENABLED
+        self.batch_size = settings.SCAN_WRITE_BEHIND_BATCH_SIZE
+        self.flush_interval = settings.SCAN_WRITE_BEHIND_FLUSH_INTERVAL
+        self.max_pending = settings.SCAN_WRITE_BEHIND_MAX_PENDING
+
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.buffered_total = 0
+        self.written_total = 0
+        self.dropped_total = 0
+        self.flushes_total = 0
+        self.failed_flushes_total = 0
+        self.last_flush_seconds = None
+        self.last_error = None
+
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scan-write-behind", daemon=True)
+        self._thread.start()
+        db_logger.info(
+            "Scan write-behind started (batch size %d, flush interval %ss)",
+            self.batch_size, self.flush_interval
+        )
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the flush thread and write out everything still buffered"""
+        if not self._thread:
+            return
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+        with self._lock:
+            left = len(self._rows)
+        if left:
+            db_logger.error("Scan write-behind stopped with %d unwritten scan record(s)", left)
+        else:
+            db_logger.info("Scan write-behind stopped, buffer flushed")
+
+    def submit(
+        self,
+        qr_id: UUID,
+        latitude: Optional[str],
+        longitude: Optional[str],
+        crt_by: Optional[UUID] = None,
+        lat: Optional[float] = None,
+        lng: Optional[float] = None
+    ) -> bool:
+        """
+        Buffer one scan record.
+
+        Returns:
+            False if the buffer is full and the record was dropped
+        """
+        now = datetime.utcnow()
+        row = {
+            "id": uuid.uuid4(),
+            "qr_id": qr_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "lat": lat,
+            "lng": lng,
+            "active_flag": True,
+            "crt_dt": now,
+            "crt_by": crt_by,
+            "lst_updt_dt": now,
+        }
+        with self._wakeup:
+            if len(self._rows) >= self.max_pending:
+                self.dropped_total += 1
+                return False
+            self._rows.append(row)
+            self.buffered_total += 1
+            if len(self._rows) >= self.batch_size:
+                self._wakeup.notify()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            with self._wakeup:
+                while (
+                    len(self._rows) < self.batch_size
+                    and not self._stop.is_set()
+                    and time.monotonic() < deadline
+                ):
+                    self._wakeup.wait(max(0.0, deadline - time.monotonic()))
+            failed_before = self.failed_flushes_total
+            try:
+                self.flush()
+            except Exception as e:
+                db_logger.error("Scan write-behind flush error: %s", e, exc_info=True)
+            if self.failed_flushes_total != failed_before:
+                # Back off instead of hammering a failing database
+                self._stop.wait(self.flush_interval)
+
+    def flush(self) -> int:
+        """
+        Write buffered rows now, one multi-row INSERT per batch.
+
+        A batch the database rejects is retried row by row (see
+        _write_rows_singly). Any other failure puts the batch back at the
+        head of the buffer for the next flush, as far as max_pending allows;
+        the rest is dropped and counted.
+
+        Returns:
+            Number of rows written
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._rows[:self.batch_size]
+                    del self._rows[:self.batch_size]
+                if not batch:
+                    return written
+
+                started = time.perf_counter()
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(QRUsage.__table__).values(batch))
+                except (IntegrityError, DataError) as e:
+                    db_logger.warning("Buffered scan batch rejected, writing its %d row(s) one by one: %s", len(batch), e)
+                    batch_written, requeued = self._write_rows_singly(batch)
+                    written += batch_written
+                    if requeued:
+                        return written
+                    continue
+                except Exception as e:
+                    self._requeue(batch, e)
+                    return written
+
+                with self._lock:
+                    self.flushes_total += 1
+                    self.written_total += len(batch)
+                    self.last_flush_seconds = round(time.perf_counter() - started, 4)
+                written += len(batch)
+
+    def _write_rows_singly(self, batch: list):
+        """
+        Insert the rows of a rejected batch one per transaction, dropping
+        those the database rejects again. If anything else fails, the rows
+        not yet written are put back.
+
+        Returns:
+            (rows written, True if rows were put back)
+        """
+        written = 0
+        for index, row in enumerate(batch):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(QRUsage.__table__).values(row))
+            except (IntegrityError, DataError) as e:
+                with self._lock:
+                    self.dropped_total += 1
+                    self.last_error = str(e)[:500]
+                db_logger.error("Dropped buffered scan record for QR %s: %s", row["qr_id"], e)
+                continue
+            except Exception as e:
+                self._requeue(batch[index:], e)
+                return written, True
+            written += 1
+            with self._lock:
+                self.written_total += 1
+        with self._lock:
+            self.flushes_total += 1
+        return written, False
+
+    def _requeue(self, rows: list, error: Exception):
+        with self._lock:
+            self.failed_flushes_total += 1
+            self.last_error = str(error)[:500]
+            room = max(0, self.max_pending - len(self._rows))
+            self._rows[:0] = rows[:room]
+            self.dropped_total += len(rows) - min(room, len(rows))
+        db_logger.error("Failed to write %d buffered scan record(s): %s", len(rows), error)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "pending": len(self._rows),
+                "batch_size": self.batch_size,
+                "flush_interval_seconds": self.flush_interval,
+                "max_pending": self.max_pending,
+                "buffered_total": self.buffered_total,
+                "written_total": self.written_total,
+                "dropped_total": self.dropped_total,
+                "flushes_total": self.flushes_total,
+                "failed_flushes_total": self.failed_flushes_total,
+                "last_flush_seconds": self.last_flush_seconds,
+                "last_error": self.last_error,
+            }
+
+
+scan_buffer = ScanWriteBuffer()
@@ -0,0 +1,196 @@
+"""
+Debounce for repeated scans of the same QR by the same client.
+
+A phone that re-scans a code or a page that reloads calls /qr/scan several
+times within seconds. The first scan by a client fingerprint within
+SCAN_DEBOUNCE_SECONDS is recorded and alerts the owner. Repeats inside the
+window are answered from the scan view without a QRUsage row or an alert.
+
+The store is per process by default. With several API workers, or several
+instances, set SCAN_DEBOUNCE_BACKEND=redis so they share one window. The
+redis package is then required. If Redis cannot be reached, scans are
+treated as first scans, so nothing is lost, only debouncing.
+
+Anonymous clients are told apart by address. Behind proxies the socket peer
+is the nearest proxy, so the address is read from X-Forwarded-For, counting
+SCAN_DEBOUNCE_TRUSTED_PROXY_HOPS entries from the right: each trusted proxy
+appends the address it received the request from, while the entries to the
+left of those come from the client and can be anything.
+"""
+import hashlib
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from uuid import UUID
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+from app.logger import qr_logger
+
+try:
+    import redis
+except ImportError:  # Only needed for SCAN_DEBOUNCE_BACKEND=redis
+    redis = None
+
+
+class DebounceStore(ABC):
+    """Records keys for a time window. Subclasses must make check_and_set atomic."""
+
+    name = "base"
+    blocking = False  # True if check_and_set does network I/O
+
+    @abstractmethod
+    def check_and_set(self, key: str, window: float) -> bool:
+        """
+        Returns:
+            True if key was recorded less than window seconds ago; otherwise
+            records it now and returns False
+        """
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class MemoryDebounceStore(DebounceStore):
+    """Per-process store, bounded to max_entries keys (oldest dropped first)"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> expires_at, in insertion order
+        self._lock = threading.Lock()
+
+    def check_and_set(self, key: str, window: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > now:
+                return True
+            self._entries.pop(key, None)
+            self._entries[key] = now + window
+            # Keys are appended with the same window, so the oldest expire first
+            while self._entries:
+                oldest_key, oldest_expiry = next(iter(self._entries.items()))
+                if oldest_expiry > now and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest_key]
+            return False
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisDebounceStore(DebounceStore):
+    """Store shared by every process using the same Redis, via SET NX PX"""
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str, prefix: str = "foundee:scan-debounce:"):
+        if redis is None:
+            raise RuntimeError("SCAN_DEBOUNCE_BACKEND=redis requires the redis package")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+    def check_and_set(self, key: str, window: float) -> bool:
+        created = self._client.set(self.prefix + key, b"1", nx=True, px=max(1, int(window * 1000)))
+        return not created
+
+
+def build_store() -> DebounceStore:
+    if settings.SCAN_DEBOUNCE_BACKEND == "redis":
+        return RedisDebounceStore(settings.SCAN_DEBOUNCE_REDIS_URL)
+    return MemoryDebounceStore(settings.SCAN_DEBOUNCE_MAX_ENTRIES)
+
+
+def client_address(forwarded_for: Optional[str], peer: Optional[str], trusted_hops: int) -> Optional[str]:
+    """
+    Client address as seen by the outermost trusted proxy: the trusted_hops-th
+    X-Forwarded-For entry from the right, or the leftmost if there are fewer.
+    Without the header, or with trusted_hops 0, the socket peer.
+    """
+    hops = [hop.strip() for hop in (forwarded_for or "").split(",") if hop.strip()]
+    if trusted_hops <= 0 or not hops:
+        return peer
+    return hops[-min(trusted_hops, len(hops))]
+
+
+def client_fingerprint(user_id: Optional[UUID], client_host: Optional[str], user_agent: Optional[str]) -> str:
+    """Signed-in users by id, anonymous clients by address and User-Agent"""
+    if user_id is not None:
+        return f"u:{user_id}"
+    raw = f"{client_host or ''}|{user_agent or ''}"
+    return "a:" + hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+class ScanDebouncer:
+    """Decides whether a scan is a repeat, and counts both kinds"""
+
+    def __init__(self, window: float, store: Optional[DebounceStore] = None):
+        self.window = window
+        self._store = store
+        self._lock = threading.Lock()
+        self.first_total = 0
+        self.repeat_total = 0
+        self.error_total = 0
+        self.last_error = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    @property
+    def store(self) -> DebounceStore:
+        # Built on first use, so importing the app never needs Redis
+        if self._store is None:
+            self._store = build_store()
+        return self._store
+
+    def set_store(self, store: DebounceStore):
+        self._store = store
+
+    def is_repeat(self, qr_id: UUID, fingerprint: str) -> bool:
+        """True if this client already scanned qr_id within the window"""
+        if not self.enabled:
+            return False
+        try:
+            repeat = self.store.check_and_set(f"{qr_id}:{fingerprint}", self.window)
+        except Exception as e:
+            # Fail open: record the scan rather than lose it
+            with self._lock:
+                self.error_total += 1
+                self.last_error = str(e)[:500]
+            qr_logger.warning("Scan debounce store unavailable, recording scan: %s", e)
+            return False
+        with self._lock:
+            if repeat:
+                self.repeat_total += 1
+            else:
+                self.first_total += 1
+        return repeat
+
+    async def check(self, qr_id: UUID, fingerprint: str) -> bool:
+        """is_repeat for the event loop: network stores are queried in the threadpool"""
+        if not self.enabled:
+            return False
+        if self.store.blocking:
+            return await run_in_threadpool(self.is_repeat, qr_id, fingerprint)
+        return self.is_repeat(qr_id, fingerprint)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "window_seconds": self.window,
+                "backend": self._store.name if self._store is not None else settings.SCAN_DEBOUNCE_BACKEND,
+                "size": self._store.size() if self._store is not None else None,
+                "first_total": self.first_total,
+                "repeat_total": self.repeat_total,
+                "error_total": self.error_total,
+                "last_error": self.last_error,
+            }
+
+
+scan_debouncer = ScanDebouncer(settings.SCAN_DEBOUNCE_SECONDS)
@@ -0,0 +1,181 @@
+"""
+Daily scan rollups: qr_scan_daily holds one row per (qr_id, UTC day) with the
+scan count and the first and last scan times, so per-day questions never
+aggregate qr_usage itself.
+
+A background thread folds new qr_usage rows into it every
+SCAN_ROLLUP_INTERVAL_SECONDS. It walks qr_usage in (ins_dt, id) order past
+the job's watermark (see app.watermark), SCAN_ROLLUP_BATCH_SIZE rows per
+transaction, so each run only reads rows it has not seen. Days and scan times
+still come from crt_dt.
+
+The watermark follows ins_dt, the time of the INSERT, rather than crt_dt,
+the time of the scan: the write-behind buffer inserts rows long after the
+scan when its flushes keep failing, and ins_dt is set on every attempt.
+Rows inserted less than SCAN_ROLLUP_SETTLE_SECONDS ago are left for the
+next run, so the settle time only has to cover the gap between INSERT and
+COMMIT, plus clock differences between app servers.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_
+from app.config import settings
+from app.database import SessionLocal
+from app.logger import db_logger
+from app.models import QRScanDaily, QRUsage
+from app.watermark import claim_watermark
+
+WATERMARK_NAME = "scan_daily_rollup"
+
+
+class ScanRollup:
+    """Background thread that keeps qr_scan_daily up to date"""
+
+    def __init__(self):
+        self.interval = settings.SCAN_ROLLUP_INTERVAL_SECONDS
+        self.batch_size = settings.SCAN_ROLLUP_BATCH_SIZE
+        self.settle_seconds = settings.SCAN_ROLLUP_SETTLE_SECONDS
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.runs_total = 0
+        self.rows_total = 0
+        self.failed_runs_total = 0
+        self.last_run_dt = None
+        self.last_run_seconds = None
+        self.last_error = None
+
+    def start(self):
+        """Start the rollup thread (no-op when SCAN_ROLLUP_INTERVAL_SECONDS is 0)"""
+        if self._thread or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scan-rollup", daemon=True)
+        self._thread.start()
+        db_logger.info("Scan rollup started (every %ss, batch size %d)", self.interval, self.batch_size)
+
+    def stop(self, timeout: float = 10.0):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        db_logger.info("Scan rollup stopped")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self.failed_runs_total += 1
+                    self.last_error = str(e)[:500]
+                db_logger.error("Scan rollup failed: %s", e, exc_info=True)
+            self._stop.wait(self.interval)
+
+    def run_once(self) -> int:
+        """
+        Fold every settled qr_usage row past the watermark into qr_scan_daily.
+
+        Returns:
+            Number of qr_usage rows rolled up
+        """
+        started = time.perf_counter()
+        rolled_up = 0
+        while not self._stop.is_set():
+            processed = self._process_batch()
+            rolled_up += processed
+            if processed < self.batch_size:
+                break
+        with self._lock:
+            self.runs_total += 1
+            self.rows_total += rolled_up
+            self.last_run_dt = datetime.utcnow()
+            self.last_run_seconds = round(time.perf_counter() - started, 4)
+        if rolled_up:
+            db_logger.info("Scan rollup folded %d scan(s) into daily counts", rolled_up)
+        return rolled_up
+
+    def _process_batch(self) -> int:
+        db = SessionLocal()
+        try:
+            watermark = claim_watermark(db, WATERMARK_NAME)
+            if watermark is None:
+                # Another process is rolling up right now
+                db.rollback()
+                return 0
+
+            query = db.query(QRUsage.qr_id, QRUsage.crt_dt, QRUsage.ins_dt, QRUsage.id).filter(
+                QRUsage.active_flag == True,
+                QRUsage.ins_dt < datetime.utcnow() - timedelta(seconds=self.settle_seconds)
+            )
+            if watermark.position_dt is not None:
+                query = query.filter(
+                    tuple_(QRUsage.ins_dt, QRUsage.id) > tuple_(watermark.position_dt, watermark.position_id)
+                )
+            rows = query.order_by(QRUsage.ins_dt, QRUsage.id).limit(self.batch_size).all()
+            if not rows:
+                db.rollback()
+                return 0
+
+            # (qr_id, day) -> [count, first scan, last scan]
+            totals = {}
+            for qr_id, crt_dt, _, _ in rows:
+                entry = totals.get((qr_id, crt_dt.date()))
+                if entry is None:
+                    totals[(qr_id, crt_dt.date())] = [1, crt_dt, crt_dt]
+                else:
+                    entry[0] += 1
+                    entry[1] = min(entry[1], crt_dt)
+                    entry[2] = max(entry[2], crt_dt)
+
+            existing = {
+                (daily.qr_id, daily.day): daily
+                for daily in db.query(QRScanDaily).filter(
+                    tuple_(QRScanDaily.qr_id, QRScanDaily.day).in_(list(totals))
+                )
+            }
+            for (qr_id, day), (count, first_scan, last_scan) in totals.items():
+                daily = existing.get((qr_id, day))
+                if daily is None:
+                    db.add(QRScanDaily(
+                        qr_id=qr_id,
+                        day=day,
+                        scan_count=count,
+                        first_scan_dt=first_scan,
+                        last_scan_dt=last_scan
+                    ))
+                else:
+                    daily.scan_count += count
+                    daily.first_scan_dt = min(daily.first_scan_dt, first_scan)
+                    daily.last_scan_dt = max(daily.last_scan_dt, last_scan)
+
+            _, _, watermark.position_dt, watermark.position_id = rows[-1]
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.interval > 0,
+                "interval_seconds": self.interval,
+                "batch_size": self.batch_size,
+                "settle_seconds": self.settle_seconds,
+                "runs_total": self.runs_total,
+                "rows_total": self.rows_total,
+                "failed_runs_total": self.failed_runs_total,
+                "last_run_dt": self.last_run_dt,
+                "last_run_seconds": self.last_run_seconds,
+                "last_error": self.last_error,
+            }
+
+
+scan_rollup = ScanRollup()
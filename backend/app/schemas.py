@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Literal, Optional
+from datetime import date, datetime
 from uuid import UUID
 
 # User Login Schemas
@@ -69,6 +69,16 @@ class QRDetailsResponse(QRDetailsBase):
     class Config:
         from_attributes = True
 
+class QRBulkCreateRequest(BaseModel):
+    count: int = Field(gt=0)
+    format: Literal["csv", "ndjson"] = "csv"
+
+class QRSheetRequest(BaseModel):
+    qr_ids: List[UUID] = Field(min_length=1)
+    columns: int = Field(default=10, ge=1, le=20)
+    rows: int = Field(default=14, ge=1, le=28)
+    labels: bool = True  # print the start of each id under its code
+
 # QR Usage Schemas
 class QRUsageCreate(BaseModel):
     qr_id: UUID
@@ -85,6 +95,38 @@ class QRUsageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class QRScanHistoryResponse(BaseModel):
+    items: List[QRUsageResponse]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next (older) page; None on the last page
+
+class QRScanLocationResponse(BaseModel):
+    id: UUID
+    lat: float
+    lng: float
+    crt_dt: datetime
+    distance_m: Optional[float] = None  # from the center of a radius query
+
+class QRScanAreaResponse(BaseModel):
+    items: List[QRScanLocationResponse]
+    truncated: bool  # more scans matched than limit; only the newest are listed
+
+class QRScanDayResponse(BaseModel):
+    day: date
+    scan_count: int
+    first_scan_dt: datetime
+    last_scan_dt: datetime
+
+    class Config:
+        from_attributes = True
+
+class QRScanSummaryResponse(BaseModel):
+    qr_id: UUID
+    total_scans: int
+    first_scan_dt: Optional[datetime] = None
+    last_scan_dt: Optional[datetime] = None
+    days: List[QRScanDayResponse]
+    rolled_up_to: Optional[datetime] = None  # scans recorded after this are not counted yet
+
 # QR Scan Response (for viewing)
 class QRScanResponse(BaseModel):
     qr_id: UUID
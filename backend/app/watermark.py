@@ -0,0 +1,33 @@
+"""
+Watermarks for resumable background jobs.
+
+A job keeps its progress in a JobWatermark row and walks its source table in
+keyset order past that position, one batch per transaction. The row is
+locked with FOR UPDATE SKIP LOCKED for the whole batch, so when every API
+process runs the same job only one of them works at a time. The batch's
+writes and the watermark advance commit together, so every source row is
+processed exactly once, even across crashes and restarts.
+"""
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import JobWatermark
+
+
+def claim_watermark(db: Session, name: str) -> Optional[JobWatermark]:
+    """
+    Lock and return the watermark row of job name, creating it (at the start)
+    if needed. Returns None if another process holds it. The lock lasts
+    until the caller commits or rolls back.
+    """
+    if db.get(JobWatermark, name) is None:
+        db.add(JobWatermark(name=name))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Created concurrently by another process
+            db.rollback()
+    db.expire_all()
+    return db.query(JobWatermark).filter(
+        JobWatermark.name == name
+    ).with_for_update(skip_locked=True).first()
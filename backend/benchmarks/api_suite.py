@@ -0,0 +1,191 @@
+"""
+Benchmark suite for the hot API endpoints.
+
+Drives the app in-process over ASGI (no network, one event loop = one API
+worker) against the database in DATABASE_URL, with SMTP stubbed out. Each
+scenario runs a fixed number of requests at a fixed concurrency and reports
+throughput and latency percentiles. Results can be saved as JSON and compared
+with an earlier run; the comparison exits non-zero when a scenario regressed
+by more than --threshold percent in throughput or p95 latency.
+
+Scenarios:
+    scan_anonymous   GET  /api/qr/scan/{qr_id}        (no token)
+    scan_owner       GET  /api/qr/scan/{qr_id}        (owner's token)
+    scan_repeat      GET  /api/qr/scan/{qr_id}        (no token, repeats inside the debounce window)
+    my_qr_codes      GET  /api/qr/my-qr-codes
+    user_me          GET  /api/user/me
+    login            POST /api/auth/login             (bcrypt dominates)
+    create_unbound   POST /api/qr/create-unbound      (admin)
+
+The scan debounce is off except in scan_repeat, as every request comes from
+the same client. Needs migrations applied to the database and httpx installed. All seeded
+rows, QR codes created by the run and queued alerts are removed afterwards.
+
+Usage (from backend/):
+    python benchmarks/api_suite.py --output bench/main.json
+    python benchmarks/api_suite.py --compare bench/main.json --threshold 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx
+from app.main import app
+from app.auth import create_access_token
+from app.cache import auth_user_cache, scan_view_cache
+from app.scan_debounce import scan_debouncer
+from app.database import engine
+from app.email_service import email_service
+from scan_concurrency import seed, cleanup, run_level
+
+PASSWORD = "bench-password"
+SCENARIOS = ("scan_anonymous", "scan_owner", "scan_repeat", "my_qr_codes", "user_me", "login", "create_unbound")
+
+
+def scenario_requests(ids: dict) -> dict:
+    """Scenario name -> keyword arguments for client.request"""
+    owner_token = create_access_token({"sub": ids["owner_email"], "user_id": str(ids["owner_id"])})
+    admin_token = create_access_token({"sub": ids["admin_email"], "user_id": str(ids["admin_id"])})
+    owner = {"Authorization": f"Bearer {owner_token}"}
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    scan_url = f"/api/qr/scan/{ids['qr_id']}?latitude=12.9716&longitude=77.5946"
+    return {
+        "scan_anonymous": {"method": "GET", "url": scan_url},
+        "scan_owner": {"method": "GET", "url": scan_url, "headers": owner},
+        "scan_repeat": {"method": "GET", "url": scan_url},
+        "my_qr_codes": {"method": "GET", "url": "/api/qr/my-qr-codes", "headers": owner},
+        "user_me": {"method": "GET", "url": "/api/user/me", "headers": owner},
+        "login": {
+            "method": "POST",
+            "url": "/api/auth/login",
+            "json": {"email": ids["owner_email"], "password": PASSWORD},
+        },
+        "create_unbound": {"method": "POST", "url": "/api/qr/create-unbound", "headers": admin},
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main_async(args) -> dict:
+    # SMTP stub; alerts are only queued in the outbox anyway, as the
+    # dispatcher threads are not started without the app's startup event
+    email_service.send_many = lambda messages: [None] * len(messages)
+    # App and access logs share stdout with the report
+    level = getattr(logging, args.app_log_level)
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("foundee."):
+            logging.getLogger(name).setLevel(level)
+    if args.no_cache:
+        scan_view_cache.max_entries = 0
+        auth_user_cache.max_entries = 0
+
+    ids = seed(owner_password=PASSWORD, with_admin=True)
+    results = {}
+    try:
+        requests = scenario_requests(ids)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.scenarios:
+                total = args.login_requests if name == "login" else args.requests
+                # Long enough that every scan_repeat request after the first is a repeat
+                scan_debouncer.window = 3600.0 if name == "scan_repeat" else 0
+                await run_level(client, requests[name], 1, min(args.warmup, total))
+                results[name] = await run_level(client, requests[name], args.concurrency, total)
+                print_result(name, results[name])
+    finally:
+        cleanup(ids)
+
+    return {
+        "meta": {
+            "time": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "concurrency": args.concurrency,
+            "cache": not args.no_cache,
+        },
+        "results": results,
+    }
+
+
+def print_header():
+    print(f"{'scenario':<16} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name:<16} {result['throughput_rps']:>9} {result['p50_ms']:>9} "
+        f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>7}"
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Print the change per scenario against baseline; returns the number of regressions"""
+    print(f"\nCompared with {baseline['meta'].get('revision')} ({baseline['meta'].get('time')}):")
+    print(f"{'scenario':<16} {'req/s':>16} {'p95 ms':>18}")
+    regressions = 0
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            print(f"{name:<16} {'(not in baseline)':>16}")
+            continue
+        throughput_change = (result["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] * 100
+        p95_change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        regressed = throughput_change < -threshold or p95_change > threshold
+        regressions += regressed
+        print(
+            f"{name:<16} {result['throughput_rps']:>8} {throughput_change:>+6.1f}% "
+            f"{result['p95_ms']:>9} {p95_change:>+6.1f}%{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=100, help="requests for the login scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="sequential requests before measuring")
+    parser.add_argument("--no-cache", action="store_true", help="disable the scan view and auth user caches")
+    parser.add_argument("--app-log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="level for the app's own loggers during the run")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    print_header()
+    current = asyncio.run(main_async(args))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(current, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), current, args.threshold)
+        if regressions:
+            print(f"\n{regressions} scenario(s) regressed by more than {args.threshold:g}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
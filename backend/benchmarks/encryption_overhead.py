@@ -0,0 +1,113 @@
+"""
+Scan latency with field encryption off, on, and on without the decrypt cache.
+
+Each mode runs in its own process, because encryption settings are read when
+the app is imported. Every process seeds an owner whose profile has all
+fields filled and visible, then drives GET /api/qr/scan/{qr_id} in-process
+over ASGI like scan_concurrency.py does. The scan view cache is switched off,
+so every request loads UserDetails from the database and reads its fields;
+the difference between modes is the cost of decrypting them. The "on" mode
+reports the decrypt cache hit ratio as well.
+
+Needs a local database in DATABASE_URL with migrations applied and httpx
+installed.
+
+Usage (from backend/):
+    python benchmarks/encryption_overhead.py --concurrency 16 --requests 3000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODES = ("off", "on", "uncached")
+
+
+def run_child(mode: str, args) -> None:
+    # Must be decided before app.config is imported
+    from cryptography.fernet import Fernet
+    os.environ["ENCRYPTION_ENABLED"] = "false" if mode == "off" else "true"
+    os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+    if mode == "uncached":
+        os.environ["DECRYPT_CACHE_MAX_ENTRIES"] = "0"
+
+    import asyncio
+    import logging
+    import httpx
+    from scan_concurrency import seed, cleanup, run_level
+    from app.main import app
+    from app.cache import decrypt_cache, scan_view_cache
+    from app.database import SessionLocal
+    from app.models import UserDetails
+    from app.scan_debounce import scan_debouncer
+
+    scan_view_cache.max_entries = 0
+    scan_debouncer.window = 0
+    logging.disable(logging.CRITICAL)
+
+    def fill_profile(details_id):
+        db = SessionLocal()
+        try:
+            details = db.get(UserDetails, details_id)
+            details.last_name = "Owner"
+            details.mobile_no = "+91 98765 43210"
+            details.address = "221B, 4th Cross, Indiranagar, Bengaluru 560038"
+            details.blood_grp = "O+"
+            details.company_name = "Foundee Benchmarks Pvt Ltd"
+            details.description = "If found, please call or email. " * 8
+            db.commit()
+        finally:
+            db.close()
+
+    async def measure() -> dict:
+        ids = seed()
+        fill_profile(ids["details_id"])
+        url = f"/api/qr/scan/{ids['qr_id']}?latitude=12.9716&longitude=77.5946"
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                await run_level(client, url, 1, min(50, args.requests))  # warm-up
+                return await run_level(client, url, args.concurrency, args.requests)
+        finally:
+            cleanup(ids)
+
+    result = asyncio.run(measure())
+    result["mode"] = mode
+    result["decrypt_hit_ratio"] = decrypt_cache.stats()["hit_ratio"]
+    print("RESULT " + json.dumps(result), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args)
+        return
+
+    print(f"{'encrypt':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'hit ratio':>10}")
+    for mode in args.modes:
+        completed = subprocess.run(
+            [sys.executable, __file__, "--child", mode,
+             "--concurrency", str(args.concurrency), "--requests", str(args.requests)],
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("RESULT ")]
+        if completed.returncode != 0 or not lines:
+            print(f"{mode:>9} failed (exit code {completed.returncode})")
+            continue
+        result = json.loads(lines[-1][len("RESULT "):])
+        print(
+            f"{mode:>9} {result['throughput_rps']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+            f"{result['p99_ms']:>9} {result['errors']:>7} {str(result['decrypt_hit_ratio']):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Google login latency benchmark without network access.
+
+Generates an RSA key pair, serves its public half to the app through a
+StaticKeySource and signs Google-style ID tokens with the private half. It
+then drives POST /api/auth/google-login in-process over ASGI and reports
+throughput and latency percentiles, plus how many times the keys were
+fetched. With a warm key cache this should stay at one for the whole run.
+
+Needs a local database in DATABASE_URL with migrations applied (the user the
+benchmark logs in as is removed afterwards) and httpx installed.
+
+Usage (from backend/):
+    python benchmarks/google_login.py --concurrency 8 --requests 1000
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from app.main import app
+from app.config import settings
+from app.database import SessionLocal
+from app.google_keys import StaticKeySource, google_key_cache
+from app.models import UserLogin, UserDetails
+from scan_concurrency import percentile
+
+KID = "benchmark-key"
+
+
+def make_key_pair():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk = {key: value.decode() if isinstance(value, bytes) else value for key, value in public_jwk.items()}
+    public_jwk.update({"kid": KID, "use": "sig"})
+    return private_pem, public_jwk
+
+
+def id_token_for(private_pem: bytes, email: str) -> str:
+    now = int(time.time())
+    claims = {
+        "iss": "https://accounts.google.com",
+        "aud": settings.GOOGLE_CLIENT_ID,
+        "sub": uuid.uuid4().hex,
+        "email": email,
+        "email_verified": True,
+        "name": "Bench Login",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": KID})
+
+
+def cleanup(email: str):
+    db = SessionLocal()
+    try:
+        user = db.query(UserLogin).filter(UserLogin.email_id == email).first()
+        if user:
+            db.query(UserDetails).filter(UserDetails.user_id == user.id).delete()
+            db.delete(user)
+            db.commit()
+    finally:
+        db.close()
+
+
+async def main_async(args) -> None:
+    private_pem, public_jwk = make_key_pair()
+    source = StaticKeySource({"keys": [public_jwk]}, max_age=3600)
+    google_key_cache.set_source(source)
+
+    email = f"bench-google-{uuid.uuid4().hex[:12]}@example.com"
+    token = id_token_for(private_pem, email)
+    latencies = []
+    errors = 0
+    remaining = args.requests
+
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # First login creates the user and loads the keys
+            response = await client.post("/api/auth/google-login", json={"token": token})
+            if response.status_code != 200:
+                print(f"Warm-up login failed: {response.status_code} {response.text}")
+                return
+
+            async def worker():
+                nonlocal remaining, errors
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    response = await client.post("/api/auth/google-login", json={"token": token})
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+    finally:
+        cleanup(email)
+
+    print(f"requests     {len(latencies)} (errors {errors}, concurrency {args.concurrency})")
+    print(f"throughput   {len(latencies) / elapsed:.1f} req/s")
+    print(f"p50/p95/p99  {percentile(latencies, 50) * 1000:.2f} / {percentile(latencies, 95) * 1000:.2f} / "
+          f"{percentile(latencies, 99) * 1000:.2f} ms (mean {statistics.mean(latencies) * 1000:.2f} ms)")
+    print(f"key fetches  {source.fetches_total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
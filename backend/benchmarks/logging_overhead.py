@@ -0,0 +1,90 @@
+"""
+Request latency with logging in async (queue) mode, sync mode and disabled.
+
+Each mode runs in its own process, because the logging mode is fixed when the
+app's loggers are set up. Every process drives GET /api/qr/scan/{qr_id}
+in-process over ASGI like scan_concurrency.py does, with the scan view cache
+on, so the logging calls account for a visible share of each request. The
+children's console output is captured and discarded. File logs are written
+to backend/logs as usual.
+
+Needs a local database in DATABASE_URL with migrations applied and httpx
+installed.
+
+Usage (from backend/):
+    python benchmarks/logging_overhead.py --concurrency 16 --requests 3000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODES = ("async", "sync", "off")
+
+
+def run_child(mode: str, args) -> None:
+    # Must be decided before app.logger is imported
+    os.environ["LOG_ASYNC"] = "false" if mode == "sync" else "true"
+
+    import asyncio
+    import logging
+    import httpx
+    from scan_concurrency import seed, cleanup, run_level
+    from app.main import app
+    from app.scan_debounce import scan_debouncer
+
+    # One client scanning repeatedly; record every scan like scan_concurrency.py does
+    scan_debouncer.window = 0
+    if mode == "off":
+        logging.disable(logging.CRITICAL)
+
+    async def measure() -> dict:
+        ids = seed()
+        url = f"/api/qr/scan/{ids['qr_id']}?latitude=12.9716&longitude=77.5946"
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                await run_level(client, url, 1, min(50, args.requests))  # warm-up
+                return await run_level(client, url, args.concurrency, args.requests)
+        finally:
+            cleanup(ids)
+
+    result = asyncio.run(measure())
+    result["mode"] = mode
+    print("RESULT " + json.dumps(result), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args)
+        return
+
+    print(f"{'logging':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode in args.modes:
+        completed = subprocess.run(
+            [sys.executable, __file__, "--child", mode,
+             "--concurrency", str(args.concurrency), "--requests", str(args.requests)],
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("RESULT ")]
+        if completed.returncode != 0 or not lines:
+            print(f"{mode:>8} failed (exit code {completed.returncode})")
+            continue
+        result = json.loads(lines[-1][len("RESULT "):])
+        print(
+            f"{mode:>8} {result['throughput_rps']:>9} {result['p50_ms']:>9} "
+            f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Scan endpoint concurrency benchmark.
+
+Drives GET /api/qr/scan/{qr_id} in-process over ASGI (no network, a single
+event loop = one API worker) at increasing concurrency levels. Reports
+throughput and latency percentiles for each level. The script only talks
+HTTP to the app, so running it on two revisions compares them directly,
+e.g. before and after the async database layer.
+
+All requests come from one client, so the scan debounce is switched off
+unless --debounce is given; otherwise every scan after the first would be a
+repeat that writes nothing.
+
+Needs a local database in DATABASE_URL with migrations applied (the seeded
+owner and QR are removed afterwards) and httpx installed.
+
+Usage (from backend/):
+    python benchmarks/scan_concurrency.py --levels 1 8 32 128 --requests 2000 --no-cache
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx
+from app.main import app
+from app.auth import get_password_hash
+from app.cache import scan_view_cache
+from app.scan_debounce import scan_debouncer
+from app.database import SessionLocal
+from app.models import UserLogin, UserDetails, QRDetails, QRUsage, EmailOutbox
+
+
+def seed(owner_password: Optional[str] = None, with_admin: bool = False) -> dict:
+    """
+    An owner with a bound QR, plus an admin if with_admin is set. The owner
+    can log in with owner_password if one is given.
+    """
+    db = SessionLocal()
+    try:
+        suffix = uuid.uuid4().hex[:12]
+        owner = UserLogin(
+            name="bench-owner",
+            email_id=f"bench-{suffix}@example.com",
+            password=get_password_hash(owner_password) if owner_password else None
+        )
+        db.add(owner)
+        admin = None
+        if with_admin:
+            admin = UserLogin(name="bench-admin", email_id=f"bench-admin-{suffix}@example.com", role=2)
+            db.add(admin)
+        db.flush()
+        details = UserDetails(user_id=owner.id, first_name="Bench", email_id=owner.email_id)
+        db.add(details)
+        db.flush()
+        qr = QRDetails(user_dtls_id=details.id)
+        db.add(qr)
+        db.commit()
+        ids = {"owner_id": owner.id, "owner_email": owner.email_id, "details_id": details.id, "qr_id": qr.id}
+        if admin:
+            ids.update({"admin_id": admin.id, "admin_email": admin.email_id})
+        return ids
+    finally:
+        db.close()
+
+
+def cleanup(ids: dict):
+    """Remove what seed created, plus any QRs the admin created and their scans and alerts"""
+    db = SessionLocal()
+    try:
+        qr_ids = [ids["qr_id"]]
+        user_ids = [ids["owner_id"]]
+        if "admin_id" in ids:
+            qr_ids += [qr_id for (qr_id,) in db.query(QRDetails.id).filter(QRDetails.crt_by == ids["admin_id"])]
+            user_ids.append(ids["admin_id"])
+        db.query(EmailOutbox).filter(EmailOutbox.qr_id.in_(qr_ids)).delete(synchronize_session=False)
+        db.query(QRUsage).filter(QRUsage.qr_id.in_(qr_ids)).delete(synchronize_session=False)
+        db.query(QRDetails).filter(QRDetails.id.in_(qr_ids)).delete(synchronize_session=False)
+        db.query(UserDetails).filter(UserDetails.id == ids["details_id"]).delete()
+        db.query(UserLogin).filter(UserLogin.id.in_(user_ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+async def run_level(client: httpx.AsyncClient, request: Union[str, dict], concurrency: int, total: int) -> dict:
+    """
+    Send total requests from concurrency workers. request is a URL to GET or
+    keyword arguments for client.request.
+    """
+    if isinstance(request, str):
+        request = {"method": "GET", "url": request}
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+    }
+
+
+async def main_async(args) -> None:
+    ids = seed()
+    url = f"/api/qr/scan/{ids['qr_id']}?latitude=12.9716&longitude=77.5946"
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await run_level(client, url, 1, min(50, args.requests))  # warm-up
+            print(f"{'conc':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+            for level in args.levels:
+                result = await run_level(client, url, level, args.requests)
+                print(
+                    f"{result['concurrency']:>6} {result['throughput_rps']:>9} {result['p50_ms']:>9} "
+                    f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>7}"
+                )
+    finally:
+        cleanup(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--no-cache", action="store_true", help="disable the scan view cache so every scan hits the database")
+    parser.add_argument("--debounce", action="store_true", help="keep the scan debounce on (repeat scans are not recorded)")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        scan_view_cache.max_entries = 0
+    if not args.debounce:
+        scan_debouncer.window = 0
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
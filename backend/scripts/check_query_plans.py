@@ -0,0 +1,252 @@
+"""
+Query-plan regression check for the hot API queries.
+
+Seeds the database configured by DATABASE_URL (PostgreSQL) with synthetic
+users, QR codes, scans and outbox alerts inside a transaction, runs EXPLAIN
+on each hot query with the planner's default settings and exits non-zero if
+a plan reads a table sequentially or does not use the index expected for the
+query. The transaction is rolled back at the end, so the check leaves no data
+behind.
+
+The plans depend on table statistics, so the seed is sized like production:
+scans spread over --days days, one QR with --hot-scans scans (the case the
+per-QR indexes exist for), and mostly sent outbox alerts. Much smaller seeds
+make sequential scans the right plan and the check meaningless.
+
+Usage (from backend/, after `alembic upgrade head`):
+    python scripts/check_query_plans.py [--users 20000] [--scans-per-qr 20] [--verbose]
+"""
+import argparse
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import insert, select, func, tuple_
+from app.database import engine
+from app.geo import radius_box, within_radius
+from app.models import UserLogin, UserDetails, QRDetails, QRUsage, EmailOutbox
+
+INSERT_BATCH_SIZE = 5000
+
+# Scan locations cluster around a few cities: (lat, lng)
+CITIES = [(12.97, 77.59), (19.08, 72.88), (28.61, 77.21), (51.51, -0.13), (40.71, -74.01)]
+
+
+def insert_rows(conn, table, rows: list):
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        conn.execute(insert(table), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def scan_row(rng: random.Random, qr_id, now: datetime, days: int) -> dict:
+    crt_dt = now - timedelta(seconds=rng.uniform(0, days * 86400))
+    row = {
+        "id": uuid.uuid4(), "qr_id": qr_id, "active_flag": True, "crt_dt": crt_dt, "ins_dt": crt_dt,
+        "latitude": None, "longitude": None, "lat": None, "lng": None,
+    }
+    if rng.random() < 0.8:
+        lat, lng = rng.choice(CITIES)
+        lat, lng = round(lat + rng.uniform(-0.5, 0.5), 6), round(lng + rng.uniform(-0.5, 0.5), 6)
+        row.update(latitude=str(lat), longitude=str(lng), lat=lat, lng=lng)
+    return row
+
+
+def seed(conn, users: int, qrs_per_user: int, scans_per_qr: int, hot_scans: int, days: int) -> dict:
+    """Insert synthetic rows and return ids to use as query parameters"""
+    rng = random.Random(20261018)
+    now = datetime.utcnow()
+    login_rows, detail_rows, qr_rows, usage_rows, outbox_rows = [], [], [], [], []
+    for i in range(users):
+        user_id = uuid.uuid4()
+        details_id = uuid.uuid4()
+        email = f"plan-check-{i}-{user_id.hex[:8]}@example.com"
+        login_rows.append({
+            "id": user_id, "name": f"plan-check-{i}", "email_id": email,
+            "role": 1, "active_flag": True, "crt_dt": now,
+        })
+        detail_rows.append({
+            "id": details_id, "user_id": user_id, "first_name": f"First{i}", "active_flag": True, "crt_dt": now,
+        })
+        for j in range(qrs_per_user):
+            qr_id = uuid.uuid4()
+            qr_rows.append({
+                "id": qr_id, "user_dtls_id": details_id, "first_name": True, "last_name": True,
+                "mobile_no": True, "address": True, "email_id": True, "blood_grp": True,
+                "company_name": True, "description": True, "active_flag": j % 5 != 0, "crt_dt": now,
+            })
+            scans = hot_scans if i == 0 and j == 0 else scans_per_qr
+            usage_rows.extend(scan_row(rng, qr_id, now, days) for _ in range(scans))
+            for _ in range(2):
+                sent_dt = now - timedelta(seconds=rng.uniform(0, days * 86400))
+                pending = rng.random() < 0.01
+                outbox_rows.append({
+                    "id": uuid.uuid4(), "to_email": email, "kind": "alert", "qr_id": qr_id,
+                    "status": "pending" if pending else "sent", "attempts": 0 if pending else 1,
+                    "next_attempt_dt": now if pending else sent_dt, "sent_dt": None if pending else sent_dt,
+                    "active_flag": True, "crt_dt": sent_dt,
+                })
+
+    insert_rows(conn, UserLogin.__table__, login_rows)
+    insert_rows(conn, UserDetails.__table__, detail_rows)
+    insert_rows(conn, QRDetails.__table__, qr_rows)
+    insert_rows(conn, QRUsage.__table__, usage_rows)
+    insert_rows(conn, EmailOutbox.__table__, outbox_rows)
+    conn.exec_driver_sql("ANALYZE user_login, user_dtls, qr_dtls, qr_usage, email_outbox")
+
+    lat, lng = CITIES[0]
+    return {
+        "email": login_rows[0]["email_id"],
+        "user_id": login_rows[0]["id"],
+        "user_dtls_id": detail_rows[0]["id"],
+        "qr_id": qr_rows[0]["id"],  # the hot QR
+        "since": now - timedelta(days=1),
+        "now": now,
+        "center": (lat, lng, 2000.0),
+        "watermark": (now - timedelta(days=1), uuid.UUID(int=0)),
+    }
+
+
+def hot_queries(p: dict) -> dict:
+    """
+    The queries behind the busiest routes and jobs, keyed by a readable name:
+    (statement, index names its plan must use)
+    """
+    lat, lng, radius_m = p["center"]
+    min_lat, max_lat, min_lng, max_lng = radius_box(lat, lng, radius_m)
+    return {
+        "auth: user by email": (
+            select(UserLogin).where(UserLogin.email_id == p["email"]),
+            {"ix_user_login_email_id"},
+        ),
+        "scan: qr -> user details -> owner": (
+            select(QRDetails, UserDetails, UserLogin.email_id)
+                .outerjoin(UserDetails, UserDetails.id == QRDetails.user_dtls_id)
+                .outerjoin(UserLogin, UserLogin.id == UserDetails.user_id)
+                .where(QRDetails.id == p["qr_id"], QRDetails.active_flag == True),
+            {"qr_dtls_pkey", "user_dtls_pkey", "user_login_pkey"},
+        ),
+        "user: details by user_id": (
+            select(UserDetails).where(UserDetails.user_id == p["user_id"]),
+            {"ix_user_dtls_user_id"},
+        ),
+        "my-qr-codes: active qrs by user details": (
+            select(QRDetails).where(QRDetails.user_dtls_id.in_([p["user_dtls_id"]]), QRDetails.active_flag == True),
+            {"ix_qr_dtls_user_dtls_id"},
+        ),
+        "cache invalidation: qr ids by user details": (
+            select(QRDetails.id).where(QRDetails.user_dtls_id == p["user_dtls_id"]),
+            {"ix_qr_dtls_user_dtls_id"},
+        ),
+        "scans: history page": (
+            select(QRUsage).where(QRUsage.qr_id == p["qr_id"], QRUsage.active_flag == True)
+                .order_by(QRUsage.crt_dt.desc(), QRUsage.id.desc()).limit(51),
+            {"ix_qr_usage_qr_id_crt_dt_id"},
+        ),
+        "scans: area around a point": (
+            select(QRUsage.id, QRUsage.lat, QRUsage.lng, QRUsage.crt_dt).where(
+                QRUsage.qr_id == p["qr_id"],
+                QRUsage.active_flag == True,
+                QRUsage.lat.between(min_lat, max_lat),
+                QRUsage.lng.between(min_lng, max_lng),
+                within_radius(QRUsage.lat, QRUsage.lng, lat, lng, radius_m)
+            ).order_by(QRUsage.crt_dt.desc(), QRUsage.id.desc()).limit(51),
+            {"ix_qr_usage_qr_id_lat_lng"},
+        ),
+        "export: scans since": (
+            select(QRUsage).where(QRUsage.crt_dt >= p["since"]),
+            {"ix_qr_usage_crt_dt"},
+        ),
+        "rollup: next batch past the watermark": (
+            select(QRUsage.qr_id, QRUsage.crt_dt, QRUsage.ins_dt, QRUsage.id).where(
+                QRUsage.active_flag == True,
+                QRUsage.ins_dt < p["now"],
+                tuple_(QRUsage.ins_dt, QRUsage.id) > tuple_(*p["watermark"])
+            ).order_by(QRUsage.ins_dt, QRUsage.id).limit(5000),
+            {"ix_qr_usage_ins_dt_id"},
+        ),
+        "outbox: due pending alerts": (
+            select(EmailOutbox).where(
+                EmailOutbox.status == "pending",
+                EmailOutbox.next_attempt_dt <= p["now"]
+            ).order_by(EmailOutbox.next_attempt_dt).limit(20),
+            {"ix_email_outbox_pending"},
+        ),
+        "outbox: digest window starts": (
+            select(EmailOutbox.to_email, func.max(EmailOutbox.sent_dt)).where(
+                EmailOutbox.to_email.in_([p["email"]]),
+                EmailOutbox.kind == "alert",
+                EmailOutbox.status == "sent",
+                EmailOutbox.sent_dt > p["now"] - timedelta(minutes=5)
+            ).group_by(EmailOutbox.to_email),
+            {"ix_email_outbox_to_email_alert_sent"},
+        ),
+    }
+
+
+def plan_nodes(plan: dict) -> list:
+    """Every node of a plan tree, depth first"""
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--qrs-per-user", type=int, default=2)
+    parser.add_argument("--scans-per-qr", type=int, default=20)
+    parser.add_argument("--hot-scans", type=int, default=20000, help="scans of the one busy QR")
+    parser.add_argument("--days", type=int, default=180, help="days the scans are spread over")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print(f"Query-plan check needs PostgreSQL, DATABASE_URL points at {engine.dialect.name}")
+        return 2
+
+    failures = 0
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            params = seed(conn, args.users, args.qrs_per_user, args.scans_per_qr, args.hot_scans, args.days)
+
+            for name, (stmt, expected) in hot_queries(params).items():
+                # Literal values, so partial-index predicates can be matched
+                compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+                plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled)).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = plan_nodes(plan[0]["Plan"])
+                seq_scans = [node.get("Relation Name") for node in nodes if node["Node Type"] == "Seq Scan"]
+                used = {node["Index Name"] for node in nodes if "Index Name" in node}
+                problems = []
+                if seq_scans:
+                    problems.append(f"sequential scan on {', '.join(seq_scans)}")
+                if expected - used:
+                    problems.append(
+                        f"expected {', '.join(sorted(expected - used))}, used {', '.join(sorted(used)) or 'no index'}"
+                    )
+                if problems:
+                    failures += 1
+                    print(f"FAIL  {name}: {'; '.join(problems)}")
+                else:
+                    print(f"ok    {name}: {', '.join(sorted(used))}")
+                if args.verbose or problems:
+                    print(json.dumps(plan[0]["Plan"], indent=2))
+        finally:
+            trans.rollback()
+
+    if failures:
+        print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} did not get the expected plan")
+        return 1
+    print("\nAll hot queries use their expected indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
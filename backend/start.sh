@@ -3,6 +3,12 @@
 # Run database migrations
 alembic upgrade head
 
+# Prometheus multiprocess mode keeps per-worker samples here; start clean
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 # Start the application
 uvicorn app.main:app --host 0.0.0.0 --port $PORT
 
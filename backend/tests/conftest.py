@@ -0,0 +1,161 @@
+"""
+Test settings. The app reads its configuration when it is imported, so the
+environment is filled in here first; values already set win, e.g. a
+DATABASE_URL pointing at a local PostgreSQL. Without one the tests use a
+throwaway SQLite file.
+
+Run from backend/:
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+import socket
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import anyio
+import pytest
+from aiosmtpd.controller import Controller
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.compiler import compiles
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+_test_dir = tempfile.mkdtemp(prefix="foundee-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_test_dir}/foundee.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("SMTP_HOST", "127.0.0.1")
+os.environ.setdefault("SMTP_PORT", "8025")
+os.environ.setdefault("SMTP_USERNAME", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+os.environ.setdefault("EMAIL_FROM", "noreply@foundee.test")
+os.environ.setdefault("LOG_ASYNC", "false")
+
+
+@compiles(PG_UUID, "sqlite")
+def _compile_uuid_sqlite(type_, compiler, **kw):
+    # SQLite has no UUID type; as_uuid columns round-trip through 32 hex characters
+    return "CHAR(32)"
+
+
+# The app is imported only after its settings are in place
+from app.auth import create_access_token  # noqa: E402
+from app.cache import auth_user_cache, scan_view_cache  # noqa: E402
+from app.database import Base, SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import QRDetails, UserDetails, UserLogin  # noqa: E402
+from app.scan_debounce import scan_debouncer  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    Base.metadata.create_all(engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    # Every test scans from the same client; tests that need the debounce turn it on
+    monkeypatch.setattr(scan_debouncer, "window", 0)
+    scan_view_cache.clear()
+    auth_user_cache.clear()
+
+
+@pytest.fixture(scope="session")
+def portal():
+    # One event loop for every request: pooled asyncpg connections belong to
+    # the loop that opened them
+    with anyio.from_thread.start_blocking_portal() as portal:
+        yield portal
+        portal.call(async_engine.dispose)
+
+
+@pytest.fixture
+def client(portal):
+    # Not entered as a context manager, so the startup event and the
+    # background workers it starts do not run
+    client = TestClient(app)
+    client.portal = portal
+    return client
+
+
+@pytest.fixture
+def bound_qr() -> dict:
+    """An owner with filled-in details and a QR bound to them"""
+    db = SessionLocal()
+    try:
+        owner = UserLogin(name="owner", email_id=f"owner-{uuid.uuid4().hex[:12]}@example.com")
+        db.add(owner)
+        db.flush()
+        details = UserDetails(user_id=owner.id, first_name="Owner", email_id=owner.email_id)
+        db.add(details)
+        db.flush()
+        qr = QRDetails(user_dtls_id=details.id)
+        db.add(qr)
+        db.commit()
+        return {"owner_id": owner.id, "details_id": details.id, "qr_id": qr.id, "email": owner.email_id}
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def admin() -> dict:
+    """An admin account (role 2)"""
+    db = SessionLocal()
+    try:
+        user = UserLogin(name="admin", email_id=f"admin-{uuid.uuid4().hex[:12]}@example.com", role=2)
+        db.add(user)
+        db.commit()
+        return {"id": user.id, "email": user.email_id}
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def auth_headers():
+    """Bearer headers for a user, as issued by the login endpoints"""
+    def headers(user_id, email: str) -> dict:
+        token = create_access_token({"sub": email, "user_id": str(user_id)})
+        return {"Authorization": f"Bearer {token}"}
+    return headers
+
+
+class RecordingHandler:
+    """Counts greetings (one per SMTP session) and keeps every message"""
+
+    def __init__(self):
+        self.greetings = 0
+        self.messages = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.greetings += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    """A local SMTP server: (RecordingHandler, port)"""
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    try:
+        yield handler, controller.port
+    finally:
+        controller.stop()
@@ -0,0 +1,68 @@
+"""Cached users resolved from access tokens see account changes on the next request"""
+import uuid
+
+import pytest
+
+from app.cache import auth_user_cache
+from app.database import SessionLocal
+from app.models import UserLogin
+
+
+@pytest.fixture
+def user() -> UserLogin:
+    db = SessionLocal()
+    try:
+        user = UserLogin(name="user", email_id=f"user-{uuid.uuid4().hex[:12]}@example.com")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+
+def update_user(user_id, **values):
+    db = SessionLocal()
+    try:
+        user = db.get(UserLogin, user_id)
+        for name, value in values.items():
+            setattr(user, name, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_deactivation_is_seen_on_the_next_request(client, user, auth_headers):
+    headers = auth_headers(user.id, user.email_id)
+    assert client.get("/api/user/me", headers=headers).json()["active_flag"] is True
+    assert auth_user_cache.get(user.id) is not None  # served from the cache from now on
+
+    update_user(user.id, active_flag=False)
+
+    assert client.get("/api/user/me", headers=headers).json()["active_flag"] is False
+
+
+def test_role_changes_are_seen_on_the_next_request(client, user, auth_headers):
+    headers = auth_headers(user.id, user.email_id)
+    assert client.get("/api/admin/scan-buffer/stats", headers=headers).status_code == 403
+
+    update_user(user.id, role=2)
+    assert client.get("/api/admin/scan-buffer/stats", headers=headers).status_code == 200
+
+    update_user(user.id, role=1)
+    assert client.get("/api/admin/scan-buffer/stats", headers=headers).status_code == 403
+
+
+def test_deleted_user_is_rejected_on_the_next_request(client, user, auth_headers):
+    headers = auth_headers(user.id, user.email_id)
+    assert client.get("/api/user/me", headers=headers).status_code == 200
+
+    db = SessionLocal()
+    try:
+        db.delete(db.get(UserLogin, user.id))
+        db.commit()
+    finally:
+        db.close()
+
+    assert client.get("/api/user/me", headers=headers).status_code == 401
@@ -0,0 +1,71 @@
+"""Per-request statement counting and statement shapes"""
+import uuid
+
+import pytest
+from sqlalchemy import Column, MetaData, Table, select, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from sqlalchemy.exc import DBAPIError
+
+from app.database import engine
+from app.db_metrics import QueryBudgetExceeded, query_budget, statement_shape
+from app.metrics import DB_QUERY_ERRORS
+
+
+def asyncpg_in_query(count: int) -> str:
+    table = Table("qr_dtls", MetaData(), Column("id", UUID(as_uuid=True)))
+    query = select(table).where(table.c.id.in_([uuid.uuid4() for _ in range(count)]))
+    return str(query.compile(dialect=asyncpg_dialect(), compile_kwargs={"render_postcompile": True}))
+
+
+def test_asyncpg_in_lists_share_a_shape():
+    two, five = asyncpg_in_query(2), asyncpg_in_query(5)
+
+    assert "$5::UUID" in five
+    assert statement_shape(two) == statement_shape(five)
+    assert "IN (...)" in statement_shape(five)
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT * FROM t WHERE id IN (?, ?, ?)",
+    "SELECT * FROM t WHERE id IN (%s, %s)",
+    "SELECT * FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s)",
+    "SELECT * FROM t WHERE id IN ($1, $2)",
+])
+def test_driver_placeholder_lists_collapse(statement):
+    assert statement_shape(statement) == "SELECT * FROM t WHERE id IN (...)"
+
+
+def test_other_statements_keep_their_shape():
+    statement = "SELECT * FROM t WHERE a = $1::UUID AND b IN (SELECT id FROM u)"
+
+    assert statement_shape(statement) == statement
+
+
+def test_query_budget_reports_requests_over_budget(client, bound_qr):
+    with pytest.raises(QueryBudgetExceeded) as raised:
+        with query_budget(0):
+            client.get(f"/api/qr/scan/{bound_qr['qr_id']}")
+
+    message = str(raised.value)
+    assert "GET /api/qr/scan/{qr_id}" in message
+    assert "x SELECT" in message
+
+
+def test_query_budget_passes_within_budget(client, bound_qr):
+    with query_budget(3) as budget:
+        client.get(f"/api/qr/scan/{bound_qr['qr_id']}")
+
+    assert [label for label, _ in budget.requests] == ["GET /api/qr/scan/{qr_id}"]
+
+
+def test_failed_statements_keep_their_error_and_are_counted():
+    errors = DB_QUERY_ERRORS.labels(engine="background")
+    before = errors._value.get()
+
+    # OperationalError on SQLite, ProgrammingError on PostgreSQL
+    with pytest.raises(DBAPIError, match="no_such_table"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT * FROM no_such_table"))
+
+    assert errors._value.get() == before + 1
@@ -0,0 +1,222 @@
+"""Email outbox workers against a local debugging SMTP server"""
+from datetime import datetime, timedelta
+from email import message_from_bytes
+
+import pytest
+
+from app import email_outbox as email_outbox_module
+from app.database import SessionLocal, engine
+from app.email_outbox import (
+    KIND_ALERT,
+    KIND_DIGEST,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_SENT,
+    OutboxDispatcher,
+    enqueue_location_alert,
+)
+from app.email_service import SMTPConnectionPool, email_service
+from app.models import EmailOutbox
+from conftest import free_port
+
+
+@pytest.fixture
+def dispatcher(smtp_server, monkeypatch):
+    """A dispatcher without worker threads, sending to smtp_server, over an empty outbox"""
+    _, port = smtp_server
+    db = SessionLocal()
+    try:
+        db.query(EmailOutbox).delete()
+        db.commit()
+    finally:
+        db.close()
+    pool = SMTPConnectionPool(host="127.0.0.1", port=port, username="", password="", use_tls=False)
+    monkeypatch.setattr(email_service, "pool", pool)
+    try:
+        yield OutboxDispatcher()
+    finally:
+        pool.close_all()
+
+
+def enqueue(qr_id, *emails) -> list:
+    db = SessionLocal()
+    try:
+        alerts = [enqueue_location_alert(db, email, qr_id, "12.97", "77.59") for email in emails]
+        db.commit()
+        return [alert.id for alert in alerts]
+    finally:
+        db.close()
+
+
+def load(alert_id) -> EmailOutbox:
+    db = SessionLocal()
+    try:
+        return db.get(EmailOutbox, alert_id)
+    finally:
+        db.close()
+
+
+def make_due(alert_id):
+    db = SessionLocal()
+    try:
+        db.get(EmailOutbox, alert_id).next_attempt_dt = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def update(alert_ids, **values):
+    db = SessionLocal()
+    try:
+        db.query(EmailOutbox).filter(EmailOutbox.id.in_(alert_ids)).update(values)
+        db.commit()
+    finally:
+        db.close()
+
+
+def subjects(handler) -> list:
+    return [message_from_bytes(message.content)["Subject"] for message in handler.messages]
+
+
+def open_window(dispatcher, handler, qr_id, email) -> EmailOutbox:
+    """Send the owner's first alert, which opens their digest window"""
+    (alert_id,) = enqueue(qr_id, email)
+    assert dispatcher.process_next() is True
+    assert subjects(handler) == ["Foundee Alert: Your QR Code was Scanned"]
+    return load(alert_id)
+
+
+def test_queued_alerts_are_sent_and_marked(smtp_server, dispatcher, bound_qr):
+    handler, _ = smtp_server
+    ids = enqueue(bound_qr["qr_id"], "first@example.com", "second@example.com")
+
+    assert dispatcher.process_next() is True
+    assert dispatcher.process_next() is False
+
+    assert sorted(message.rcpt_tos[0] for message in handler.messages) == ["first@example.com", "second@example.com"]
+    for alert_id in ids:
+        alert = load(alert_id)
+        assert alert.status == STATUS_SENT
+        assert alert.attempts == 1
+        assert alert.sent_dt is not None
+        assert alert.last_error is None
+
+
+def test_failed_send_backs_off_then_gives_up(dispatcher, bound_qr, monkeypatch):
+    monkeypatch.setattr(email_service.pool, "port", free_port())  # nothing listens there
+    monkeypatch.setattr(dispatcher, "max_attempts", 3)
+    (alert_id,) = enqueue(bound_qr["qr_id"], "owner@example.com")
+
+    for attempt, delay in ((1, 30), (2, 60)):
+        before = datetime.utcnow()
+        assert dispatcher.process_next() is True
+        alert = load(alert_id)
+        assert alert.status == STATUS_PENDING
+        assert alert.attempts == attempt
+        assert alert.last_error.startswith("SMTP connection failed")
+        assert before + timedelta(seconds=delay - 1) <= alert.next_attempt_dt <= datetime.utcnow() + timedelta(seconds=delay)
+        assert dispatcher.process_next() is False  # not due yet
+        make_due(alert_id)
+
+    assert dispatcher.process_next() is True
+    alert = load(alert_id)
+    assert alert.status == STATUS_FAILED
+    assert alert.attempts == 3
+    assert dispatcher.process_next() is False
+
+
+def test_claim_is_committed_before_sending(dispatcher, bound_qr, monkeypatch):
+    (alert_id,) = enqueue(bound_qr["qr_id"], "owner@example.com")
+    seen = {}
+
+    def send_many(messages):
+        # No connection is held while SMTP runs, and the row is leased
+        seen["connections"] = engine.pool.checkedout()
+        seen["next_attempt_dt"] = load(alert_id).next_attempt_dt
+        seen["claimed_again"] = OutboxDispatcher().process_next()
+        return [None] * len(messages)
+
+    monkeypatch.setattr(email_outbox_module.email_service, "send_many", send_many)
+    started = datetime.utcnow()
+
+    assert dispatcher.process_next() is True
+
+    assert seen["connections"] == 0
+    assert seen["next_attempt_dt"] >= started + dispatcher.lease
+    assert seen["claimed_again"] is False
+    assert load(alert_id).status == STATUS_SENT
+
+
+def test_first_alert_is_sent_immediately(smtp_server, dispatcher, bound_qr):
+    handler, _ = smtp_server
+
+    first = open_window(dispatcher, handler, bound_qr["qr_id"], "owner@example.com")
+
+    assert first.kind == KIND_ALERT
+    assert first.status == STATUS_SENT
+    assert handler.messages[0].rcpt_tos == ["owner@example.com"]
+
+
+def test_burst_is_deferred_into_one_digest(smtp_server, dispatcher, bound_qr):
+    handler, _ = smtp_server
+    first = open_window(dispatcher, handler, bound_qr["qr_id"], "owner@example.com")
+    ids = enqueue(bound_qr["qr_id"], *["owner@example.com"] * 3)
+
+    assert dispatcher.process_next() is True  # deferred rows count as processed
+    assert dispatcher.process_next() is False  # and are not due until the window closes
+
+    assert len(handler.messages) == 1
+    for alert_id in ids:
+        alert = load(alert_id)
+        assert alert.kind == KIND_DIGEST
+        assert alert.status == STATUS_PENDING
+        assert alert.attempts == 0
+        assert alert.next_attempt_dt == first.sent_dt + dispatcher.digest_window
+
+
+def test_digest_is_sent_once_the_window_closes(smtp_server, dispatcher, bound_qr, monkeypatch):
+    handler, _ = smtp_server
+    open_window(dispatcher, handler, bound_qr["qr_id"], "owner@example.com")
+    ids = enqueue(bound_qr["qr_id"], *["owner@example.com"] * 3)
+    assert dispatcher.process_next() is True
+    monkeypatch.setattr(dispatcher, "batch_size", 2)  # the claim cuts the digest short
+
+    update(ids, next_attempt_dt=datetime.utcnow())
+    assert dispatcher.process_next() is True
+    assert dispatcher.process_next() is False
+
+    assert subjects(handler)[1:] == ["Foundee Alert: Your QR Codes were Scanned 3 Times"]
+    for alert_id in ids:
+        alert = load(alert_id)
+        assert alert.status == STATUS_SENT
+        assert alert.attempts == 1
+
+
+def test_retried_alert_bypasses_the_window(smtp_server, dispatcher, bound_qr):
+    handler, _ = smtp_server
+    open_window(dispatcher, handler, bound_qr["qr_id"], "owner@example.com")
+    (alert_id,) = enqueue(bound_qr["qr_id"], "owner@example.com")
+    update([alert_id], attempts=1)  # an earlier send failed
+
+    assert dispatcher.process_next() is True
+
+    assert subjects(handler)[1:] == ["Foundee Alert: Your QR Code was Scanned"]
+    alert = load(alert_id)
+    assert alert.kind == KIND_ALERT
+    assert alert.status == STATUS_SENT
+    assert alert.attempts == 2
+
+
+def test_zero_window_sends_every_alert_on_its_own(smtp_server, dispatcher, bound_qr, monkeypatch):
+    handler, _ = smtp_server
+    monkeypatch.setattr(dispatcher, "digest_window", timedelta(0))
+    ids = enqueue(bound_qr["qr_id"], *["owner@example.com"] * 3)
+
+    assert dispatcher.process_next() is True
+    assert dispatcher.process_next() is False
+
+    assert subjects(handler) == ["Foundee Alert: Your QR Code was Scanned"] * 3
+    for alert_id in ids:
+        alert = load(alert_id)
+        assert alert.kind == KIND_ALERT
+        assert alert.status == STATUS_SENT
@@ -0,0 +1,56 @@
+"""EmailService.send_many against a local debugging SMTP server"""
+import pytest
+
+from app.email_service import EmailService, SMTPConnectionPool
+from conftest import free_port
+
+
+@pytest.fixture
+def service(smtp_server):
+    _, port = smtp_server
+    service = EmailService()
+    service.pool = SMTPConnectionPool(host="127.0.0.1", port=port, username="", password="", use_tls=False)
+    try:
+        yield service
+    finally:
+        service.close()
+
+
+def build_alerts(service: EmailService, count: int):
+    return [
+        service.build_location_alert(f"owner{i}@example.com", f"qr-{i}", "12.97", "77.59")
+        for i in range(count)
+    ]
+
+
+def test_send_many_uses_one_session(smtp_server, service):
+    handler, _ = smtp_server
+
+    results = service.send_many(build_alerts(service, 5))
+
+    assert results == [None] * 5
+    assert len(handler.messages) == 5
+    assert handler.greetings == 1
+    assert service.pool.stats()["connects_total"] == 1
+
+
+def test_session_is_reused_across_batches(smtp_server, service):
+    handler, _ = smtp_server
+
+    service.send_many(build_alerts(service, 2))
+    service.send_many(build_alerts(service, 3))
+
+    assert len(handler.messages) == 5
+    assert handler.greetings == 1
+    stats = service.pool.stats()
+    assert stats["connects_total"] == 1
+    assert stats["reuses_total"] == 1
+
+
+def test_send_many_reports_the_error_per_message(service):
+    service.pool.port = free_port()  # nothing listens there
+
+    results = service.send_many(build_alerts(service, 2))
+
+    assert len(results) == 2
+    assert all(error and error.startswith("SMTP connection failed") for error in results)
@@ -0,0 +1,85 @@
+"""Field encryption with key rotation"""
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy import select
+
+from app import encryption
+from app.config import settings
+from app.database import SessionLocal
+from app.encryption import TOKEN_PREFIX, Ciphertext, EncryptionService, decrypt_value
+from app.models import UserDetails
+
+
+def save_details(user_id, **fields):
+    """Write a UserDetails row through the ORM; returns its id and the stored columns"""
+    db = SessionLocal()
+    try:
+        details = UserDetails(user_id=user_id, **fields)
+        db.add(details)
+        db.commit()
+        columns = [UserDetails.__table__.c[name] for name in fields]
+        stored = db.execute(select(*columns).where(UserDetails.id == details.id)).one()
+        return details.id, dict(zip(fields, map(str, stored)))
+    finally:
+        db.close()
+
+
+def load_details(details_id) -> UserDetails:
+    db = SessionLocal()
+    try:
+        return db.get(UserDetails, details_id)
+    finally:
+        db.close()
+
+
+def test_rotated_key_still_decrypts():
+    old, new = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    token = EncryptionService(old, "", enabled=True).encrypt("Owner")
+
+    assert EncryptionService(new, old, enabled=True).decrypt(token) == "Owner"
+
+
+def test_plaintext_is_returned_as_is():
+    service = EncryptionService(Fernet.generate_key().decode(), "", enabled=True)
+
+    assert service.decrypt("written before encryption") == "written before encryption"
+    assert service.stats()["decrypt_failures_total"] == 0
+
+
+def test_token_no_key_decrypts_is_not_returned():
+    token = EncryptionService(Fernet.generate_key().decode(), "", enabled=True).encrypt("Owner")
+    service = EncryptionService(Fernet.generate_key().decode(), "", enabled=True)
+
+    assert service.decrypt(token) is None
+    assert service.stats()["decrypt_failures_total"] == 1
+
+
+def test_loaded_value_no_key_decrypts_reads_as_none_until_the_key_is_added(monkeypatch):
+    old, new = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    token = EncryptionService(old, "", enabled=True).encrypt("Owner")
+    monkeypatch.setattr(encryption, "encryption_service", EncryptionService(new, "", enabled=True))
+
+    assert decrypt_value(Ciphertext(token)) is None
+
+    monkeypatch.setattr(encryption, "encryption_service", EncryptionService(new, old, enabled=True))
+
+    assert decrypt_value(Ciphertext(token)) == "Owner"
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_profile_fields_round_trip_through_the_orm(bound_qr, monkeypatch, enabled):
+    monkeypatch.setattr(settings, "ENCRYPTION_ENABLED", enabled)
+    monkeypatch.setattr(encryption, "encryption_service", EncryptionService(Fernet.generate_key().decode(), ""))
+    fields = {"first_name": "Owner", "mobile_no": "+91 98450 12345", "address": "12 MG Road, Bengaluru"}
+
+    details_id, stored = save_details(bound_qr["owner_id"], **fields)
+
+    for name, value in fields.items():
+        if enabled:
+            assert stored[name].startswith(TOKEN_PREFIX)
+            assert encryption.encryption_service.decrypt(stored[name]) == value
+        else:
+            assert stored[name] == value
+    details = load_details(details_id)
+    for name, value in fields.items():
+        assert getattr(details, name) == value
@@ -0,0 +1,103 @@
+"""GET /api/admin/export/{table}: streamed CSV/NDJSON exports"""
+import csv
+import gzip
+import io
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import QRUsage
+
+
+@pytest.fixture
+def window() -> dict:
+    """A future day no other test writes scans into"""
+    day = datetime(2031, 1, 1) + timedelta(days=random.randrange(100000))
+    return {"since": day.isoformat(), "until": (day + timedelta(days=1)).isoformat()}
+
+
+@pytest.fixture
+def scans(bound_qr, window) -> list:
+    """Five scans of bound_qr inside window, one right at its (exclusive) end"""
+    base = datetime.fromisoformat(window["since"]) + timedelta(hours=8)
+    db = SessionLocal()
+    try:
+        rows = [
+            QRUsage(
+                id=uuid.uuid4(), qr_id=bound_qr["qr_id"], latitude="12.97", longitude="77.59",
+                lat=12.97, lng=77.59, crt_dt=base + timedelta(hours=i)
+            )
+            for i in range(5)
+        ]
+        rows.append(QRUsage(id=uuid.uuid4(), qr_id=bound_qr["qr_id"], crt_dt=datetime.fromisoformat(window["until"])))
+        db.add_all(rows)
+        db.commit()
+        return [(row.id, row.crt_dt) for row in rows[:5]]
+    finally:
+        db.close()
+
+
+def export(client, admin, auth_headers, window=None, table="qr_usage", **params):
+    return client.get(
+        f"/api/admin/export/{table}",
+        params={**(window or {}), **params},
+        headers=auth_headers(admin["id"], admin["email"])
+    )
+
+
+def test_csv_has_a_header_and_one_row_per_scan(client, admin, auth_headers, window, scans):
+    response = export(client, admin, auth_headers, window)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"].endswith('.csv"')
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header == [column.name for column in QRUsage.__table__.columns]
+    records = sorted((dict(zip(header, row)) for row in rows), key=lambda record: record["crt_dt"])
+    assert [(uuid.UUID(record["id"]), record["crt_dt"]) for record in records] == [
+        (scan_id, crt_dt.isoformat()) for scan_id, crt_dt in scans
+    ]
+    assert records[0]["latitude"] == "12.97"
+    assert records[0]["crt_by"] == ""  # NULL
+
+
+def test_ndjson_has_one_object_per_scan(client, admin, auth_headers, window, scans):
+    response = export(client, admin, auth_headers, window, format="ndjson")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda record: record["crt_dt"])
+    assert [(uuid.UUID(record["id"]), record["crt_dt"]) for record in records] == [
+        (scan_id, crt_dt.isoformat()) for scan_id, crt_dt in scans
+    ]
+    assert records[0]["lat"] == 12.97
+    assert records[0]["crt_by"] is None
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_gzip_output_decompresses_to_the_plain_export(client, admin, auth_headers, window, scans, monkeypatch, fmt):
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)  # several flushed batches
+    plain = export(client, admin, auth_headers, window, format=fmt)
+
+    compressed = export(client, admin, auth_headers, window, format=fmt, gzip="true")
+
+    assert compressed.status_code == 200
+    assert compressed.headers["content-type"] == "application/gzip"
+    assert compressed.headers["content-disposition"].endswith(f'.{fmt}.gz"')
+    assert sorted(gzip.decompress(compressed.content).decode().splitlines()) == sorted(plain.text.splitlines())
+
+
+def test_only_admins_can_export(client, bound_qr, auth_headers):
+    headers = auth_headers(bound_qr["owner_id"], bound_qr["email"])
+
+    assert client.get("/api/admin/export/qr_usage", headers=headers).status_code == 403
+    assert client.get("/api/admin/export/qr_usage").status_code == 401
+
+
+def test_unknown_table_is_rejected(client, admin, auth_headers):
+    assert export(client, admin, auth_headers, table="user_login").status_code == 422
@@ -0,0 +1,72 @@
+"""Area queries over scan locations"""
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.auth import create_access_token
+from app.database import SessionLocal
+from app.geo import EARTH_RADIUS_M, radius_box
+from app.models import QRUsage
+
+
+def add_scans(qr_id, *locations):
+    """One scan per (lat, lng), the first one newest"""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for age, (lat, lng) in enumerate(locations):
+            db.add(QRUsage(
+                qr_id=qr_id, latitude=str(lat), longitude=str(lng), lat=lat, lng=lng,
+                crt_dt=now - timedelta(minutes=age)
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def scans_in_area(client, bound_qr, **params) -> dict:
+    token = create_access_token({"sub": bound_qr["email"], "user_id": str(bound_qr["owner_id"])})
+    response = client.get(
+        f"/api/qr/{bound_qr['qr_id']}/scans/area",
+        params=params,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_radius_box_wraps_across_the_antimeridian():
+    min_lat, max_lat, min_lng, max_lng = radius_box(0.0, 179.9, 50000)
+
+    assert min_lat < 0.0 < max_lat
+    assert min_lng == pytest.approx(179.45, abs=0.01)
+    assert max_lng == pytest.approx(-179.65, abs=0.01)
+
+
+def test_radius_box_spans_all_longitudes_at_a_pole():
+    assert radius_box(89.9, 10.0, 50000)[2:] == (-180.0, 180.0)
+
+
+def test_circle_across_the_antimeridian(client, bound_qr):
+    add_scans(bound_qr["qr_id"], (0.0, -179.95), (0.0, 179.95), (0.0, 170.0))
+
+    result = scans_in_area(client, bound_qr, lat=0.0, lng=179.99, radius_m=20000)
+
+    assert [item["lng"] for item in result["items"]] == [-179.95, 179.95]
+    assert all(item["distance_m"] <= 20000 for item in result["items"])
+
+
+def test_points_just_outside_the_circle_do_not_shorten_the_page(client, bound_qr):
+    radius_m = 10000
+    # Diagonally just beyond radius_m: inside the box and the SQL condition's margin
+    outside = math.degrees(radius_m / EARTH_RADIUS_M) * 1.004 / math.sqrt(2)
+    add_scans(bound_qr["qr_id"], (outside, outside), (-outside, -outside), (0.01, 0.0), (0.02, 0.0), (0.03, 0.0))
+
+    page = scans_in_area(client, bound_qr, lat=0.0, lng=0.0, radius_m=radius_m, limit=2)
+    assert [item["lat"] for item in page["items"]] == [0.01, 0.02]
+    assert page["truncated"] is True
+
+    page = scans_in_area(client, bound_qr, lat=0.0, lng=0.0, radius_m=radius_m, limit=3)
+    assert [item["lat"] for item in page["items"]] == [0.01, 0.02, 0.03]
+    assert page["truncated"] is False
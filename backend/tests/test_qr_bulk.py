@@ -0,0 +1,97 @@
+"""POST /api/qr/create-unbound/bulk"""
+import csv
+import io
+import json
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import SessionLocal, async_engine
+from app.models import QRDetails
+
+
+@pytest.fixture
+def statements():
+    """Multi-row INSERTs into qr_dtls and commits on the API engine"""
+    counts = {"inserts": 0, "commits": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO qr_dtls"):
+            counts["inserts"] += 1
+
+    def commit(conn):
+        counts["commits"] += 1
+
+    sync_engine = async_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "commit", commit)
+    try:
+        yield counts
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(sync_engine, "commit", commit)
+
+
+def mint(client, admin, auth_headers, **body):
+    return client.post(
+        "/api/qr/create-unbound/bulk",
+        json=body,
+        headers=auth_headers(admin["id"], admin["email"])
+    )
+
+
+def stored_unbound(ids) -> list:
+    db = SessionLocal()
+    try:
+        return db.query(QRDetails).filter(QRDetails.id.in_(ids)).all()
+    finally:
+        db.close()
+
+
+def test_csv_lists_every_minted_qr(client, admin, auth_headers, statements, monkeypatch):
+    monkeypatch.setattr(settings, "QR_BULK_BATCH_SIZE", 10)
+
+    response = mint(client, admin, auth_headers, count=25)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 25
+    ids = [uuid.UUID(row["qr_id"]) for row in rows]
+    assert len(set(ids)) == 25
+    assert all(row["url"] == f"{settings.FRONTEND_URL}/qr/{row['qr_id']}" for row in rows)
+
+    # One INSERT and one commit per batch of 10
+    assert statements == {"inserts": 3, "commits": 3}
+    stored = stored_unbound(ids)
+    assert len(stored) == 25
+    assert all(qr.user_dtls_id is None and qr.crt_by == admin["id"] for qr in stored)
+
+
+def test_ndjson_lists_every_minted_qr(client, admin, auth_headers):
+    response = mint(client, admin, auth_headers, count=3, format="ndjson")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert len(stored_unbound([uuid.UUID(line["qr_id"]) for line in lines])) == 3
+
+
+def test_count_limit_is_enforced(client, admin, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "QR_BULK_MAX_COUNT", 5)
+
+    assert mint(client, admin, auth_headers, count=6).status_code == 400
+    assert mint(client, admin, auth_headers, count=0).status_code == 422
+
+
+def test_only_admins_can_mint(client, bound_qr, auth_headers):
+    response = client.post(
+        "/api/qr/create-unbound/bulk",
+        json={"count": 1},
+        headers=auth_headers(bound_qr["owner_id"], bound_qr["email"])
+    )
+
+    assert response.status_code == 403
@@ -0,0 +1,23 @@
+"""GET /api/qr/image/{qr_id} and its conditional requests"""
+import uuid
+
+import pytest
+
+
+@pytest.mark.parametrize("if_none_match", [None, "*"])
+def test_unknown_qr_is_not_found(client, if_none_match):
+    headers = {"If-None-Match": if_none_match} if if_none_match else {}
+
+    response = client.get(f"/api/qr/image/{uuid.uuid4()}", params={"format": "svg"}, headers=headers)
+
+    assert response.status_code == 404
+
+
+def test_matching_etag_is_not_modified(client, bound_qr):
+    url = f"/api/qr/image/{bound_qr['qr_id']}"
+    etag = client.get(url, params={"format": "svg"}).headers["etag"]
+
+    for if_none_match in (etag, "*"):
+        response = client.get(url, params={"format": "svg"}, headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
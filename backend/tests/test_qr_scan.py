@@ -0,0 +1,27 @@
+"""GET /api/qr/scan/{qr_id}"""
+from app.database import SessionLocal
+from app.models import QRUsage
+
+
+def recorded_scans(qr_id) -> list:
+    db = SessionLocal()
+    try:
+        return db.query(QRUsage).filter(QRUsage.qr_id == qr_id).all()
+    finally:
+        db.close()
+
+
+def test_scan_records_the_location(client, bound_qr):
+    response = client.get(f"/api/qr/scan/{bound_qr['qr_id']}", params={"latitude": "12.97", "longitude": "77.59"})
+
+    assert response.status_code == 200
+    (scan,) = recorded_scans(bound_qr["qr_id"])
+    assert (scan.latitude, scan.longitude, scan.lat, scan.lng) == ("12.97", "77.59", 12.97, 77.59)
+
+
+def test_oversized_location_is_dropped_but_the_scan_recorded(client, bound_qr):
+    response = client.get(f"/api/qr/scan/{bound_qr['qr_id']}", params={"latitude": "1" * 51, "longitude": "2"})
+
+    assert response.status_code == 200
+    (scan,) = recorded_scans(bound_qr["qr_id"])
+    assert (scan.latitude, scan.longitude, scan.lat, scan.lng) == (None, None, None, None)
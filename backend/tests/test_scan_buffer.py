@@ -0,0 +1,46 @@
+"""Write-behind buffer for scan records"""
+from sqlalchemy import create_engine
+
+from app import scan_buffer as scan_buffer_module
+from app.database import SessionLocal
+from app.models import QRUsage
+from app.scan_buffer import ScanWriteBuffer
+
+
+def usage_count(qr_id) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(QRUsage).filter(QRUsage.qr_id == qr_id).count()
+    finally:
+        db.close()
+
+
+def test_rejected_row_is_dropped_and_the_rest_written(bound_qr):
+    buffer = ScanWriteBuffer()
+    for _ in range(3):
+        assert buffer.submit(qr_id=bound_qr["qr_id"], latitude="1.5", longitude="2.5")
+    # A duplicate primary key makes the multi-row INSERT fail
+    buffer._rows[1]["id"] = buffer._rows[0]["id"]
+
+    assert buffer.flush() == 2
+    assert buffer.flush() == 0
+
+    stats = buffer.stats()
+    assert stats["pending"] == 0
+    assert stats["written_total"] == 2
+    assert stats["dropped_total"] == 1
+    assert usage_count(bound_qr["qr_id"]) == 2
+
+
+def test_batch_is_kept_when_the_database_is_unreachable(bound_qr, monkeypatch, tmp_path):
+    buffer = ScanWriteBuffer()
+    buffer.submit(qr_id=bound_qr["qr_id"], latitude=None, longitude=None)
+    buffer.submit(qr_id=bound_qr["qr_id"], latitude=None, longitude=None)
+    monkeypatch.setattr(scan_buffer_module, "engine", create_engine(f"sqlite:///{tmp_path}/missing/scans.db"))
+
+    assert buffer.flush() == 0
+
+    stats = buffer.stats()
+    assert stats["pending"] == 2
+    assert stats["failed_flushes_total"] == 1
+    assert stats["dropped_total"] == 0
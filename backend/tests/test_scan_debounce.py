@@ -0,0 +1,35 @@
+"""Repeat-scan debounce and the client address it keys anonymous scans on"""
+import pytest
+
+from app.scan_debounce import DebounceStore, client_address, scan_debouncer
+
+
+@pytest.mark.parametrize("forwarded_for, trusted_hops, expected", [
+    (None, 1, "10.0.0.1"),
+    ("203.0.113.7", 1, "203.0.113.7"),
+    ("198.51.100.1, 203.0.113.7", 1, "203.0.113.7"),  # leftmost entry is client-supplied
+    ("198.51.100.1, 203.0.113.7, 192.0.2.9", 2, "203.0.113.7"),
+    ("203.0.113.7", 3, "203.0.113.7"),
+    ("198.51.100.1, 203.0.113.7", 0, "10.0.0.1"),
+])
+def test_client_address(forwarded_for, trusted_hops, expected):
+    assert client_address(forwarded_for, "10.0.0.1", trusted_hops) == expected
+
+
+def test_store_must_implement_check_and_set():
+    with pytest.raises(TypeError):
+        DebounceStore()
+
+
+def test_spoofed_forwarded_for_does_not_evade_the_debounce(client, bound_qr, monkeypatch):
+    monkeypatch.setattr(scan_debouncer, "window", 60)
+    repeats_before = scan_debouncer.stats()["repeat_total"]
+
+    for spoofed in ("198.51.100.1", "198.51.100.2"):
+        response = client.get(
+            f"/api/qr/scan/{bound_qr['qr_id']}",
+            headers={"X-Forwarded-For": f"{spoofed}, 203.0.113.7"}
+        )
+        assert response.status_code == 200
+
+    assert scan_debouncer.stats()["repeat_total"] == repeats_before + 1
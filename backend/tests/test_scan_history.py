@@ -0,0 +1,88 @@
+"""GET /api/qr/{qr_id}/scans: keyset-paginated scan history"""
+import base64
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import QRUsage, UserLogin
+
+
+@pytest.fixture
+def scans(bound_qr) -> list:
+    """Seven scans of bound_qr, three of them at the same moment; (crt_dt, id) newest first"""
+    base = datetime(2026, 10, 1, 12, 0, 0)
+    times = [base, base + timedelta(minutes=1)] + [base + timedelta(minutes=2)] * 3 + [
+        base + timedelta(minutes=3), base + timedelta(minutes=4)
+    ]
+    db = SessionLocal()
+    try:
+        rows = [QRUsage(id=uuid.uuid4(), qr_id=bound_qr["qr_id"], crt_dt=crt_dt) for crt_dt in times]
+        db.add_all(rows)
+        db.commit()
+        return sorted(((row.crt_dt, row.id) for row in rows), reverse=True)
+    finally:
+        db.close()
+
+
+def get_scans(client, bound_qr, auth_headers, **params):
+    return client.get(
+        f"/api/qr/{bound_qr['qr_id']}/scans",
+        params=params,
+        headers=auth_headers(bound_qr["owner_id"], bound_qr["email"])
+    )
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_pages_cover_every_scan_once_in_order(client, bound_qr, auth_headers, scans, limit):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+        response = get_scans(client, bound_qr, auth_headers, **params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= limit
+        seen.extend(uuid.UUID(item["id"]) for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert len(page["items"]) == limit
+
+    # Scans sharing a crt_dt are ordered by id, so none is skipped or repeated at a page boundary
+    assert seen == [scan_id for _, scan_id in scans]
+
+
+def test_since_and_until_bound_the_history(client, bound_qr, auth_headers, scans):
+    response = get_scans(
+        client, bound_qr, auth_headers,
+        since="2026-10-01T12:01:00", until="2026-10-01T12:03:00"
+    )
+
+    assert response.status_code == 200
+    assert [uuid.UUID(item["id"]) for item in response.json()["items"]] == [scan_id for _, scan_id in scans[2:6]]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"2026-10-01T12:00:00").decode(),
+    base64.urlsafe_b64encode(b"yesterday|" + str(uuid.uuid4()).encode()).decode(),
+])
+def test_malformed_cursor_is_rejected(client, bound_qr, auth_headers, cursor):
+    assert get_scans(client, bound_qr, auth_headers, cursor=cursor).status_code == 400
+
+
+def test_other_users_cannot_read_the_history(client, bound_qr, auth_headers):
+    db = SessionLocal()
+    try:
+        other = UserLogin(name="other", email_id=f"other-{uuid.uuid4().hex[:12]}@example.com")
+        db.add(other)
+        db.commit()
+        headers = auth_headers(other.id, other.email_id)
+    finally:
+        db.close()
+
+    assert client.get(f"/api/qr/{bound_qr['qr_id']}/scans", headers=headers).status_code == 403
+    assert client.get(f"/api/qr/{uuid.uuid4()}/scans", headers=headers).status_code == 404
+    assert client.get(f"/api/qr/{bound_qr['qr_id']}/scans").status_code == 401
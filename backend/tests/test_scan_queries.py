@@ -0,0 +1,30 @@
+"""Statements run by GET /api/qr/scan/{qr_id}"""
+import uuid
+
+from app.cache import scan_view_cache
+from app.db_metrics import query_budget
+
+
+def scan_statements(client, qr_id, expected_status: int = 200, **params) -> int:
+    with query_budget(100) as budget:
+        response = client.get(f"/api/qr/scan/{qr_id}", params=params)
+    assert response.status_code == expected_status, response.text
+    assert len(budget.requests) == 1
+    return budget.requests[0][1].count
+
+
+def test_uncached_scan_loads_the_view_in_one_query(client, bound_qr, monkeypatch):
+    monkeypatch.setattr(scan_view_cache, "max_entries", 0)
+
+    # One joined SELECT for QR, details and owner, then the usage and outbox inserts
+    assert scan_statements(client, bound_qr["qr_id"], latitude="12.97", longitude="77.59") == 3
+
+
+def test_cached_scan_only_writes(client, bound_qr):
+    scan_statements(client, bound_qr["qr_id"])
+
+    assert scan_statements(client, bound_qr["qr_id"]) == 2
+
+
+def test_unknown_qr_is_one_query(client):
+    assert scan_statements(client, uuid.uuid4(), expected_status=404) == 1
@@ -0,0 +1,33 @@
+"""Daily scan rollup and its watermark"""
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.models import QRScanDaily
+from app.scan_buffer import ScanWriteBuffer
+from app.scan_rollup import ScanRollup
+
+
+def daily_count(qr_id) -> int:
+    db = SessionLocal()
+    try:
+        return sum(daily.scan_count for daily in db.query(QRScanDaily).filter(QRScanDaily.qr_id == qr_id))
+    finally:
+        db.close()
+
+
+def test_scan_flushed_after_the_settle_time_is_still_counted(bound_qr, monkeypatch):
+    rollup = ScanRollup()
+    monkeypatch.setattr(rollup, "settle_seconds", 0)
+    late = ScanWriteBuffer()
+    assert late.submit(qr_id=bound_qr["qr_id"], latitude=None, longitude=None)
+    # This scan happened an hour ago, but its flushes kept failing until now
+    late._rows[0]["crt_dt"] = datetime.utcnow() - timedelta(hours=1)
+    recent = ScanWriteBuffer()
+    recent.submit(qr_id=bound_qr["qr_id"], latitude=None, longitude=None)
+    assert recent.flush() == 1
+    rollup.run_once()  # moves the watermark past the recent scan
+
+    assert late.flush() == 1
+    rollup.run_once()
+
+    assert daily_count(bound_qr["qr_id"]) == 2